@@ -0,0 +1,224 @@
+"""
+Bulk Import
+Chunked, set-based imports from JSON arrays or streamed CSV bodies with per-row errors
+"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import codecs
+import csv
+import io
+import os
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+
+from . import schemas
+
+
+# Rows validated and written per transaction
+CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+
+# OpenAPI body of the CSV upload endpoints (the body is read as a stream, not as a form)
+CSV_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"text/csv": {"schema": {"type": "string"}}},
+    }
+}
+
+
+def dialect_insert(db: AsyncSession):
+    """INSERT construct supporting ON CONFLICT for the session's database"""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+
+async def achunked(rows: AsyncIterator, size: int = CHUNK_SIZE) -> AsyncIterator[List]:
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def iter_json_rows(rows: List[Any]) -> AsyncIterator[Any]:
+    for row in rows:
+        yield row
+
+
+async def iter_csv_rows(request: Request) -> AsyncIterator[Dict[str, str]]:
+    """
+    Parse a CSV request body (header row first) as it arrives
+
+    The body is cut at line ends outside quoted fields, so a quoted value may
+    contain newlines. Empty cells are dropped so model defaults apply.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    header = None
+    buffer = ""
+
+    def records(text: str):
+        nonlocal header
+        for values in csv.reader(io.StringIO(text)):
+            if not values:
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            yield {name: value for name, value in zip(header, values) if value != ""}
+
+    async for data in request.stream():
+        buffer += decoder.decode(data)
+        # Last newline preceded by an even number of quotes ends a complete record
+        cut, quotes = -1, 0
+        for position, char in enumerate(buffer):
+            if char == '"':
+                quotes += 1
+            elif char == "\n" and quotes % 2 == 0:
+                cut = position
+        if cut >= 0:
+            for record in records(buffer[:cut + 1]):
+                yield record
+            buffer = buffer[cut + 1:]
+    buffer += decoder.decode(b"", final=True)
+    for record in records(buffer):
+        yield record
+
+
+def add_error(result: schemas.BulkResult, row: int, key: Optional[str], message: str) -> None:
+    result.failed += 1
+    result.errors.append(schemas.BulkRowError(row=row, key=key, error=message))
+
+
+async def numbered(rows: AsyncIterator[Any]) -> AsyncIterator[Tuple[int, Any]]:
+    """Attach 1-based row numbers (data rows, excluding a CSV header)"""
+    number = 0
+    async for row in rows:
+        number += 1
+        yield number, row
+
+
+def validate_rows(
+    chunk: List[Tuple[int, Any]],
+    schema: type,
+    result: schemas.BulkResult,
+    key: Optional[str] = None,
+    seen: Optional[set] = None,
+) -> List[Tuple[int, BaseModel]]:
+    """
+    Validate numbered rows against a schema, rejecting keys repeated within the upload (when a key is given)
+
+    Returns:
+        (row number, parsed row) pairs that passed
+    """
+    valid = []
+    for number, row in chunk:
+        try:
+            parsed = schema.model_validate(row)
+        except ValidationError as e:
+            add_error(result, number, None, validation_message(e))
+            continue
+        if key is not None:
+            row_key = getattr(parsed, key)
+            if row_key in seen:
+                add_error(result, number, row_key, f"Duplicate {key} in upload")
+                continue
+            seen.add(row_key)
+        valid.append((number, parsed))
+    return valid
+
+
+async def import_rows(
+    db: AsyncSession,
+    rows: AsyncIterator[Any],
+    model,
+    schema: type,
+    key: str,
+    update_columns: Sequence[str],
+    upsert: bool = False,
+    returning: Sequence[str] = (),
+    on_write: Optional[Callable[[AsyncSession, List], Awaitable[None]]] = None,
+) -> schemas.BulkResult:
+    """
+    Create (or with upsert, create or update) records keyed by a unique column
+
+    Each chunk is validated in Python, checked against the table with one
+    IN query and written with one multi-row INSERT ... ON CONFLICT in its own
+    transaction. Invalid rows and, without upsert, rows whose key already
+    exists are reported and skipped; the rest of the chunk is still written.
+
+    Args:
+        db: Session
+        rows: Raw rows (dicts from JSON or CSV)
+        model: ORM model to write
+        schema: Pydantic schema validating a row
+        key: Unique column identifying a record (plate, sku)
+        update_columns: Columns overwritten when upserting an existing record
+        upsert: Update existing records instead of rejecting them
+        returning: Columns returned for each written record, after the key
+        on_write: Called with the written (key, *returning) rows in the chunk's transaction
+
+    Returns:
+        Counts and per-row errors
+    """
+    result = schemas.BulkResult()
+    insert = dialect_insert(db)
+    key_column = getattr(model, key)
+    seen = set()
+
+    async for chunk in achunked(numbered(rows)):
+        result.received += len(chunk)
+        valid = validate_rows(chunk, schema, result, key, seen)
+        if not valid:
+            continue
+
+        existing = set(await db.scalars(
+            select(key_column).where(key_column.in_([getattr(parsed, key) for _, parsed in valid]))
+        ))
+        if not upsert:
+            for number, parsed in valid:
+                if getattr(parsed, key) in existing:
+                    add_error(result, number, getattr(parsed, key), f"{model.__name__} with this {key} already exists")
+            valid = [(number, parsed) for number, parsed in valid if getattr(parsed, key) not in existing]
+            if not valid:
+                continue
+
+        statement = insert(model)
+        if upsert:
+            statement = statement.on_conflict_do_update(
+                index_elements=[key_column],
+                set_={column: statement.excluded[column] for column in update_columns},
+            )
+        else:
+            # Guards against records created concurrently since the IN query
+            statement = statement.on_conflict_do_nothing(index_elements=[key_column])
+        rows_written = (await db.execute(
+            statement.returning(key_column, *[getattr(model, column) for column in returning]),
+            [parsed.model_dump() for _, parsed in valid],
+        )).all()
+        if on_write is not None:
+            await on_write(db, rows_written)
+        await db.commit()
+
+        written = {row[0] for row in rows_written}
+
+        for number, parsed in valid:
+            if getattr(parsed, key) not in written:
+                add_error(result, number, getattr(parsed, key), f"{model.__name__} with this {key} already exists")
+        result.created += len(written - existing)
+        result.updated += len(written & existing)
+
+    return result
@@ -1,9 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from .database import engine, Base
-from .routers import vehicles, work_orders, inventory, digital_twin, traffic_analysis
+from .database import engine, Base, dispose_engines
+from .pagination import PAGE_HEADERS
+from .migrations import run_migrations
+from .routers import vehicles, work_orders, inventory, digital_twin, traffic_analysis, cityio
 from .services.scheduler import start_scheduler, stop_scheduler
+from .services.stock_alerts import install_alert_hooks
+from .services.traffic_rollups import install_rollup_hooks
 
 
 # Lifespan context manager for startup/shutdown events
@@ -12,8 +16,15 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting Konya CityScope API...")
 
-    # Create database tables
+    # Create database tables and upgrade existing ones
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    # Keep hourly/daily traffic rollups current on every density insert
+    install_rollup_hooks()
+
+    # Push low-stock threshold crossings to subscribers once their change commits
+    install_alert_hooks()
 
     # Start traffic analysis scheduler (hourly)
     print("⏰ Starting traffic analysis scheduler...")
@@ -29,6 +40,8 @@ async def lifespan(app: FastAPI):
     # Shutdown
     print("🛑 Shutting down...")
     stop_scheduler()
+    cityio.shutdown_workers()
+    await dispose_engines()
     print("👋 Goodbye!")
 
 
@@ -52,6 +65,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=PAGE_HEADERS,
 )
 
 # Include Routers
@@ -60,6 +74,7 @@ app.include_router(work_orders.router)
 app.include_router(inventory.router)
 app.include_router(digital_twin.router)
 app.include_router(traffic_analysis.router)
+app.include_router(cityio.router)
 
 @app.get("/")
 def read_root():
@@ -71,7 +86,8 @@ def read_root():
             "Work Orders",
             "Inventory Tracking",
             "Digital Twin",
-            "Satellite Traffic Analysis (YOLO + Sentinel Hub)"
+            "Satellite Traffic Analysis (YOLO + Sentinel Hub)",
+            "CityIO Tables (/api/tables/list)"
         ]
     }
 
@@ -0,0 +1,126 @@
+"""
+Schema Migrations
+Idempotent in-place upgrades of existing databases, run at startup after create_all
+"""
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import String
+
+from . import models
+from .services.traffic_cells import cell_key
+from .services.stock_ledger import seed_ledger
+from .services.traffic_rollups import backfill_rollups
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 10000
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def migrate_traffic_density(engine: Engine) -> bool:
+    """
+    Convert traffic_density from string coordinates to numeric ones with a cell key
+
+    The table is rebuilt: the old one is renamed, the current schema (numeric
+    latitude/longitude, cell_key, (cell_key, analyzed_at) index) is created
+    and rows are copied in batches with their cell keys computed. Rows whose
+    coordinates do not parse keep NULL coordinates and no cell.
+
+    The copy runs in one transaction, but SQLite commits the rename and
+    CREATE TABLE before it. A copy that fails therefore leaves the renamed
+    legacy table behind; the next start finds it and resumes the copy with
+    the rows not yet in the new table.
+
+    Returns:
+        True when the table was migrated
+    """
+    table = models.TrafficDensity.__table__
+    legacy = f"{table.name}_legacy"
+    inspector = inspect(engine)
+    resuming = inspector.has_table(legacy)
+    if not resuming:
+        if not inspector.has_table(table.name):
+            return False
+        columns = {column["name"]: column for column in inspector.get_columns(table.name)}
+        if "cell_key" in columns and not isinstance(columns["latitude"]["type"], String):
+            return False
+
+    copied_columns = ["id", "density_score", "vehicle_count", "analyzed_at", "satellite_image_id"]
+    insert = table.insert()
+    migrated = 0
+    with engine.begin() as connection:
+        if resuming:
+            logger.warning(f"Resuming the interrupted traffic_density migration from {legacy}")
+            table.create(connection, checkfirst=True)
+        else:
+            # Index names are global: drop the old ones before the new table claims them
+            for index in inspector.get_indexes(table.name):
+                connection.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+            connection.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{legacy}"'))
+            if engine.dialect.name == "postgresql":
+                connection.execute(text(f'ALTER INDEX "{table.name}_pkey" RENAME TO "{legacy}_pkey"'))
+            table.create(connection)
+
+        rows = connection.execute(
+            text(
+                f'SELECT {", ".join(copied_columns)}, latitude, longitude FROM "{legacy}" '
+                f'WHERE id NOT IN (SELECT id FROM "{table.name}") ORDER BY id'
+            )
+            .columns(analyzed_at=table.c.analyzed_at.type)
+        )
+        while True:
+            batch = rows.fetchmany(BATCH_SIZE)
+            if not batch:
+                break
+            values = []
+            for row in batch:
+                record = dict(zip(copied_columns, row[:len(copied_columns)]))
+                record["latitude"] = to_float(row[-2])
+                record["longitude"] = to_float(row[-1])
+                record["cell_key"] = cell_key(record["latitude"], record["longitude"])
+                values.append(record)
+            connection.execute(insert, values)
+            migrated += len(values)
+
+        connection.execute(text(f'DROP TABLE "{legacy}"'))
+        if engine.dialect.name == "postgresql":
+            # Keep the id sequence ahead of the copied ids
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+            ))
+    logger.info(f"Migrated {migrated} traffic_density rows to numeric coordinates with cell keys")
+    return True
+
+
+def create_missing_indexes(engine: Engine) -> None:
+    """create_all skips existing tables; add indexes declared on them since"""
+    inspector = inspect(engine)
+    for table in models.Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+                logger.info(f"Created index {index.name}")
+
+
+def run_migrations(engine: Engine) -> None:
+    migrate_traffic_density(engine)
+    create_missing_indexes(engine)
+    rolled_up = backfill_rollups(engine)
+    if rolled_up:
+        logger.info(f"Built traffic rollups from {rolled_up} traffic_density rows")
+    seeded = seed_ledger(engine)
+    if seeded:
+        logger.info(f"Opened the inventory ledger for {seeded} existing items")
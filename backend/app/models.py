@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum as SqlEnum
+from sqlalchemy import BigInteger, Column, Float, Integer, Index, String, ForeignKey, DateTime, Enum as SqlEnum, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
 from .database import Base
+from .services.traffic_cells import cell_key
 
 class VehicleStatus(str, enum.Enum):
     ACTIVE = "active"
@@ -16,6 +17,10 @@ class WorkOrderStatus(str, enum.Enum):
 
 class Vehicle(Base):
     __tablename__ = "vehicles"
+    # Filtered list pages seek (filter, id)
+    __table_args__ = (
+        Index("ix_vehicles_status_id", "status", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     plate = Column(String, unique=True, index=True)
@@ -27,6 +32,12 @@ class Vehicle(Base):
 
 class WorkOrder(Base):
     __tablename__ = "work_orders"
+    # Filtered list pages seek (filter, id)
+    __table_args__ = (
+        Index("ix_work_orders_status_id", "status", "id"),
+        Index("ix_work_orders_vehicle_id_id", "vehicle_id", "id"),
+        Index("ix_work_orders_technician_id_id", "technician_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"))
@@ -45,6 +56,14 @@ class WorkOrder(Base):
 
 class InventoryItem(Base):
     __tablename__ = "inventory_items"
+    # Low-stock set: a partial index the database keeps current on every quantity change
+    __table_args__ = (
+        Index(
+            "ix_inventory_items_low_stock", "id",
+            sqlite_where=text("quantity <= critical_level"),
+            postgresql_where=text("quantity <= critical_level"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -52,6 +71,35 @@ class InventoryItem(Base):
     quantity = Column(Integer, default=0)
     critical_level = Column(Integer, default=5)
 
+class InventoryMovement(Base):
+    """Append-only stock ledger: one row per quantity change, never updated or deleted"""
+    __tablename__ = "inventory_movements"
+    # Item history pages and point-in-time lookups scan (item, id)
+    __table_args__ = (
+        Index("ix_inventory_movements_item_id", "inventory_item_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    inventory_item_id = Column(Integer, ForeignKey("inventory_items.id"), nullable=False)
+    quantity_change = Column(Integer, nullable=False)
+    balance_after = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)  # initial, movement, work_order, stocktake
+    work_order_id = Column(Integer, ForeignKey("work_orders.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class InventoryBalanceSnapshot(Base):
+    """Periodic copies of each item's last ledger balance; they bound point-in-time ledger lookups"""
+    __tablename__ = "inventory_balance_snapshots"
+    __table_args__ = (
+        Index("ix_inventory_balance_snapshots_item_time", "inventory_item_id", "taken_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    inventory_item_id = Column(Integer, ForeignKey("inventory_items.id"), nullable=False)
+    movement_id = Column(Integer, nullable=False, default=0)  # ledger row the quantity was read from
+    quantity = Column(Integer, nullable=False)
+    taken_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class WorkOrderItem(Base):
     __tablename__ = "work_order_items"
 
@@ -63,17 +111,42 @@ class WorkOrderItem(Base):
     work_order = relationship("WorkOrder", back_populates="items")
     inventory_item = relationship("InventoryItem")
 
+def default_cell_key(context):
+    params = context.get_current_parameters()
+    return cell_key(params.get("latitude"), params.get("longitude"))
+
 class TrafficDensity(Base):
     __tablename__ = "traffic_density"
+    # Area + time queries: range scan per grid cell (see services/traffic_cells)
+    __table_args__ = (
+        Index("ix_traffic_density_cell_time", "cell_key", "analyzed_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    latitude = Column(String, index=True)
-    longitude = Column(String, index=True)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    cell_key = Column(BigInteger, default=default_cell_key)  # set on insert; densities are never moved
     density_score = Column(Integer)  # 0-100 scale
     vehicle_count = Column(Integer)
-    analyzed_at = Column(DateTime(timezone=True), server_default=func.now())
+    analyzed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     satellite_image_id = Column(String, nullable=True)  # Sentinel Hub image reference
 
+class TrafficRollupColumns:
+    """Per (time bucket, grid cell) aggregates of traffic_density rows"""
+    bucket = Column(DateTime, primary_key=True)  # bucket start, UTC
+    cell_key = Column(BigInteger, primary_key=True)  # -1 for rows without coordinates
+    record_count = Column(Integer, nullable=False, default=0)
+    density_sum = Column(Integer, nullable=False, default=0)
+    density_min = Column(Integer)
+    density_max = Column(Integer)
+    vehicle_sum = Column(Integer, nullable=False, default=0)
+
+class TrafficRollupHourly(TrafficRollupColumns, Base):
+    __tablename__ = "traffic_rollup_hourly"
+
+class TrafficRollupDaily(TrafficRollupColumns, Base):
+    __tablename__ = "traffic_rollup_daily"
+
 class SatelliteImage(Base):
     __tablename__ = "satellite_images"
 
@@ -0,0 +1,73 @@
+"""
+List Pagination
+Keyset (cursor) paging on an indexed column with first-page count and next-cursor headers
+"""
+from typing import List, Optional
+
+from fastapi import Query, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Response headers (exposed to browsers through CORS in main.py)
+TOTAL_COUNT_HEADER = "X-Total-Count"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PAGE_HEADERS = [TOTAL_COUNT_HEADER, NEXT_CURSOR_HEADER]
+
+
+class PageParams:
+    """
+    Common list query parameters
+
+    Args:
+        after: Cursor from the previous page's X-Next-Cursor header (omit for the first page)
+        limit: Page size
+        count: Send the number of matching rows in X-Total-Count (first page only)
+    """
+
+    def __init__(
+        self,
+        after: Optional[int] = Query(None, description="Cursor returned in X-Next-Cursor"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        count: bool = True,
+    ):
+        self.after = after
+        self.limit = limit
+        self.count = count
+
+
+async def keyset_page(db: AsyncSession, query: Select, key, page: PageParams, response: Response, *options) -> List:
+    """
+    Fetch one page of a filtered query ordered by a unique indexed column
+
+    Rows after the cursor are found with an index seek, so every page costs
+    the same regardless of depth (unlike OFFSET). The total is counted only
+    for the first page: COUNT(*) scans the whole filtered set.
+
+    Args:
+        db: Session
+        query: select() of one entity with its filters applied
+        key: Unique, indexed column to page on (normally the primary key)
+        page: Cursor and page size
+        response: Response receiving the count / next cursor headers
+        options: Loader options for the page's rows
+
+    Returns:
+        Rows of the page
+    """
+    if page.count and page.after is None:
+        total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+
+    if page.after is not None:
+        query = query.where(key > page.after)
+    # One extra row tells whether another page follows
+    rows = (await db.scalars(query.order_by(key).limit(page.limit + 1).options(*options))).all()
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(getattr(rows[-1], key.key))
+    return rows
@@ -0,0 +1,262 @@
+"""
+CityIO Router
+CityIO compatible table API served from the FastAPI app, backed by the shared in-memory table store
+"""
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+import asyncio
+import os
+
+from ..services import cityio
+from ..services.cityio import SCENARIO_COLUMNS, TableError
+from ..services.single_flight import SingleFlight
+
+
+router = APIRouter(
+    prefix="/api",
+    tags=["cityio"],
+)
+
+# Table loading, edits and analyses run here so the event loop stays free;
+# threads (not processes) because the tables live in this process's memory
+CITYIO_WORKERS = int(os.getenv('CITYIO_WORKERS', min(8, os.cpu_count() or 1)))
+worker_pool = ThreadPoolExecutor(max_workers=CITYIO_WORKERS, thread_name_prefix='cityio')
+
+
+async def offload(fn, *args, **kwargs):
+    """Run a table operation in the worker pool, mapping TableError to HTTPException"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(worker_pool, partial(fn, *args, **kwargs))
+    except TableError as e:
+        raise HTTPException(status_code=e.status, detail=e.message)
+
+
+# Identical analysis requests in flight at the same time await one worker call
+# (the service layer additionally caches results per data version)
+analysis_flights = SingleFlight()
+
+
+async def coalesce(table_name: str, params: tuple, fn, *args, **kwargs):
+    """
+    offload() shared by concurrent requests with the same endpoint and parameters
+
+    The key includes the table's data version, so a request arriving after
+    an edit never joins a computation that started before it.
+    """
+    key = (table_name, *params, await offload(cityio.data_version, table_name))
+    try:
+        return await analysis_flights.do_async(key, partial(fn, *args, **kwargs), worker_pool)
+    except TableError as e:
+        raise HTTPException(status_code=e.status, detail=e.message)
+
+
+def shutdown_workers():
+    worker_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_json(value, headers: Optional[dict] = None) -> StreamingResponse:
+    """
+    Stream a (large) JSON document in chunks; encoding runs off the event loop
+
+    The body is encoded after the request has left the table lock, so value
+    must be a snapshot (cityio.table_snapshot), never the live table.
+    """
+    return StreamingResponse(cityio.iter_json(value), media_type="application/json", headers=headers)
+
+
+def conditional(request: Request, content: bytes, media_type: str, etag: str, headers: Optional[dict] = None) -> Response:
+    """Binary response with an ETag, or 304 when the client already has it"""
+    etag = f'"{etag}"'
+    headers = {'ETag': etag, **(headers or {})}
+    if etag in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+    return Response(content, media_type=media_type, headers=headers)
+
+
+@router.get("/tables/list")
+async def list_tables():
+    """List all available tables"""
+    return cityio.list_tables()
+
+
+@router.get("/tables/status")
+async def tables_status():
+    """Loaded tables, their estimated memory use and the eviction budget"""
+    return cityio.tables.status()
+
+
+@router.get("/table/konya/transport/bikes")
+async def get_konya_bikes():
+    """Bike station locations converted from CSV to GeoJSON"""
+    return JSONResponse(await offload(cityio.bike_stations))
+
+
+@router.get("/table/{table_name}")
+async def get_table(table_name: str):
+    """Get complete table data (streamed)"""
+    return stream_json(await offload(cityio.table_snapshot, table_name))
+
+
+@router.get("/table/{table_name}/header")
+async def get_header(table_name: str):
+    table = await offload(cityio.require_table, table_name)
+    return JSONResponse(table.get('header', {}))
+
+
+@router.get("/table/{table_name}/geogrid")
+async def get_geogrid(table_name: str):
+    """Get geogrid data (streamed)"""
+    return stream_json(await offload(cityio.table_snapshot, table_name, 'geogrid'))
+
+
+@router.get("/table/{table_name}/indicators")
+async def get_indicators(table_name: str):
+    table = await offload(cityio.require_table, table_name)
+    return JSONResponse(table.get('indicators', []))
+
+
+async def layer_response(table_name: str, layer: str, zoom: Optional[float] = None):
+    """Stream a layer, simplified for zoom when one is given"""
+    data, band = await offload(cityio.layer_data, table_name, layer, zoom)
+    return stream_json(data, headers={'X-LOD-Band': band} if band else None)
+
+
+@router.get("/table/{table_name}/buildings")
+async def get_buildings(table_name: str, zoom: Optional[float] = None):
+    """Get buildings data (simplified for ?zoom= below full detail)"""
+    return await layer_response(table_name, 'buildings', zoom)
+
+
+@router.get("/table/{table_name}/pois")
+async def get_pois(table_name: str):
+    return await layer_response(table_name, 'pois')
+
+
+@router.get("/table/{table_name}/roads")
+async def get_roads(table_name: str, zoom: Optional[float] = None):
+    """Get roads data (simplified for ?zoom= below full detail)"""
+    return await layer_response(table_name, 'roads', zoom)
+
+
+@router.get("/table/{table_name}/buildings/mesh")
+async def get_buildings_mesh_index(table_name: str):
+    """List the 3D mesh batches (per mahalle or tile) of a table's buildings"""
+    return JSONResponse(await offload(cityio.mesh_index, table_name))
+
+
+@router.get("/table/{table_name}/buildings/mesh/{batch:path}.glb")
+async def get_buildings_mesh(table_name: str, batch: str, request: Request):
+    """Binary glTF mesh of one building batch"""
+    glb, etag = await offload(cityio.mesh_batch, table_name, batch)
+    return conditional(request, glb, 'model/gltf-binary', etag, {'Cache-Control': 'no-cache'})
+
+
+# ============================================
+# Edits
+# ============================================
+
+@router.post("/table/{table_name}/geogrid")
+async def update_geogrid(table_name: str, request: Request):
+    """Update geogrid data (for interactive changes)"""
+    data = await request.json()
+    return JSONResponse(await offload(cityio.update_geogrid, table_name, data))
+
+
+@router.post("/table/{table_name}/scenario")
+async def apply_scenario(table_name: str, request: Request):
+    """Apply a predefined scenario"""
+    data = await request.json()
+    return JSONResponse(await offload(cityio.apply_scenario, table_name, data.get('scenario', 'current')))
+
+
+@router.post("/table/{table_name}/undo")
+async def undo_edit(table_name: str):
+    return JSONResponse(await offload(cityio.history_step, table_name, 'undo'))
+
+
+@router.post("/table/{table_name}/redo")
+async def redo_edit(table_name: str):
+    return JSONResponse(await offload(cityio.history_step, table_name, 'redo'))
+
+
+@router.get("/table/{table_name}/history")
+async def get_history(table_name: str):
+    return JSONResponse(await offload(cityio.history_status, table_name))
+
+
+@router.post("/table/{table_name}/checkpoint")
+async def checkpoint_table(table_name: str):
+    return JSONResponse(await offload(cityio.checkpoint, table_name))
+
+
+# ============================================
+# Analyses
+# ============================================
+
+@router.get("/table/{table_name}/compare")
+async def compare_scenarios(
+    table_name: str,
+    b: Optional[str] = None,
+    a: str = 'current',
+    properties: str = ','.join(SCENARIO_COLUMNS),
+    threshold: float = 0.0
+):
+    """Cell-wise comparison of two scenarios or two geogrid versions ('v:<n>')"""
+    return JSONResponse(await coalesce(
+        table_name, ('compare', a, b, properties, threshold),
+        cityio.compare, table_name, a, b, [p for p in properties.split(',') if p], threshold
+    ))
+
+
+@router.get("/table/{table_name}/analyze/walkability")
+async def analyze_walkability(table_name: str):
+    return JSONResponse(await coalesce(table_name, ('walkability',), cityio.analyze_walkability, table_name))
+
+
+@router.get("/table/{table_name}/analyze/density")
+async def analyze_density(table_name: str):
+    return JSONResponse(await coalesce(table_name, ('density',), cityio.analyze_density, table_name))
+
+
+@router.get("/table/{table_name}/analyze/bike-coverage")
+async def analyze_bike_coverage(
+    table_name: str,
+    mode: str = 'nearest',
+    radius: float = 500,
+    people_per_dock: float = 100
+):
+    """Bike station catchment and dock capacity analysis"""
+    return JSONResponse(await coalesce(
+        table_name, ('bike_coverage', mode, radius, people_per_dock),
+        cityio.analyze_bike_coverage, table_name, mode=mode, radius=radius, people_per_dock=people_per_dock
+    ))
+
+
+# The image route must precede the info route, whose {prop} would also match "x.png"
+@router.get("/table/{table_name}/heatmap/{prop}.{image_format}")
+async def get_heatmap_image(
+    table_name: str,
+    prop: str,
+    image_format: str,
+    request: Request,
+    colormap: Optional[str] = None,
+    vmin: Optional[float] = None,
+    vmax: Optional[float] = None,
+    scale: int = 1
+):
+    """Grid property rendered as one georeferenced image (one pixel per cell)"""
+    image, bounds, etag = await offload(
+        cityio.heatmap_image, table_name, prop, image_format,
+        colormap=colormap, vmin=vmin, vmax=vmax, scale=scale
+    )
+    return conditional(request, image, f'image/{image_format}', etag, {'X-Image-Bounds': bounds})
+
+
+@router.get("/table/{table_name}/heatmap/{prop}")
+async def get_heatmap_info(table_name: str, prop: str, colormap: Optional[str] = None):
+    """Georeferencing, value domain and legend of a grid property heatmap"""
+    return JSONResponse(await offload(cityio.heatmap_info, table_name, prop, colormap))
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict
 import random
 import math
@@ -11,23 +12,16 @@ router = APIRouter(
     tags=["digital-twin"],
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Mock Konya Coordinates (Center approx)
 KONYA_LAT = 37.8716
 KONYA_LON = 32.4851
 
 @router.get("/vehicles")
-def get_live_vehicles(db: Session = Depends(get_db)):
+async def get_live_vehicles(db: AsyncSession = Depends(database.get_read_db)):
     """
     Returns vehicles with simulated GPS coordinates and status.
     """
-    vehicles = db.query(models.Vehicle).filter(models.Vehicle.status == models.VehicleStatus.ACTIVE).all()
+    vehicles = await db.scalars(select(models.Vehicle).filter(models.Vehicle.status == models.VehicleStatus.ACTIVE))
     
     response = []
     for v in vehicles:
@@ -1,31 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
+from datetime import datetime
 from pydantic import BaseModel
+import asyncio
+import json
 from .. import models, schemas, database
+from ..bulk import CSV_BODY, achunked, add_error, import_rows, iter_csv_rows, iter_json_rows, numbered, validate_rows
+from ..pagination import PageParams, keyset_page
+from ..services import stock_ledger
+from ..services.stock_alerts import broker
+from ..services.traffic_rollups import to_utc_naive
 
 router = APIRouter(
     prefix="/inventory",
     tags=["inventory"],
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 class StockMovement(BaseModel):
     sku: str
     quantity_change: int # Can be negative for removal
 
+# Matches the ix_inventory_items_low_stock partial index condition
+LOW_STOCK = models.InventoryItem.quantity <= models.InventoryItem.critical_level
+
+# Comment line sent on idle alert streams so proxies keep them open
+SSE_HEARTBEAT_SECONDS = 15
+
 @router.post("/", response_model=schemas.InventoryItem)
-def create_item(item: schemas.InventoryItemCreate, db: Session = Depends(get_db)):
-    db_item = db.query(models.InventoryItem).filter(models.InventoryItem.sku == item.sku).first()
+async def create_item(item: schemas.InventoryItemCreate, db: AsyncSession = Depends(database.get_db)):
+    db_item = await db.scalar(select(models.InventoryItem).filter(models.InventoryItem.sku == item.sku))
     if db_item:
         raise HTTPException(status_code=400, detail="Item with this SKU already exists")
-    
+
     new_item = models.InventoryItem(
         name=item.name,
         sku=item.sku,
@@ -33,26 +42,179 @@ def create_item(item: schemas.InventoryItemCreate, db: Session = Depends(get_db)
         critical_level=item.critical_level
     )
     db.add(new_item)
-    db.commit()
-    db.refresh(new_item)
+    await db.flush()
+    await stock_ledger.record_balances(db, [new_item], "initial")
+    await db.commit()
+    await db.refresh(new_item)
     return new_item
 
+async def record_imported_balances(db: AsyncSession, rows) -> None:
+    await stock_ledger.record_balances(db, rows, "import")
+
+async def import_items(db: AsyncSession, rows, upsert: bool) -> schemas.BulkResult:
+    return await import_rows(
+        db, rows, models.InventoryItem, schemas.InventoryItemCreate,
+        key="sku", update_columns=["name", "quantity", "critical_level"], upsert=upsert,
+        returning=["id", "name", "quantity", "critical_level"], on_write=record_imported_balances
+    )
+
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_import_items(rows: List[Dict[str, Any]], upsert: bool = False, db: AsyncSession = Depends(database.get_db)):
+    """Create many items from a JSON array (upsert overwrites existing SKUs, e.g. for a stocktake)"""
+    return await import_items(db, iter_json_rows(rows), upsert)
+
+@router.post("/bulk/csv", response_model=schemas.BulkResult, openapi_extra=CSV_BODY)
+async def bulk_import_items_csv(request: Request, upsert: bool = False, db: AsyncSession = Depends(database.get_db)):
+    """Create many items from a CSV body with a name,sku,quantity[,critical_level] header"""
+    return await import_items(db, iter_csv_rows(request), upsert)
+
 @router.get("/", response_model=List[schemas.InventoryItem])
-def read_inventory(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    items = db.query(models.InventoryItem).offset(skip).limit(limit).all()
-    return items
+async def read_inventory(
+    response: Response,
+    low_stock: Optional[bool] = None,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    query = select(models.InventoryItem)
+    if low_stock is not None:
+        query = query.filter(LOW_STOCK if low_stock else ~LOW_STOCK)
+    return await keyset_page(db, query, models.InventoryItem.id, page, response)
+
+@router.get("/low-stock", response_model=List[schemas.InventoryItem])
+async def read_low_stock(
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    """Items at or below their critical level, read from the low-stock partial index"""
+    query = select(models.InventoryItem).filter(LOW_STOCK)
+    return await keyset_page(db, query, models.InventoryItem.id, page, response)
+
+@router.get("/low-stock/stream")
+async def stream_low_stock_alerts(request: Request):
+    """
+    Server-sent events for items crossing their critical level
+
+    Each event is named low_stock or restocked and carries the item as JSON.
+    """
+    async def events():
+        queue = broker.subscribe()
+        try:
+            while not await request.is_disconnected():
+                try:
+                    alert = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {alert['event']}\ndata: {json.dumps(alert)}\n\n"
+        finally:
+            broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/low-stock/ws")
+async def low_stock_alerts_socket(websocket: WebSocket):
+    """WebSocket variant of the low-stock alert stream (one JSON message per alert)"""
+    await websocket.accept()
+    queue = broker.subscribe()
+    receiving = asyncio.create_task(websocket.receive())
+    try:
+        while True:
+            waiting = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({receiving, waiting}, return_when=asyncio.FIRST_COMPLETED)
+            if waiting in done:
+                await websocket.send_json(waiting.result())
+            else:
+                waiting.cancel()
+            if receiving in done:
+                # Client messages are ignored; only a disconnect matters
+                if receiving.result()["type"] == "websocket.disconnect":
+                    break
+                receiving = asyncio.create_task(websocket.receive())
+    finally:
+        receiving.cancel()
+        broker.unsubscribe(queue)
 
 @router.post("/movement", response_model=schemas.InventoryItem)
-def stock_movement(movement: StockMovement, db: Session = Depends(get_db)):
-    item = db.query(models.InventoryItem).filter(models.InventoryItem.sku == movement.sku).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-        
-    new_qty = item.quantity + movement.quantity_change
-    if new_qty < 0:
+async def stock_movement(movement: StockMovement, db: AsyncSession = Depends(database.get_db)):
+    item = await stock_ledger.change_stock(
+        db, movement.quantity_change, "movement", models.InventoryItem.sku == movement.sku
+    )
+    if item is None:
+        if not await db.scalar(select(models.InventoryItem.id).filter(models.InventoryItem.sku == movement.sku)):
+            raise HTTPException(status_code=404, detail="Item not found")
         raise HTTPException(status_code=400, detail="Insufficient stock for this operation")
-        
-    item.quantity = new_qty
-    db.commit()
-    db.refresh(item)
+
+    await db.commit()
     return item
+
+@router.get("/{item_id}/movements", response_model=List[schemas.InventoryMovement])
+async def read_item_movements(
+    item_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    """Ledger of an item's stock changes, oldest first"""
+    query = select(models.InventoryMovement).filter(models.InventoryMovement.inventory_item_id == item_id)
+    return await keyset_page(db, query, models.InventoryMovement.id, page, response)
+
+@router.get("/{item_id}/balance", response_model=schemas.InventoryBalance)
+async def read_item_balance(item_id: int, at: Optional[datetime] = None, db: AsyncSession = Depends(database.get_read_db)):
+    """Quantity of an item at a moment (UTC, default now), read from the ledger"""
+    if not await db.get(models.InventoryItem, item_id):
+        raise HTTPException(status_code=404, detail="Item not found")
+    at = to_utc_naive(at) if at else datetime.utcnow()
+    return {
+        "inventory_item_id": item_id,
+        "at": at,
+        "quantity": await stock_ledger.balance_at(db, item_id, at),
+    }
+
+async def apply_movements(db: AsyncSession, rows) -> schemas.BulkResult:
+    """
+    Apply stock movements in chunks
+
+    Unknown SKUs are found with one query per chunk. Each movement is then a
+    conditional UPDATE (so concurrent consumers are never overdrawn), and the
+    chunk's ledger rows are written with one executemany INSERT before its
+    commit. Rows that are invalid, name an unknown SKU, or would take stock
+    below zero are reported and skipped.
+    """
+    result = schemas.BulkResult()
+    item = models.InventoryItem
+
+    async for chunk in achunked(numbered(rows)):
+        result.received += len(chunk)
+        movements = validate_rows(chunk, StockMovement, result)
+        known = set(await db.scalars(select(item.sku).where(item.sku.in_({m.sku for _, m in movements}))))
+
+        entries = []
+        for number, movement in movements:
+            if movement.sku not in known:
+                add_error(result, number, movement.sku, "Item not found")
+            elif await stock_ledger.change_stock(
+                db, movement.quantity_change, "movement", item.sku == movement.sku, entries=entries
+            ) is None:
+                add_error(result, number, movement.sku, "Insufficient stock for this operation")
+            else:
+                result.updated += 1
+
+        await stock_ledger.append(db, entries)
+        await db.commit()
+
+    return result
+
+@router.post("/movements/bulk", response_model=schemas.BulkResult)
+async def bulk_stock_movements(rows: List[Dict[str, Any]], db: AsyncSession = Depends(database.get_db)):
+    """Apply many stock movements from a JSON array of {sku, quantity_change}"""
+    return await apply_movements(db, iter_json_rows(rows))
+
+@router.post("/movements/bulk/csv", response_model=schemas.BulkResult, openapi_extra=CSV_BODY)
+async def bulk_stock_movements_csv(request: Request, db: AsyncSession = Depends(database.get_db)):
+    """Apply many stock movements from a CSV body with a sku,quantity_change header"""
+    return await apply_movements(db, iter_csv_rows(request))
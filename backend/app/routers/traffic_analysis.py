@@ -2,16 +2,23 @@
 Traffic Analysis Router
 API endpoints for satellite-based traffic density analysis
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
+from functools import partial
 import json
+import os
 import numpy as np
 
 from .. import models, schemas, database
 from ..services.sentinel_service import SentinelHubService
 from ..services.yolo_service import VehicleDetectionService
+from ..services.single_flight import SingleFlight
+from ..services.traffic_cells import cells_in_bbox, cell_key
+from ..services import traffic_rollups
 
 
 router = APIRouter(
@@ -20,12 +27,9 @@ router = APIRouter(
 )
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Concurrent dashboard refreshes share one summary query; results are reused briefly
+TRAFFIC_SUMMARY_TTL = float(os.getenv("TRAFFIC_SUMMARY_TTL", 10))
+summary_flights = SingleFlight(ttl=TRAFFIC_SUMMARY_TTL)
 
 
 # Initialize services (will be loaded on first use)
@@ -56,9 +60,9 @@ def get_yolo_service():
 
 
 @router.get("/density/latest", response_model=List[schemas.TrafficDensity])
-def get_latest_traffic_density(
+async def get_latest_traffic_density(
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(database.get_read_db)
 ):
     """
     Get the most recent traffic density data
@@ -66,24 +70,23 @@ def get_latest_traffic_density(
     Args:
         limit: Maximum number of records to return
     """
-    densities = (
-        db.query(models.TrafficDensity)
+    densities = await db.scalars(
+        select(models.TrafficDensity)
         .order_by(models.TrafficDensity.analyzed_at.desc())
         .limit(limit)
-        .all()
     )
 
-    return densities
+    return densities.all()
 
 
 @router.get("/density/area")
-def get_traffic_density_by_area(
+async def get_traffic_density_by_area(
     min_lon: float,
     min_lat: float,
     max_lon: float,
     max_lat: float,
     hours: int = 24,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(database.get_read_db)
 ):
     """
     Get traffic density data for a specific area and time range
@@ -94,26 +97,25 @@ def get_traffic_density_by_area(
     """
     cutoff_time = datetime.utcnow() - timedelta(hours=hours)
 
-    densities = (
-        db.query(models.TrafficDensity)
-        .filter(
-            models.TrafficDensity.analyzed_at >= cutoff_time,
-            models.TrafficDensity.longitude >= str(min_lon),
-            models.TrafficDensity.longitude <= str(max_lon),
-            models.TrafficDensity.latitude >= str(min_lat),
-            models.TrafficDensity.latitude <= str(max_lat),
-        )
-        .all()
+    query = select(models.TrafficDensity).filter(
+        models.TrafficDensity.analyzed_at >= cutoff_time,
+        models.TrafficDensity.longitude.between(min_lon, max_lon),
+        models.TrafficDensity.latitude.between(min_lat, max_lat),
     )
+    # Narrow to the bbox's grid cells first so the (cell_key, analyzed_at) index is used
+    cells = cells_in_bbox(min_lon, min_lat, max_lon, max_lat)
+    if cells is not None:
+        query = query.filter(models.TrafficDensity.cell_key.in_(cells))
 
-    return densities
+    densities = await db.scalars(query)
+    return densities.all()
 
 
 @router.get("/satellite/images", response_model=List[schemas.SatelliteImage])
-def get_satellite_images(
+async def get_satellite_images(
     limit: int = 10,
     status: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(database.get_read_db)
 ):
     """
     Get list of processed satellite images
@@ -122,30 +124,26 @@ def get_satellite_images(
         limit: Maximum number of records
         status: Filter by processing status (pending, processing, completed, failed)
     """
-    query = db.query(models.SatelliteImage)
+    query = select(models.SatelliteImage)
 
     if status:
         query = query.filter(models.SatelliteImage.processing_status == status)
 
-    images = query.order_by(models.SatelliteImage.processed_at.desc()).limit(limit).all()
+    images = await db.scalars(query.order_by(models.SatelliteImage.processed_at.desc()).limit(limit))
 
-    return images
+    return images.all()
 
 
 @router.post("/analyze/trigger")
 async def trigger_traffic_analysis(
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks
 ):
     """
     Manually trigger traffic analysis from satellite imagery
     This will run in the background
     """
-    # Add background task
-    background_tasks.add_task(
-        process_satellite_image,
-        db_session=db
-    )
+    # Add background task (opens its own session; the request's is closed by then)
+    background_tasks.add_task(process_satellite_image)
 
     return {
         "status": "started",
@@ -159,8 +157,7 @@ async def analyze_custom_area(
     min_lat: float,
     max_lon: float,
     max_lat: float,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks
 ):
     """
     Analyze traffic in a custom area
@@ -173,8 +170,7 @@ async def analyze_custom_area(
         min_lon=min_lon,
         min_lat=min_lat,
         max_lon=max_lon,
-        max_lat=max_lat,
-        db_session=db
+        max_lat=max_lat
     )
 
     return {
@@ -185,9 +181,9 @@ async def analyze_custom_area(
 
 
 @router.get("/stats/summary")
-def get_traffic_summary(
+async def get_traffic_summary(
     hours: int = 24,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(database.get_read_db)
 ):
     """
     Get summary statistics for traffic analysis
@@ -195,41 +191,68 @@ def get_traffic_summary(
     Args:
         hours: Time range for statistics
     """
+    # The newest record id versions the data: a new analysis run changes the key
+    latest_id = await db.scalar(select(func.max(models.TrafficDensity.id)))
+    return await summary_flights.do_async(
+        ("traffic_summary", hours, latest_id),
+        partial(compute_traffic_summary, hours)
+    )
+
+
+async def compute_traffic_summary(hours: int) -> Dict:
+    """Shared by coalesced requests, so it opens its own session instead of using the leader's"""
     cutoff_time = datetime.utcnow() - timedelta(hours=hours)
 
-    # Get recent densities
-    densities = (
-        db.query(models.TrafficDensity)
-        .filter(models.TrafficDensity.analyzed_at >= cutoff_time)
-        .all()
-    )
+    # Whole hours come from the hourly rollup, the partial first hour from one raw aggregate
+    async with database.ReadSessionLocal() as db:
+        count, density_sum, density_min, density_max, vehicle_sum = await traffic_rollups.window_totals(db, cutoff_time)
 
-    if not densities:
+    if not count:
         return {
             "message": "No traffic data available",
             "total_records": 0
         }
 
-    # Calculate statistics
-    density_scores = [d.density_score for d in densities]
-    vehicle_counts = [d.vehicle_count for d in densities]
-
     return {
         "time_range_hours": hours,
-        "total_records": len(densities),
-        "avg_density_score": sum(density_scores) / len(density_scores),
-        "max_density_score": max(density_scores),
-        "min_density_score": min(density_scores),
-        "total_vehicles_detected": sum(vehicle_counts),
-        "avg_vehicles_per_area": sum(vehicle_counts) / len(vehicle_counts),
+        "total_records": count,
+        "avg_density_score": density_sum / count,
+        "max_density_score": density_max,
+        "min_density_score": density_min,
+        "total_vehicles_detected": vehicle_sum,
+        "avg_vehicles_per_area": vehicle_sum / count,
     }
 
 
+@router.get("/stats/trend", response_model=List[schemas.TrafficTrendPoint])
+async def get_traffic_trend(
+    hours: int = 24,
+    granularity: str = Query("hour", pattern="^(hour|day)$"),
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    """
+    Get traffic statistics per hour or day, read from the rollup tables
+
+    Args:
+        hours: Time range for statistics
+        granularity: Bucket size (hour or day)
+        latitude, longitude: Restrict to the grid cell containing this point
+    """
+    cell = cell_key(latitude, longitude)
+    since = datetime.utcnow() - timedelta(hours=hours)
+    return await traffic_rollups.trend(db, since, granularity, cell)
+
+
 # Background task functions
-def process_satellite_image(db_session: Session):
+def process_satellite_image(db_session: Optional[Session] = None):
     """
     Background task to fetch and analyze satellite imagery
     """
+    own_session = db_session is None
+    if own_session:
+        db_session = database.SessionLocal()
     try:
         # Get services
         sentinel = get_sentinel_service()
@@ -265,8 +288,8 @@ def process_satellite_image(db_session: Session):
         center_lat = (bbox[1] + bbox[3]) / 2
 
         traffic_density = models.TrafficDensity(
-            latitude=str(center_lat),
-            longitude=str(center_lon),
+            latitude=center_lat,
+            longitude=center_lon,
             density_score=density_score,
             vehicle_count=vehicle_count,
             satellite_image_id=image_id
@@ -284,17 +307,24 @@ def process_satellite_image(db_session: Session):
         print(f"❌ Traffic analysis failed: {str(e)}")
         raise
 
+    finally:
+        if own_session:
+            db_session.close()
+
 
 def process_custom_area(
     min_lon: float,
     min_lat: float,
     max_lon: float,
     max_lat: float,
-    db_session: Session
+    db_session: Optional[Session] = None
 ):
     """
     Background task to analyze custom area
     """
+    own_session = db_session is None
+    if own_session:
+        db_session = database.SessionLocal()
     try:
         sentinel = get_sentinel_service()
         yolo = get_yolo_service()
@@ -326,8 +356,8 @@ def process_custom_area(
             cell_lat = min_lat + (max_lat - min_lat) * (cell["row"] + 0.5) / 4
 
             traffic_density = models.TrafficDensity(
-                latitude=str(cell_lat),
-                longitude=str(cell_lon),
+                latitude=cell_lat,
+                longitude=cell_lon,
                 density_score=cell["density_score"],
                 vehicle_count=cell["vehicle_count"],
                 satellite_image_id=image_id
@@ -348,3 +378,7 @@ def process_custom_area(
             db_session.commit()
         print(f"❌ Custom area analysis failed: {str(e)}")
         raise
+
+    finally:
+        if own_session:
+            db_session.close()
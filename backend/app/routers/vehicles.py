@@ -1,26 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
 from .. import models, schemas, database
+from ..bulk import CSV_BODY, import_rows, iter_csv_rows, iter_json_rows
+from ..pagination import PageParams, keyset_page
 
 router = APIRouter(
     prefix="/vehicles",
     tags=["vehicles"],
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/", response_model=schemas.Vehicle)
-def create_vehicle(vehicle: schemas.VehicleCreate, db: Session = Depends(get_db)):
-    db_vehicle = db.query(models.Vehicle).filter(models.Vehicle.plate == vehicle.plate).first()
+async def create_vehicle(vehicle: schemas.VehicleCreate, db: AsyncSession = Depends(database.get_db)):
+    db_vehicle = await db.scalar(select(models.Vehicle).filter(models.Vehicle.plate == vehicle.plate))
     if db_vehicle:
         raise HTTPException(status_code=400, detail="Vehicle with this plate already registered")
-    
+
     new_vehicle = models.Vehicle(
         plate=vehicle.plate,
         brand=vehicle.brand,
@@ -28,18 +24,41 @@ def create_vehicle(vehicle: schemas.VehicleCreate, db: Session = Depends(get_db)
         status=vehicle.status
     )
     db.add(new_vehicle)
-    db.commit()
-    db.refresh(new_vehicle)
+    await db.commit()
+    await db.refresh(new_vehicle)
     return new_vehicle
 
+async def import_vehicles(db: AsyncSession, rows, upsert: bool) -> schemas.BulkResult:
+    return await import_rows(
+        db, rows, models.Vehicle, schemas.VehicleCreate,
+        key="plate", update_columns=["brand", "model", "status"], upsert=upsert
+    )
+
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_import_vehicles(rows: List[Dict[str, Any]], upsert: bool = False, db: AsyncSession = Depends(database.get_db)):
+    """Register many vehicles from a JSON array (upsert updates existing plates)"""
+    return await import_vehicles(db, iter_json_rows(rows), upsert)
+
+@router.post("/bulk/csv", response_model=schemas.BulkResult, openapi_extra=CSV_BODY)
+async def bulk_import_vehicles_csv(request: Request, upsert: bool = False, db: AsyncSession = Depends(database.get_db)):
+    """Register many vehicles from a CSV body with a plate,brand,model[,status] header"""
+    return await import_vehicles(db, iter_csv_rows(request), upsert)
+
 @router.get("/", response_model=List[schemas.Vehicle])
-def read_vehicles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    vehicles = db.query(models.Vehicle).offset(skip).limit(limit).all()
-    return vehicles
+async def read_vehicles(
+    response: Response,
+    status: Optional[models.VehicleStatus] = None,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    query = select(models.Vehicle)
+    if status:
+        query = query.filter(models.Vehicle.status == status)
+    return await keyset_page(db, query, models.Vehicle.id, page, response)
 
 @router.get("/{plate}", response_model=schemas.Vehicle)
-def read_vehicle(plate: str, db: Session = Depends(get_db)):
-    vehicle = db.query(models.Vehicle).filter(models.Vehicle.plate == plate).first()
+async def read_vehicle(plate: str, db: AsyncSession = Depends(database.get_read_db)):
+    vehicle = await db.scalar(select(models.Vehicle).filter(models.Vehicle.plate == plate))
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     return vehicle
@@ -1,29 +1,52 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 from pydantic import BaseModel
 from .. import models, schemas, database
+from ..pagination import PageParams, keyset_page
+from ..services import stock_ledger
 
 router = APIRouter(
     prefix="/work-orders",
     tags=["work-orders"],
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_work_order(db: AsyncSession, wo_id: int, *options) -> models.WorkOrder:
+    wo = await db.scalar(select(models.WorkOrder).filter(models.WorkOrder.id == wo_id).options(*options))
+    if not wo:
+        raise HTTPException(status_code=404, detail="Work Order not found")
+    return wo
+
+# Relations that ?expand= can embed, each loaded for the whole page in one query
+EXPANSIONS = {
+    "vehicle": joinedload(models.WorkOrder.vehicle),
+    "items": selectinload(models.WorkOrder.items).joinedload(models.WorkOrderItem.inventory_item),
+}
+
+def parse_expand(expand: Optional[str] = Query(None, description="Comma separated: vehicle, items")) -> Set[str]:
+    fields = {field.strip() for field in (expand or "").split(",") if field.strip()}
+    unknown = fields - EXPANSIONS.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown expand field(s): {', '.join(sorted(unknown))}")
+    return fields
+
+def work_order_view(wo: models.WorkOrder, expand: Set[str]) -> Dict:
+    """Work order fields plus the expanded relations only (others stay out of the response)"""
+    view = schemas.WorkOrder.model_validate(wo).model_dump()
+    for field in expand:
+        view[field] = getattr(wo, field)
+    return view
 
 class PartRequest(BaseModel):
     inventory_item_id: int
     quantity: int
 
 @router.post("/", response_model=schemas.WorkOrder)
-def create_work_order(work_order: schemas.WorkOrderCreate, db: Session = Depends(get_db)):
-    vehicle = db.query(models.Vehicle).filter(models.Vehicle.plate == work_order.vehicle_plate).first()
+async def create_work_order(work_order: schemas.WorkOrderCreate, db: AsyncSession = Depends(database.get_db)):
+    vehicle = await db.scalar(select(models.Vehicle).filter(models.Vehicle.plate == work_order.vehicle_plate))
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found")
 
@@ -37,35 +60,59 @@ def create_work_order(work_order: schemas.WorkOrderCreate, db: Session = Depends
     
     vehicle.status = models.VehicleStatus.MAINTENANCE
     
-    db.commit()
-    db.refresh(new_wo)
+    await db.commit()
+    await db.refresh(new_wo)
     return new_wo
 
-@router.get("/", response_model=List[schemas.WorkOrder])
-def read_work_orders(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    wos = db.query(models.WorkOrder).offset(skip).limit(limit).all()
-    return wos
+@router.get("/", response_model=List[schemas.WorkOrderDetail], response_model_exclude_unset=True)
+async def read_work_orders(
+    response: Response,
+    status: Optional[models.WorkOrderStatus] = None,
+    vehicle_id: Optional[int] = None,
+    vehicle_plate: Optional[str] = None,
+    technician_id: Optional[int] = None,
+    expand: Set[str] = Depends(parse_expand),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    query = select(models.WorkOrder)
+    if status:
+        query = query.filter(models.WorkOrder.status == status)
+    if vehicle_id is not None:
+        query = query.filter(models.WorkOrder.vehicle_id == vehicle_id)
+    if vehicle_plate:
+        query = query.join(models.WorkOrder.vehicle).filter(models.Vehicle.plate == vehicle_plate)
+    if technician_id is not None:
+        query = query.filter(models.WorkOrder.technician_id == technician_id)
+    options = [EXPANSIONS[field] for field in expand]
+    wos = await keyset_page(db, query, models.WorkOrder.id, page, response, *options)
+    return [work_order_view(wo, expand) for wo in wos]
+
+@router.get("/{wo_id}", response_model=schemas.WorkOrderDetail, response_model_exclude_unset=True)
+async def read_work_order(
+    wo_id: int,
+    expand: Set[str] = Depends(parse_expand),
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    wo = await get_work_order(db, wo_id, *[EXPANSIONS[field] for field in expand])
+    return work_order_view(wo, expand)
 
 @router.put("/{wo_id}/status", response_model=schemas.WorkOrder)
-def update_work_order_status(wo_id: int, status: schemas.WorkOrderStatus, db: Session = Depends(get_db)):
-    wo = db.query(models.WorkOrder).filter(models.WorkOrder.id == wo_id).first()
-    if not wo:
-        raise HTTPException(status_code=404, detail="Work Order not found")
+async def update_work_order_status(wo_id: int, status: schemas.WorkOrderStatus, db: AsyncSession = Depends(database.get_db)):
+    wo = await get_work_order(db, wo_id, selectinload(models.WorkOrder.vehicle))
     
     wo.status = status
     if status == models.WorkOrderStatus.COMPLETED:
         wo.completed_at = datetime.now()
         wo.vehicle.status = models.VehicleStatus.ACTIVE
     
-    db.commit()
-    db.refresh(wo)
+    await db.commit()
+    await db.refresh(wo)
     return wo
 
 @router.post("/{wo_id}/start", response_model=schemas.WorkOrder)
-def start_work_order(wo_id: int, db: Session = Depends(get_db)):
-    wo = db.query(models.WorkOrder).filter(models.WorkOrder.id == wo_id).first()
-    if not wo:
-        raise HTTPException(status_code=404, detail="Work Order not found")
+async def start_work_order(wo_id: int, db: AsyncSession = Depends(database.get_db)):
+    wo = await get_work_order(db, wo_id)
     
     if wo.status == models.WorkOrderStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Cannot start completed job")
@@ -73,40 +120,37 @@ def start_work_order(wo_id: int, db: Session = Depends(get_db)):
     wo.status = models.WorkOrderStatus.IN_PROGRESS
     wo.last_started_at = datetime.now()
     
-    db.commit()
-    db.refresh(wo)
+    await db.commit()
+    await db.refresh(wo)
     return wo
 
 @router.post("/{wo_id}/stop", response_model=schemas.WorkOrder)
-def stop_work_order(wo_id: int, db: Session = Depends(get_db)):
-    wo = db.query(models.WorkOrder).filter(models.WorkOrder.id == wo_id).first()
-    if not wo:
-        raise HTTPException(status_code=404, detail="Work Order not found")
+async def stop_work_order(wo_id: int, db: AsyncSession = Depends(database.get_db)):
+    wo = await get_work_order(db, wo_id)
     
     if wo.last_started_at:
         delta = datetime.now() - wo.last_started_at
         wo.total_labor_seconds += int(delta.total_seconds())
         wo.last_started_at = None
     
-    db.commit()
-    db.refresh(wo)
+    await db.commit()
+    await db.refresh(wo)
     return wo
 
 @router.post("/{wo_id}/parts", response_model=schemas.WorkOrder)
-def add_part_to_work_order(wo_id: int, part_req: PartRequest, db: Session = Depends(get_db)):
-    wo = db.query(models.WorkOrder).filter(models.WorkOrder.id == wo_id).first()
-    if not wo:
-        raise HTTPException(status_code=404, detail="Work Order not found")
-        
-    item = db.query(models.InventoryItem).filter(models.InventoryItem.id == part_req.inventory_item_id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
+async def add_part_to_work_order(wo_id: int, part_req: PartRequest, db: AsyncSession = Depends(database.get_db)):
+    wo = await get_work_order(db, wo_id)
         
-    if item.quantity < part_req.quantity:
+    # Deduct stock (atomically; fails instead of overdrawing under concurrent use)
+    item = await stock_ledger.change_stock(
+        db, -part_req.quantity, "work_order",
+        models.InventoryItem.id == part_req.inventory_item_id,
+        work_order_id=wo.id
+    )
+    if item is None:
+        if not await db.get(models.InventoryItem, part_req.inventory_item_id):
+            raise HTTPException(status_code=404, detail="Item not found")
         raise HTTPException(status_code=400, detail="Insufficient stock")
-        
-    # Deduct stock
-    item.quantity -= part_req.quantity
     
     # Add to relation
     wo_item = models.WorkOrderItem(
@@ -116,6 +160,6 @@ def add_part_to_work_order(wo_id: int, part_req: PartRequest, db: Session = Depe
     )
     db.add(wo_item)
     
-    db.commit()
-    db.refresh(wo)
+    await db.commit()
+    await db.refresh(wo)
     return wo
@@ -35,6 +35,36 @@ class InventoryItem(InventoryItemBase):
     class Config:
         from_attributes = True
 
+class InventoryMovement(BaseModel):
+    id: int
+    inventory_item_id: int
+    quantity_change: int
+    balance_after: int
+    reason: str
+    work_order_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class InventoryBalance(BaseModel):
+    inventory_item_id: int
+    at: datetime
+    quantity: int
+
+# --- Bulk Import Schemas ---
+class BulkRowError(BaseModel):
+    row: int # 1-based position among the uploaded records
+    key: Optional[str] = None
+    error: str
+
+class BulkResult(BaseModel):
+    received: int = 0
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[BulkRowError] = []
+
 # --- WorkOrder Schemas ---
 class WorkOrderBase(BaseModel):
     description: str
@@ -55,21 +85,44 @@ class WorkOrder(WorkOrderBase):
     class Config:
         from_attributes = True
 
+class WorkOrderItem(BaseModel):
+    id: int
+    inventory_item_id: int
+    quantity_used: int
+    inventory_item: Optional[InventoryItem] = None
+
+    class Config:
+        from_attributes = True
+
+class WorkOrderDetail(WorkOrder):
+    # Present only when requested with ?expand=vehicle,items
+    vehicle: Optional[Vehicle] = None
+    items: Optional[List[WorkOrderItem]] = None
+
 # --- Traffic Analysis Schemas ---
 class TrafficDensityBase(BaseModel):
-    latitude: str
-    longitude: str
+    latitude: Optional[float] = None  # NULL for migrated rows whose coordinates did not parse
+    longitude: Optional[float] = None
     density_score: int
     vehicle_count: int
     satellite_image_id: Optional[str] = None
 
 class TrafficDensity(TrafficDensityBase):
     id: int
+    cell_key: Optional[int] = None
     analyzed_at: datetime
 
     class Config:
         from_attributes = True
 
+class TrafficTrendPoint(BaseModel):
+    bucket: datetime
+    total_records: int
+    avg_density_score: Optional[float] = None
+    min_density_score: Optional[int] = None
+    max_density_score: Optional[int] = None
+    total_vehicles_detected: int
+
 class SatelliteImageBase(BaseModel):
     image_id: str
     bbox: str
@@ -0,0 +1,189 @@
+"""
+Bike Station Coverage Service
+Catchment population and dock capacity analysis for shared-bike stations
+"""
+from typing import Dict, Optional
+import math
+import numpy as np
+import pandas as pd
+
+from .columnar import (
+    GridIndex,
+    feature_centers,
+    group_sum,
+    project_local,
+    property_columns,
+)
+
+
+COVERAGE_MODES = ('nearest', 'radius')
+
+
+def load_bike_stations(csv_path: str) -> pd.DataFrame:
+    """
+    Load shared-bike stations from the municipality CSV export
+
+    Args:
+        csv_path: Path to paylasimli-kiralik-bisiklet-istasyonlari-konumlari.csv
+
+    Returns:
+        DataFrame with columns name, lon, lat, capacity, bolge (invalid rows dropped)
+    """
+    # The open-data export is ';' separated with a UTF-8 BOM; fall back to ','
+    df = pd.read_csv(csv_path, sep=';', encoding='utf-8-sig')
+    if len(df.columns) <= 1:
+        df = pd.read_csv(csv_path, sep=',', encoding='utf-8-sig')
+
+    def numeric(column):
+        if column not in df:
+            return pd.Series(np.nan, index=df.index)
+        return pd.to_numeric(df[column].astype(str).str.replace(',', '.'), errors='coerce')
+
+    stations = pd.DataFrame({
+        'name': df.get('istasyon_adi', pd.Series('Bisiklet Duragi', index=df.index)).astype(str),
+        'lon': numeric('boylam'),
+        'lat': numeric('enlem'),
+        'capacity': numeric('peron_adet').fillna(0).astype(int),
+        'bolge': df.get('bolge', pd.Series('', index=df.index)).fillna('').astype(str),
+    })
+    return stations.dropna(subset=['lon', 'lat']).reset_index(drop=True)
+
+
+def analyze_coverage(
+    stations: pd.DataFrame,
+    buildings: Dict,
+    grid: Dict,
+    mode: str = 'nearest',
+    radius_m: Optional[float] = 500,
+    people_per_dock: float = 100,
+    chunk_size: int = 50000
+) -> Dict:
+    """
+    Assign buildings to bike stations and aggregate served population
+
+    In ``nearest`` mode every building is assigned to its closest station
+    (only if it lies within ``radius_m``, when given), so station totals add
+    up to the covered population. In ``radius`` mode a building counts
+    towards every station within walking distance, which shows overlapping
+    catchments.
+
+    Args:
+        stations: Output of load_bike_stations()
+        buildings: Buildings FeatureCollection with population_estimate
+        grid: Geogrid FeatureCollection for per-cell aggregation
+        mode: 'nearest' or 'radius'
+        radius_m: Walking radius in metres (required for 'radius' mode)
+        people_per_dock: Residents one dock is expected to serve
+        chunk_size: Buildings per distance-matrix block (bounds peak memory)
+
+    Returns:
+        Dict with summary, per-station and per-cell results
+    """
+    if mode not in COVERAGE_MODES:
+        raise ValueError(f"Unknown coverage mode: {mode}")
+    if mode == 'radius' and not radius_m:
+        raise ValueError("radius mode requires a walking radius")
+
+    num_stations = len(stations)
+    station_lon = stations['lon'].to_numpy(dtype=float)
+    station_lat = stations['lat'].to_numpy(dtype=float)
+    capacity = stations['capacity'].to_numpy(dtype=float)
+
+    lon, lat = feature_centers(buildings)
+    population = np.nan_to_num(
+        property_columns(buildings, ['population_estimate'])['population_estimate']
+    )
+    located = ~np.isnan(lon)
+    lon, lat, population = lon[located], lat[located], population[located]
+    num_buildings = len(lon)
+
+    ref_lat = float(np.mean(station_lat)) if num_stations else 0.0
+    bx, by = project_local(lon, lat, ref_lat)
+    sx, sy = project_local(station_lon, station_lat, ref_lat)
+
+    nearest = np.full(num_buildings, -1, dtype=np.int64)
+    nearest_dist = np.full(num_buildings, np.inf)
+    catchment_population = np.zeros(num_stations)
+    catchment_buildings = np.zeros(num_stations)
+
+    if num_stations:
+        for start in range(0, num_buildings, chunk_size):
+            stop = min(start + chunk_size, num_buildings)
+            dist = np.hypot(bx[start:stop, None] - sx[None, :], by[start:stop, None] - sy[None, :])
+            idx = dist.argmin(axis=1)
+            nearest[start:stop] = idx
+            nearest_dist[start:stop] = dist[np.arange(stop - start), idx]
+            if mode == 'radius':
+                within = dist <= radius_m
+                catchment_population += population[start:stop] @ within
+                catchment_buildings += within.sum(axis=0)
+
+    covered = nearest >= 0
+    if radius_m:
+        covered &= nearest_dist <= radius_m
+
+    if mode == 'nearest':
+        assigned = np.where(covered, nearest, -1)
+        served_population = group_sum(assigned, population, num_stations)
+        served_buildings = group_sum(assigned, np.ones(num_buildings), num_stations)
+    else:
+        served_population = catchment_population
+        served_buildings = catchment_buildings
+
+    required_docks = np.ceil(served_population / people_per_dock)
+    shortfall = np.maximum(required_docks - capacity, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_dock = np.where(capacity > 0, served_population / capacity, np.nan)
+
+    station_results = []
+    for i, row in enumerate(stations.itertuples(index=False)):
+        station_results.append({
+            'name': row.name,
+            'bolge': row.bolge,
+            'coordinates': [row.lon, row.lat],
+            'kapasite': int(capacity[i]),
+            'served_population': float(served_population[i]),
+            'served_buildings': int(served_buildings[i]),
+            'population_per_dock': None if math.isnan(per_dock[i]) else round(float(per_dock[i]), 1),
+            'required_docks': int(required_docks[i]),
+            'dock_shortfall': int(shortfall[i]),
+        })
+
+    # Per grid cell aggregation
+    grid_ids = [f.get('properties', {}).get('id', i) for i, f in enumerate(grid.get('features', []))]
+    num_cells = len(grid_ids)
+    cells = GridIndex(grid).locate(lon, lat) if num_cells else np.full(num_buildings, -1)
+    cell_population = group_sum(cells, population, num_cells)
+    cell_covered = group_sum(np.where(covered, cells, -1), population, num_cells)
+    cell_buildings = group_sum(cells, np.ones(num_buildings), num_cells)
+    finite_dist = np.where(np.isfinite(nearest_dist), nearest_dist, 0)
+    cell_distance = group_sum(cells, finite_dist, num_cells)
+
+    cell_results = []
+    for i in np.flatnonzero(cell_population > 0):
+        cell_results.append({
+            'id': grid_ids[i],
+            'population': float(cell_population[i]),
+            'covered_population': float(cell_covered[i]),
+            'coverage_ratio': round(float(cell_covered[i] / cell_population[i]), 3),
+            'mean_station_distance_m': round(float(cell_distance[i] / cell_buildings[i]), 1),
+        })
+
+    total_population = float(population.sum())
+    covered_population = float(population[covered].sum())
+    return {
+        'mode': mode,
+        'radius_m': radius_m,
+        'people_per_dock': people_per_dock,
+        'summary': {
+            'stations': num_stations,
+            'buildings': num_buildings,
+            'total_population': total_population,
+            'covered_population': covered_population,
+            'coverage_ratio': round(covered_population / total_population, 3) if total_population else 0,
+            'stations_short': int((shortfall > 0).sum()),
+            'total_dock_shortfall': int(shortfall.sum()),
+        },
+        'stations': station_results,
+        'cells': cell_results,
+    }
@@ -0,0 +1,227 @@
+"""
+Building Mesh Service
+Extrudes building footprints into binary glTF (GLB) mesh batches for the 3D viewer
+"""
+from typing import Dict, List, Tuple
+import json
+import math
+import struct
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+from .columnar import project_local
+
+
+# Storey height used when a building only has a floor count
+FLOOR_HEIGHT_M = 3.0
+DEFAULT_HEIGHT_M = 3.0
+
+# Zoom level of the slippy-map tiles used to batch buildings without a mahalle
+BATCH_TILE_ZOOM = 15
+
+# glTF constants
+GLB_MAGIC = 0x46546C67
+GLB_JSON_CHUNK = 0x4E4F534A
+GLB_BIN_CHUNK = 0x004E4942
+FLOAT = 5126
+UNSIGNED_INT = 5125
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+TRIANGLES = 4
+
+
+def building_height(properties: Dict) -> float:
+    """Extrusion height from height, then floors, then a default storey"""
+    height = properties.get('height')
+    if isinstance(height, (int, float)) and height > 0:
+        return float(height)
+    floors = properties.get('floors')
+    if isinstance(floors, (int, float)) and floors > 0:
+        return floors * FLOOR_HEIGHT_M
+    return DEFAULT_HEIGHT_M
+
+
+def batch_key(properties: Dict, lon: float, lat: float) -> str:
+    """Batch buildings by mahalle, or by web-mercator tile when it is unknown"""
+    mahalle = properties.get('mahalle')
+    if mahalle:
+        return str(mahalle)
+    n = 2 ** BATCH_TILE_ZOOM
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return f"tile_{BATCH_TILE_ZOOM}_{x}_{y}"
+
+
+def valid_footprint(polygon):
+    """
+    The footprint, repaired when it is invalid (e.g. a self-intersecting OSM ring)
+
+    Constrained Delaunay triangulation rejects invalid polygons, and one such
+    footprint would fail its whole batch. Parts that collapse to lines or
+    points when repaired are dropped; the result may be empty.
+    """
+    if polygon.is_valid:
+        return polygon
+    parts = shapely.get_parts(shapely.make_valid(polygon))
+    return shapely.union_all([part for part in parts if part.geom_type in ('Polygon', 'MultiPolygon')])
+
+
+def extrude(polygons: np.ndarray, heights: np.ndarray, origin: Tuple[float, float]):
+    """
+    Triangulate walls and flat roofs for an array of footprints
+
+    Coordinates are converted to metres around origin and laid out glTF
+    style (x east, y up, z south) so float32 keeps centimetre precision.
+
+    Args:
+        polygons: Array of shapely Polygons/MultiPolygons (lon/lat)
+        heights: Extrusion height per polygon in metres
+        origin: (lon, lat) of the batch's local coordinate origin
+
+    Returns:
+        Tuple of (positions float32 (n, 3), indices uint32 (m,), building index float32 (n,))
+    """
+    origin_x, origin_y = project_local(origin[0], origin[1], origin[1])
+
+    def local(coords):
+        x, y = project_local(coords[:, 0], coords[:, 1], origin[1])
+        return x - origin_x, y - origin_y
+
+    # MultiPolygons are extruded part by part
+    parts, part_building = shapely.get_parts(polygons, return_index=True)
+
+    # Walls: one quad per ring edge, non-shared vertices so edges stay sharp
+    rings, ring_part = shapely.get_rings(parts, return_index=True)
+    ring_building = part_building[ring_part]
+    coords, coord_ring = shapely.get_coordinates(rings, return_index=True)
+    same_ring = coord_ring[:-1] == coord_ring[1:]
+    start = np.flatnonzero(same_ring)
+    wall_building = ring_building[coord_ring[start]]
+    ax, ay = local(coords[start])
+    bx, by = local(coords[start + 1])
+    top = heights[wall_building]
+    zero = np.zeros_like(top)
+    wall_positions = np.stack([
+        np.stack([ax, zero, -ay], axis=1),
+        np.stack([bx, zero, -by], axis=1),
+        np.stack([bx, top, -by], axis=1),
+        np.stack([ax, top, -ay], axis=1),
+    ], axis=1).reshape(-1, 3)
+    quad = np.array([0, 1, 2, 0, 2, 3])
+    wall_indices = (np.arange(len(start))[:, None] * 4 + quad).ravel()
+    wall_ids = np.repeat(wall_building, 4)
+
+    # Roofs: constrained Delaunay keeps triangles inside concave footprints and holes
+    triangulated = shapely.constrained_delaunay_triangles(parts)
+    triangles, roof_part = shapely.get_parts(triangulated, return_index=True)
+    roof_building = part_building[roof_part]
+    roof_coords = shapely.get_coordinates(shapely.get_exterior_ring(triangles))
+    roof_coords = roof_coords.reshape(-1, 4, 2)[:, :3].reshape(-1, 2)
+    rx, ry = local(roof_coords)
+    roof_positions = np.stack([rx, np.repeat(heights[roof_building], 3), -ry], axis=1)
+    roof_indices = np.arange(len(roof_positions)) + len(wall_positions)
+    roof_ids = np.repeat(roof_building, 3)
+
+    positions = np.concatenate([wall_positions, roof_positions]).astype(np.float32)
+    indices = np.concatenate([wall_indices, roof_indices]).astype(np.uint32)
+    building_index = np.concatenate([wall_ids, roof_ids]).astype(np.float32)
+    return positions, indices, building_index
+
+
+def encode_glb(positions: np.ndarray, indices: np.ndarray, building_index: np.ndarray, extras: Dict) -> bytes:
+    """
+    Pack one triangle mesh into a binary glTF 2.0 container
+
+    The per-vertex ``_BUILDING_INDEX`` attribute points into
+    ``extras.building_ids`` so the viewer can pick buildings.
+    """
+    position_bytes = positions.tobytes()
+    id_bytes = building_index.tobytes()
+    index_bytes = indices.tobytes()
+    binary = position_bytes + id_bytes + index_bytes
+
+    has_vertices = len(positions) > 0
+    gltf = {
+        'asset': {'version': '2.0', 'generator': 'CityScope Konya', 'extras': extras},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'mesh': 0}],
+        'meshes': [{'primitives': [{
+            'attributes': {'POSITION': 0, '_BUILDING_INDEX': 1},
+            'indices': 2,
+            'mode': TRIANGLES,
+            'material': 0,
+        }]}],
+        'materials': [{'doubleSided': True}],
+        'buffers': [{'byteLength': len(binary)}],
+        'bufferViews': [
+            {'buffer': 0, 'byteOffset': 0, 'byteLength': len(position_bytes), 'target': ARRAY_BUFFER},
+            {'buffer': 0, 'byteOffset': len(position_bytes), 'byteLength': len(id_bytes), 'target': ARRAY_BUFFER},
+            {'buffer': 0, 'byteOffset': len(position_bytes) + len(id_bytes),
+             'byteLength': len(index_bytes), 'target': ELEMENT_ARRAY_BUFFER},
+        ],
+        'accessors': [
+            {'bufferView': 0, 'componentType': FLOAT, 'count': len(positions), 'type': 'VEC3',
+             'min': positions.min(axis=0).tolist() if has_vertices else [0, 0, 0],
+             'max': positions.max(axis=0).tolist() if has_vertices else [0, 0, 0]},
+            {'bufferView': 1, 'componentType': FLOAT, 'count': len(building_index), 'type': 'SCALAR'},
+            {'bufferView': 2, 'componentType': UNSIGNED_INT, 'count': len(indices), 'type': 'SCALAR'},
+        ],
+    }
+
+    json_chunk = json.dumps(gltf, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    json_chunk += b' ' * (-len(json_chunk) % 4)
+    binary += b'\x00' * (-len(binary) % 4)
+    length = 12 + 8 + len(json_chunk) + 8 + len(binary)
+    return b''.join([
+        struct.pack('<III', GLB_MAGIC, 2, length),
+        struct.pack('<II', len(json_chunk), GLB_JSON_CHUNK), json_chunk,
+        struct.pack('<II', len(binary), GLB_BIN_CHUNK), binary,
+    ])
+
+
+def build_mesh_batches(buildings: Dict) -> Dict[str, Dict]:
+    """
+    Extrude every building footprint into per-batch GLB buffers
+
+    Args:
+        buildings: Buildings FeatureCollection with height/floors properties
+
+    Returns:
+        Dict of batch key -> {'glb': bytes, 'buildings', 'vertices', 'triangles', 'origin'}
+    """
+    groups: Dict[str, List[Tuple[Dict, object]]] = {}
+    for feature in buildings.get('features', []):
+        geometry = feature.get('geometry')
+        if not geometry or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+            continue
+        polygon = valid_footprint(shape(geometry))
+        if polygon.is_empty:
+            continue
+        point = polygon.representative_point()
+        properties = feature.get('properties', {})
+        groups.setdefault(batch_key(properties, point.x, point.y), []).append((properties, polygon))
+
+    batches = {}
+    for key, members in groups.items():
+        polygons = np.array([polygon for _, polygon in members], dtype=object)
+        heights = np.array([building_height(properties) for properties, _ in members])
+        min_x, min_y, max_x, max_y = shapely.total_bounds(polygons)
+        origin = ((min_x + max_x) / 2, (min_y + max_y) / 2)
+
+        positions, indices, building_index = extrude(polygons, heights, origin)
+        building_ids = [properties.get('id', i) for i, (properties, _) in enumerate(members)]
+        batches[key] = {
+            'glb': encode_glb(positions, indices, building_index, {
+                'batch': key,
+                'origin': list(origin),
+                'up_axis': 'y',
+                'building_ids': building_ids,
+            }),
+            'origin': list(origin),
+            'buildings': len(members),
+            'vertices': len(positions),
+            'triangles': len(indices) // 3,
+        }
+    return batches
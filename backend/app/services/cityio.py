@@ -0,0 +1,884 @@
+"""
+CityIO Table Service
+In-memory CityIO table store and its operations, shared by the Flask server and the FastAPI router
+"""
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+import functools
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+from urllib.parse import quote
+import numpy as np
+
+from .versioned_cache import VersionedCache
+from .bike_coverage import COVERAGE_MODES, analyze_coverage, load_bike_stations
+from .geometry_lod import ZOOM_BANDS, band_for_zoom, simplify_collection
+from .building_mesh import build_mesh_batches
+from .columnar import GridIndex
+from .indicators import IndicatorEngine, table_indicators
+from . import heatmap
+from .grid_history import CellDelta, ColumnDelta, GridHistory, diff_grids
+from .table_store import TableStore
+from .table_registry import TableRegistry, discover_tables
+from .layer_files import load_layer
+from .scenarios import (
+    SCENARIO_COLUMNS,
+    SCENARIOS,
+    apply_to_columns,
+    apply_to_properties,
+    compare_columns,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Data directory
+DATA_DIR = Path(__file__).resolve().parents[3] / 'data'
+
+# Directories searched for table definitions (<name>_config.json + seed layers)
+TABLE_DIRS = [DATA_DIR] + [Path(p) for p in os.getenv('CITYIO_TABLE_DIRS', '').split(os.pathsep) if p]
+
+# Memory budget for loaded tables; least recently used tables are unloaded beyond it
+TABLE_MEMORY_MB = int(os.getenv('CITYIO_TABLE_MEMORY_MB', 2048))
+
+BIKE_STATIONS_CSV = DATA_DIR / 'paylasimli-kiralik-bisiklet-istasyonlari-konumlari.csv'
+
+# Layers whose edits are versioned (analysis caches key on these)
+LAYERS = ('geogrid', 'buildings', 'pois', 'roads')
+
+# Seed file suffix of each layer: <table>_<suffix>.parquet|.fgb|.geojson (see layer_files)
+SEED_FILES = {'buildings': 'buildings', 'pois': 'pois', 'geogrid': 'grid', 'roads': 'roads'}
+
+# Table configs (indicator definitions, colormaps) as loaded from <name>_config.json
+table_configs = {}
+
+# Undo/redo history of geogrid edits per table
+HISTORY_STEPS = int(os.getenv('CITYIO_HISTORY_STEPS', 200))
+HISTORY_MB = int(os.getenv('CITYIO_HISTORY_MB', 64))
+histories = {}
+
+# Write-ahead log + checkpoints so edits survive restarts (delete the state dir to reseed)
+STATE_DIR = Path(os.getenv('CITYIO_STATE_DIR', DATA_DIR / 'state'))
+table_store = TableStore(
+    STATE_DIR,
+    checkpoint_every=int(os.getenv('CITYIO_CHECKPOINT_EVERY', 500)),
+    fsync=os.getenv('CITYIO_WAL_FSYNC', '1') != '0'
+)
+
+# Meta fields set by mark_modified, logged with every edit so a restart restores them
+MODIFIED_META = ('modified', 'layer_versions', 'column_versions')
+
+# Derived results (analyses, columns) keyed by table and the versions they read
+analysis_cache = VersionedCache(max_entries=1024)
+
+# Indicator results are cached per input column version in the same store
+indicator_engine = IndicatorEngine(analysis_cache)
+
+# Simplified geometries per (table, layer, zoom band), tagged with the layer version
+LOD_LAYERS = ('buildings', 'roads')
+lod_cache = VersionedCache()
+
+# Extruded building GLB batches per table, tagged with the buildings version
+mesh_cache = VersionedCache(max_entries=32)
+
+# Encoded heatmap images per (table, property, scenario, render options)
+heatmap_cache = VersionedCache()
+
+# Edits and multi-layer analyses of one table are serialized
+table_locks = defaultdict(threading.RLock)
+
+
+class TableError(Exception):
+    """Request error with the HTTP status it maps to"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def load_json(filename, directory=DATA_DIR):
+    """Load JSON file from data directory"""
+    filepath = directory / filename
+    if filepath.exists():
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return None
+
+
+def load_seed(table_name, directory, config):
+    """
+    Build a table from its seed layer files (<name>_<suffix>.parquet|.fgb|.geojson|.geojsonseq)
+
+    The config may limit what is read: a table-wide "bbox" [minx, miny, maxx, maxy]
+    and per-layer "layers": {"<layer>": {"columns": [...], "bbox": [...]}}.
+    """
+    layer_options = config.get('layers', {})
+    layers = {
+        layer: load_layer(
+            directory,
+            f'{table_name}_{suffix}',
+            columns=layer_options.get(layer, {}).get('columns'),
+            bbox=layer_options.get(layer, {}).get('bbox', config.get('bbox'))
+        ) or {"type": "FeatureCollection", "features": []}
+        for layer, suffix in SEED_FILES.items()
+    }
+
+    return {
+        'header': config.get('header', {
+            'name': table_name,
+            'city': table_name.title(),
+            'country': 'Turkey',
+            'timestamp': datetime.now().isoformat()
+        }),
+        'geogrid': layers['geogrid'],
+        'buildings': layers['buildings'],
+        'pois': layers['pois'],
+        'roads': layers['roads'],
+        'types': config.get('types', {}),
+        'indicators': [],
+        'meta': {
+            'created': datetime.now().isoformat(),
+            'modified': datetime.now().isoformat(),
+            'version': '1.0.0',
+            'layer_versions': {layer: 0 for layer in LAYERS},
+            'column_versions': {layer: {'*': 0} for layer in LAYERS}
+        }
+    }
+
+
+def known_tables():
+    """Table definitions on disk: name -> directory"""
+    return discover_tables(TABLE_DIRS)
+
+
+def load_table(table_name):
+    """Load a table from its checkpoint + WAL, or from the seed files on first use"""
+    directory = known_tables()[table_name]
+    config = load_json(f'{table_name}_config.json', directory) or {}
+    table_configs[table_name] = config
+    recovered = table_store.recover(table_name)
+    if recovered:
+        table, replayed = recovered
+        logger.info(f"{table_name}: restored saved state ({replayed} WAL records replayed)")
+    else:
+        table = load_seed(table_name, directory, config)
+        table_store.checkpoint(table_name, table)
+    return table
+
+
+def prepare_table(table_name):
+    """Derived data of a freshly loaded table"""
+    refresh_indicators(table_name)
+    precompute_lods(table_name)
+
+
+def unload_table(table_name, table):
+    """Checkpoint unsaved edits and drop everything derived from an evicted table"""
+    with table_locks[table_name]:
+        if table_store.pending(table_name):
+            table_store.checkpoint(table_name, table)
+        table_store.release(table_name)
+        histories.pop(table_name, None)
+        table_configs.pop(table_name, None)
+        for cache in (analysis_cache, lod_cache, mesh_cache, heatmap_cache):
+            cache.invalidate(table_name)
+
+
+# Active tables, loaded on first access and evicted LRU under TABLE_MEMORY_MB
+tables = TableRegistry(
+    known_tables,
+    load_table,
+    budget_bytes=TABLE_MEMORY_MB * 1024 * 1024,
+    on_load=prepare_table,
+    on_evict=unload_table
+)
+
+
+def uses_table(operation):
+    """Pin the table named by an operation's first argument for the operation's duration"""
+    @functools.wraps(operation)
+    def pinned_operation(table_name, *args, **kwargs):
+        with tables.pinned(table_name):
+            return operation(table_name, *args, **kwargs)
+    return pinned_operation
+
+
+def require_table(table_name) -> Dict:
+    """The table, loading it if needed; TableError 404 when it does not exist"""
+    if table_name not in tables:
+        raise TableError('Table not found', 404)
+    return tables[table_name]
+
+
+def snapshot(value):
+    """
+    Copy of table data that later edits cannot change while it is serialized
+
+    Edits replace features and rewrite their property dicts in place, so
+    dicts and lists are copied; geometries are only ever replaced and are
+    shared with the live table.
+    """
+    if isinstance(value, dict):
+        return {key: item if key == 'geometry' else snapshot(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [snapshot(item) for item in value]
+    return value
+
+
+@uses_table
+def table_snapshot(table_name, key=None):
+    """The table, or one of its entries, copied under the table lock (for streaming)"""
+    table = require_table(table_name)
+    with table_locks[table_name]:
+        return snapshot(table if key is None else table.get(key, {}))
+
+
+# ============================================
+# Versions and derived data
+# ============================================
+
+def mark_modified(table_name, *layers, columns=None):
+    """
+    Bump modification time and the version of each changed layer
+
+    Args:
+        table_name: Table key
+        layers: Layers that changed
+        columns: Properties that changed, or None when the layers were replaced
+    """
+    meta = tables[table_name]['meta']
+    meta['modified'] = datetime.now().isoformat()
+    versions = meta.setdefault('layer_versions', {layer: 0 for layer in LAYERS})
+    column_versions = meta.setdefault('column_versions', {})
+    for layer in layers:
+        versions[layer] = versions.get(layer, 0) + 1
+        layer_columns = column_versions.setdefault(layer, {'*': 0})
+        for column in (['*'] if columns is None else columns):
+            layer_columns[column] = layer_columns.get(column, 0) + 1
+
+
+@uses_table
+def data_version(table_name) -> Tuple:
+    """Every layer and column version of a table, as a hashable request coalescing tag"""
+    table = require_table(table_name)
+    with table_locks[table_name]:
+        meta = table['meta']
+        return (
+            tuple(sorted(meta.get('layer_versions', {}).items())),
+            tuple(sorted(
+                (layer, tuple(sorted(columns.items())))
+                for layer, columns in meta.get('column_versions', {}).items()
+            )),
+        )
+
+
+def layer_version(table_name, *layers):
+    """Version tuple of the given layers, used as an analysis cache tag"""
+    versions = tables[table_name]['meta'].get('layer_versions', {})
+    return tuple(versions.get(layer, 0) for layer in layers)
+
+
+def column_version(table_name, layer, column=None):
+    """
+    Version of one layer column, or of the layer's feature set when column is None
+
+    Replacing a layer bumps its epoch ('*'), which invalidates every column;
+    column edits (e.g. scenarios) only bump the columns they touch.
+    """
+    layer_columns = tables[table_name]['meta'].get('column_versions', {}).get(layer, {})
+    if column is None:
+        return (layer_columns.get('*', 0),)
+    return (layer_columns.get('*', 0), layer_columns.get(column, 0))
+
+
+def layer_lod(table_name, layer, band_index):
+    """Simplified copy of a layer for one zoom band, rebuilt when the layer changes"""
+    table = tables[table_name]
+    latitude = table.get('header', {}).get('spatial', {}).get('latitude', 37.8746)
+    return lod_cache.get_or_compute(
+        (table_name, layer, band_index),
+        layer_version(table_name, layer),
+        lambda: simplify_collection(table.get(layer, {}), ZOOM_BANDS[band_index], latitude)
+    )
+
+
+def precompute_lods(table_name):
+    """Build every zoom band of the LOD layers up front so first requests are cheap"""
+    for layer in LOD_LAYERS:
+        for band_index in range(len(ZOOM_BANDS)):
+            layer_lod(table_name, layer, band_index)
+
+
+def building_meshes(table_name):
+    """GLB batches for a table's buildings, triangulated once per buildings version"""
+    return mesh_cache.get_or_compute(
+        (table_name, 'buildings_mesh'),
+        layer_version(table_name, 'buildings'),
+        lambda: build_mesh_batches(tables[table_name].get('buildings', {}))
+    )
+
+
+def grid_index(table_name):
+    """Lattice lookup for a table's geogrid, rebuilt when the grid changes"""
+    return analysis_cache.get_or_compute(
+        (table_name, 'grid_index'),
+        layer_version(table_name, 'geogrid'),
+        lambda: GridIndex(tables[table_name].get('geogrid', {}))
+    )
+
+
+def grid_column(table_name, prop):
+    """One numeric geogrid property as a float array, cached per column version"""
+    return indicator_engine.columns(
+        table_name,
+        tables[table_name],
+        lambda layer, column: column_version(table_name, layer, column)
+    ).numeric('geogrid', prop)
+
+
+def history_for(table_name):
+    """Edit history of a table, created on first edit"""
+    if table_name not in histories:
+        histories[table_name] = GridHistory(max_steps=HISTORY_STEPS, max_bytes=HISTORY_MB * 1024 * 1024)
+    return histories[table_name]
+
+
+def persist(table_name, delta):
+    """Log the live side of an applied delta; checkpoint when the log has grown"""
+    table = tables[table_name]
+    record = delta.live_record(table['geogrid'], table['meta'])
+    record['meta'].update({key: table['meta'].get(key) for key in MODIFIED_META})
+    table_store.append(table_name, record)
+    if record['op'] == 'layer':
+        tables.measure(table_name)
+    if table_store.checkpoint_due(table_name):
+        table_store.checkpoint(table_name, table)
+
+
+def refresh_indicators(table_name):
+    """Re-evaluate table indicators; only those with changed inputs are recomputed"""
+    table = tables[table_name]
+    table['indicators'] = indicator_engine.evaluate(
+        table_name,
+        table,
+        lambda layer, column: column_version(table_name, layer, column),
+        table_indicators(table_configs.get(table_name, {}))
+    )
+    return table['indicators']
+
+
+# ============================================
+# Read operations
+# ============================================
+
+def list_tables() -> Dict:
+    """Known tables and the ones currently loaded"""
+    return {
+        'tables': tables.keys(),
+        'count': len(tables),
+        'loaded': tables.loaded()
+    }
+
+
+@uses_table
+def layer_data(table_name, layer, zoom=None) -> Tuple[Dict, Optional[str]]:
+    """
+    A snapshot of a table layer, simplified for zoom when it is an LOD layer below full detail
+
+    Returns:
+        Tuple of (FeatureCollection, LOD band name or None)
+    """
+    band_index = band_for_zoom(zoom)
+    if layer not in LOD_LAYERS or band_index is None:
+        return table_snapshot(table_name, layer), None
+    require_table(table_name)
+    with table_locks[table_name]:
+        return snapshot(layer_lod(table_name, layer, band_index)), ZOOM_BANDS[band_index]['name']
+
+
+@uses_table
+def mesh_index(table_name) -> Dict:
+    """The 3D mesh batches (per mahalle or tile) of a table's buildings"""
+    require_table(table_name)
+    batches = building_meshes(table_name)
+    return {
+        'version': layer_version(table_name, 'buildings')[0],
+        'format': 'glb',
+        'batches': [
+            {
+                'name': name,
+                # Mahalle names may contain '/', spaces or Turkish letters
+                'url': f'/api/table/{quote(table_name, safe="")}/buildings/mesh/{quote(name, safe="")}.glb',
+                'origin': batch['origin'],
+                'buildings': batch['buildings'],
+                'vertices': batch['vertices'],
+                'triangles': batch['triangles'],
+                'bytes': len(batch['glb'])
+            }
+            for name, batch in batches.items()
+        ]
+    }
+
+
+@uses_table
+def mesh_batch(table_name, batch) -> Tuple[bytes, str]:
+    """
+    GLB bytes of one building batch
+
+    Returns:
+        Tuple of (GLB bytes, ETag)
+    """
+    require_table(table_name)
+    batches = building_meshes(table_name)
+    if batch not in batches:
+        raise TableError('Mesh batch not found', 404)
+    batch_tag = hashlib.sha1(batch.encode('utf-8')).hexdigest()[:12]
+    etag = f"{table_name}-buildings-{layer_version(table_name, 'buildings')[0]}-{batch_tag}"
+    return batches[batch]['glb'], etag
+
+
+def bike_stations() -> Dict:
+    """Bike station locations as GeoJSON, with mock stations when the CSV yields none"""
+    if not BIKE_STATIONS_CSV.exists():
+        raise TableError('Bike station data not found', 404)
+
+    stations = load_bike_stations(BIKE_STATIONS_CSV)
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [row.lon, row.lat]
+            },
+            "properties": {
+                "adi": row.name,
+                "kapasite": int(row.capacity),
+                "bolge": row.bolge
+            }
+        }
+        for row in stations.itertuples(index=False)
+    ]
+
+    if not features:
+        logger.warning("CSV data extraction failed or empty. Generating MOCK bike data.")
+        # Generate 20 random stations around Konya center
+        center_lat, center_lon = 37.8746, 32.4932
+        for i in range(20):
+            lat = center_lat + (random.random() - 0.5) * 0.05
+            lon = center_lon + (random.random() - 0.5) * 0.05
+            features.append({
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [lon, lat]
+                },
+                "properties": {
+                    "adi": f"Bisiklet İstasyonu {i+1}",
+                    "kapasite": random.randint(5, 20),
+                    "bolge": "Merkez"
+                }
+            })
+
+    return {
+        "type": "FeatureCollection",
+        "features": features
+    }
+
+
+@uses_table
+def history_status(table_name) -> Dict:
+    """Undo/redo stacks and their memory footprint"""
+    require_table(table_name)
+    status = history_for(table_name).status()
+    status['version'] = layer_version(table_name, 'geogrid')[0]
+    return status
+
+
+# ============================================
+# Edits
+# ============================================
+
+@uses_table
+def update_geogrid(table_name, data) -> Dict:
+    """Replace the geogrid, patching only the changed cells in place and keeping the delta for undo"""
+    table = require_table(table_name)
+    if not data:
+        raise TableError('No data provided', 400)
+
+    with table_locks[table_name]:
+        version_before = layer_version(table_name, 'geogrid')[0]
+        delta = diff_grids(table.get('geogrid', {}), data)
+        if isinstance(delta, CellDelta) and not delta.features:
+            return {'status': 'success', 'message': 'Geogrid unchanged'}
+
+        table['geogrid'] = delta.swap(table.get('geogrid', {}))
+        mark_modified(table_name, 'geogrid', columns=delta.columns)
+        history_for(table_name).record(delta, 'geogrid', version_before, layer_version(table_name, 'geogrid')[0])
+        persist(table_name, delta)
+
+        # Recalculate indicators
+        refresh_indicators(table_name)
+
+    return {'status': 'success', 'message': 'Geogrid updated'}
+
+
+@uses_table
+def apply_scenario(table_name, scenario) -> Dict:
+    """Apply a predefined scenario to the geogrid"""
+    table = require_table(table_name)
+    if scenario not in SCENARIOS:
+        raise TableError('Unknown scenario', 400)
+
+    mods = SCENARIOS[scenario]
+    with table_locks[table_name]:
+        meta = table['meta']
+
+        # Apply modifications to grid, keeping the previous column values for undo
+        grid = table.get('geogrid', {})
+        version_before = layer_version(table_name, 'geogrid')[0]
+        delta = ColumnDelta.capture(grid, SCENARIO_COLUMNS, meta={'active_scenario': meta.get('active_scenario')})
+        for feature in grid.get('features', []):
+            apply_to_properties(feature.get('properties', {}), mods)
+
+        mark_modified(table_name, 'geogrid', columns=SCENARIO_COLUMNS)
+        meta['active_scenario'] = scenario
+        history_for(table_name).record(delta, f'scenario:{scenario}', version_before, layer_version(table_name, 'geogrid')[0])
+        persist(table_name, delta)
+
+        # Recalculate indicators (only those reading the modified columns)
+        refresh_indicators(table_name)
+
+    return {
+        'status': 'success',
+        'scenario': scenario,
+        'indicators': table['indicators']
+    }
+
+
+@uses_table
+def history_step(table_name, action) -> Dict:
+    """Swap one history delta ('undo' or 'redo') into the live grid (O(changed cells))"""
+    table = require_table(table_name)
+    with table_locks[table_name]:
+        history = history_for(table_name)
+        step = getattr(history, action)(table.get('geogrid', {}), table['meta'])
+        if step is None:
+            raise TableError(f'Nothing to {action}', 409)
+
+        grid, delta = step
+        table['geogrid'] = grid
+        mark_modified(table_name, 'geogrid', columns=delta.columns)
+        persist(table_name, delta)
+        refresh_indicators(table_name)
+
+    return {
+        'status': 'success',
+        'action': action,
+        'step': delta.describe(),
+        'can_undo': bool(history.undo_stack),
+        'can_redo': bool(history.redo_stack),
+        'indicators': table['indicators']
+    }
+
+
+@uses_table
+def checkpoint(table_name) -> Dict:
+    """Write a checkpoint now and truncate the write-ahead log"""
+    table = require_table(table_name)
+    with table_locks[table_name]:
+        table_store.checkpoint(table_name, table)
+    return {'status': 'success', **table_store.status(table_name)}
+
+
+# ============================================
+# Analyses
+# ============================================
+
+@uses_table
+def compare(table_name, a, b, properties: Iterable[str], threshold: float) -> Dict:
+    """
+    Cell-wise comparison of two scenarios or two geogrid versions
+
+    Args:
+        a, b: Scenario names applied to the current grid ('current' = grid
+              as it is now), or 'v:<n>' for geogrid version n from the edit history
+        properties: Grid properties to compare
+        threshold: Minimum absolute per-cell change to report
+
+    Returns only the changed cells (deltas are b - a), per-property summary
+    statistics and table indicator deltas.
+    """
+    require_table(table_name)
+    if not b:
+        raise TableError('Parameter b is required', 400)
+    for ref in (a, b):
+        if ref not in SCENARIOS and not (ref.startswith('v:') and ref[2:].isdigit()):
+            raise TableError(f'Unknown scenario or version: {ref}', 400)
+    properties = tuple(properties)
+    if not properties or threshold < 0:
+        raise TableError('Invalid properties or threshold', 400)
+
+    with table_locks[table_name]:
+        try:
+            return analysis_cache.get_or_compute(
+                (table_name, 'compare', a, b, properties, threshold),
+                layer_version(table_name, *LAYERS),
+                lambda: compute_comparison(table_name, a, b, properties, threshold)
+            )
+        except KeyError as e:
+            raise TableError(f'Version {e.args[0]} is not in the edit history', 404)
+        except ValueError:
+            raise TableError('Grid structure changed between versions', 409)
+
+
+def comparison_state(table_name, ref, current):
+    """Grid columns for a scenario name or a 'v:<n>' history version"""
+    if ref in SCENARIOS:
+        return apply_to_columns(current, SCENARIOS[ref])
+    return history_for(table_name).columns_at(
+        int(ref[2:]),
+        layer_version(table_name, 'geogrid')[0],
+        current
+    )
+
+
+def compute_comparison(table_name, a, b, properties, threshold):
+    """Column-wise state diff plus indicator deltas"""
+    table = tables[table_name]
+    versions = lambda layer, column: column_version(table_name, layer, column)
+    columns = set(properties) | set(SCENARIO_COLUMNS)
+    current = {prop: grid_column(table_name, prop) for prop in columns}
+    states = {ref: comparison_state(table_name, ref, current) for ref in (a, b)}
+
+    ids = [f.get('properties', {}).get('id', i) for i, f in enumerate(table['geogrid'].get('features', []))]
+    result = compare_columns(ids, states[a], states[b], properties, threshold)
+
+    definitions = table_indicators(table_configs.get(table_name, {}))
+    indicators = {
+        ref: indicator_engine.evaluate_overlay(table_name, table, versions, definitions, 'geogrid', states[ref])
+        for ref in (a, b)
+    }
+    result['indicators'] = [
+        {
+            'name': ia['name'],
+            'unit': ia['unit'],
+            'a': ia['value'],
+            'b': ib['value'],
+            'delta': round(ib['value'] - ia['value'], 4)
+        }
+        for ia, ib in zip(indicators[a], indicators[b])
+    ]
+    result.update({'a': a, 'b': b, 'properties': list(properties), 'threshold': threshold})
+    return result
+
+
+@uses_table
+def analyze_walkability(table_name) -> Dict:
+    """Detailed walkability analysis (cached per walkability column version)"""
+    table = require_table(table_name)
+    key = (table_name, 'walkability_analysis')
+    # Scenarios and undo rewrite the grid in place under the table lock: read
+    # the version and copy the column together, then compute on the copy
+    with table_locks[table_name]:
+        version = column_version(table_name, 'geogrid', 'walkability')
+        result = analysis_cache.get(key, version)
+        if result is not None:
+            return result
+        features = table.get('geogrid', {}).get('features', [])
+        values = [f['properties'].get('walkability', 0) for f in features if 'properties' in f]
+    return analysis_cache.get_or_compute(key, version, lambda: compute_walkability(values))
+
+
+def compute_walkability(walkability_values) -> Dict:
+    if not walkability_values:
+        raise TableError('No walkability data', 404)
+
+    return {
+        'mean': sum(walkability_values) / len(walkability_values),
+        'min': min(walkability_values),
+        'max': max(walkability_values),
+        'count': len(walkability_values),
+        'distribution': {
+            'low': len([v for v in walkability_values if v < 40]),
+            'medium': len([v for v in walkability_values if 40 <= v < 70]),
+            'high': len([v for v in walkability_values if v >= 70])
+        }
+    }
+
+
+@uses_table
+def analyze_density(table_name) -> Dict:
+    """Density analysis by area (cached per mahalle/floors column version)"""
+    table = require_table(table_name)
+    key = (table_name, 'density_analysis')
+    # Version and (mahalle, floors) columns are read together under the table lock
+    with table_locks[table_name]:
+        version = column_version(table_name, 'buildings', 'mahalle') + column_version(table_name, 'buildings', 'floors')
+        result = analysis_cache.get(key, version)
+        if result is not None:
+            return result
+        rows = [
+            (f.get('properties', {}).get('mahalle', 'Unknown'), f.get('properties', {}).get('floors', 1))
+            for f in table.get('buildings', {}).get('features', [])
+        ]
+    return analysis_cache.get_or_compute(key, version, lambda: compute_density(rows))
+
+
+def compute_density(rows) -> Dict:
+    """Per-mahalle building counts and floor totals from (mahalle, floors) pairs"""
+    by_mahalle = {}
+    for mahalle, floors in rows:
+        if mahalle not in by_mahalle:
+            by_mahalle[mahalle] = {'count': 0, 'total_floors': 0}
+        by_mahalle[mahalle]['count'] += 1
+        by_mahalle[mahalle]['total_floors'] += floors
+
+    return {
+        'by_mahalle': by_mahalle,
+        'total_buildings': len(rows)
+    }
+
+
+@uses_table
+def analyze_bike_coverage(table_name, mode='nearest', radius=500, people_per_dock=100) -> Dict:
+    """
+    Bike station catchment and dock capacity analysis
+
+    Args:
+        mode: 'nearest' (each building to its closest station) or 'radius'
+              (each building to every station within walking distance)
+        radius: Walking radius in metres (0 = unlimited in nearest mode)
+        people_per_dock: Residents one dock should serve
+    """
+    table = require_table(table_name)
+    if not BIKE_STATIONS_CSV.exists():
+        raise TableError('Bike station data not found', 404)
+    if mode not in COVERAGE_MODES:
+        raise TableError(f'Unknown mode, expected one of {list(COVERAGE_MODES)}', 400)
+    if (mode == 'radius' and not radius) or radius < 0 or people_per_dock <= 0:
+        raise TableError('Invalid radius or people_per_dock', 400)
+
+    with table_locks[table_name]:
+        version = layer_version(table_name, 'buildings', 'geogrid') + (BIKE_STATIONS_CSV.stat().st_mtime,)
+        return analysis_cache.get_or_compute(
+            (table_name, 'bike_coverage', mode, radius, people_per_dock),
+            version,
+            lambda: analyze_coverage(
+                load_bike_stations(BIKE_STATIONS_CSV),
+                table.get('buildings', {}),
+                table.get('geogrid', {}),
+                mode=mode,
+                radius_m=radius or None,
+                people_per_dock=people_per_dock
+            )
+        )
+
+
+def _heatmap_values(table_name, prop):
+    values = grid_column(table_name, prop)
+    if not len(values) or np.isnan(values).all():
+        raise TableError(f'No numeric grid property: {prop}', 404)
+    return values
+
+
+@uses_table
+def heatmap_info(table_name, prop, colormap=None) -> Dict:
+    """Georeferencing, value domain and legend of a grid property heatmap"""
+    table = require_table(table_name)
+    values = _heatmap_values(table_name, prop)
+
+    style = heatmap.heatmap_style(table_configs.get(table_name, {}), prop, colormap)
+    west, south, east, north = heatmap.lattice_bounds(grid_index(table_name))
+    domain = style['domain'] or [float(np.nanmin(values)), float(np.nanmax(values))]
+    return {
+        'property': prop,
+        'name': style['name'],
+        'unit': style['unit'],
+        'bounds': [west, south, east, north],
+        # Corner order expected by MapLibre/Mapbox image sources
+        'coordinates': [[west, north], [east, north], [east, south], [west, south]],
+        'domain': domain,
+        'colormap': style['colormap'],
+        'stops': style['stops'],
+        'shape': list(grid_index(table_name).shape),
+        'scenario': table['meta'].get('active_scenario', 'current'),
+        'url': f'/api/table/{quote(table_name, safe="")}/heatmap/{quote(prop, safe="")}.png'
+    }
+
+
+@uses_table
+def heatmap_image(table_name, prop, image_format, colormap=None, vmin=None, vmax=None, scale=1) -> Tuple[bytes, str, str]:
+    """
+    Grid property rendered as one georeferenced image (one pixel per cell)
+
+    Args:
+        colormap: Name from the table config's colormaps
+        vmin, vmax: Value domain (defaults: indicator domain, else data range)
+        scale: Integer upscaling factor, 1-16
+
+    Returns:
+        Tuple of (image bytes, bounds header value, ETag)
+    """
+    table = require_table(table_name)
+    if image_format not in heatmap.IMAGE_FORMATS:
+        raise TableError(f'Unknown image format: {image_format}', 404)
+    values = _heatmap_values(table_name, prop)
+    if not 1 <= scale <= 16:
+        raise TableError('scale must be between 1 and 16', 400)
+
+    style = heatmap.heatmap_style(table_configs.get(table_name, {}), prop, colormap)
+    domain = style['domain'] or [float(np.nanmin(values)), float(np.nanmax(values))]
+    vmin = domain[0] if vmin is None else vmin
+    vmax = domain[1] if vmax is None else vmax
+    scenario = table['meta'].get('active_scenario', 'current')
+
+    index = grid_index(table_name)
+    image = heatmap_cache.get_or_compute(
+        (table_name, prop, scenario, image_format, style['colormap'], vmin, vmax, scale),
+        layer_version(table_name, 'geogrid'),
+        lambda: heatmap.render(
+            heatmap.rasterize(index, values),
+            style['stops'],
+            (vmin, vmax),
+            image_format=image_format,
+            scale=scale
+        )
+    )
+    bounds = ','.join(str(v) for v in heatmap.lattice_bounds(index))
+    etag = f"{table_name}-{prop}-{layer_version(table_name, 'geogrid')[0]}-{image_format}-{style['colormap']}-{scale}-{vmin}-{vmax}"
+    return image, bounds, etag
+
+
+# ============================================
+# Streaming serialization
+# ============================================
+
+def iter_json(value, batch_size: int = 1000) -> Iterator[bytes]:
+    """
+    Encode a JSON document in chunks
+
+    Lists of more than batch_size items (e.g. the features of a layer) are
+    emitted batch_size items at a time, so a large layer is never held in
+    memory as one encoded string and the caller can yield between chunks.
+    """
+    if isinstance(value, dict):
+        yield b'{'
+        for i, (key, item) in enumerate(value.items()):
+            yield (',' if i else '').encode() + json.dumps(str(key), ensure_ascii=False).encode('utf-8') + b':'
+            yield from iter_json(item, batch_size)
+        yield b'}'
+    elif isinstance(value, list) and len(value) > batch_size:
+        yield b'['
+        for start in range(0, len(value), batch_size):
+            chunk = json.dumps(value[start:start + batch_size], ensure_ascii=False, separators=(',', ':'))
+            yield (b',' if start else b'') + chunk[1:-1].encode('utf-8')
+        yield b']'
+    else:
+        yield json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
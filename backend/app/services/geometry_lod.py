@@ -0,0 +1,96 @@
+"""
+Geometry Level-of-Detail Service
+Precomputes simplified, coordinate-quantized layer geometries per zoom band
+"""
+from typing import Dict, List, Optional
+import math
+import numpy as np
+import shapely
+from shapely.geometry import mapping, shape
+
+
+# Web Mercator ground resolution at the equator, metres per pixel at zoom 0
+EQUATOR_METERS_PER_PIXEL = 156543.03
+
+METERS_PER_DEGREE = 111320.0
+
+# Zoom bands served with reduced detail. Zooms above the last band get the
+# original geometry. Coordinates are rounded to `decimals` places, which is
+# well below one pixel at the band's highest zoom (1e-4 deg ~ 9 m).
+ZOOM_BANDS = [
+    {'name': 'z0-12', 'max_zoom': 12, 'decimals': 4},
+    {'name': 'z13-14', 'max_zoom': 14, 'decimals': 5},
+    {'name': 'z15-16', 'max_zoom': 16, 'decimals': 6},
+]
+
+
+def band_for_zoom(zoom: Optional[float]) -> Optional[int]:
+    """
+    Index of the zoom band serving a map zoom level
+
+    Returns:
+        Index into ZOOM_BANDS, or None when full detail should be served
+    """
+    if zoom is None:
+        return None
+    for index, band in enumerate(ZOOM_BANDS):
+        if zoom <= band['max_zoom']:
+            return index
+    return None
+
+
+def simplify_tolerance(max_zoom: int, latitude: float) -> float:
+    """Simplification tolerance in degrees: half a screen pixel at max_zoom"""
+    meters_per_pixel = EQUATOR_METERS_PER_PIXEL * math.cos(math.radians(latitude)) / 2 ** max_zoom
+    return 0.5 * meters_per_pixel / METERS_PER_DEGREE
+
+
+def simplify_collection(collection: Dict, band: Dict, latitude: float) -> Dict:
+    """
+    Simplify every geometry of a FeatureCollection for one zoom band
+
+    Simplification preserves topology (no self-intersections or collapsed
+    holes); features that become empty or degenerate after quantization are
+    smaller than a pixel at this zoom and are dropped.
+
+    Args:
+        collection: GeoJSON FeatureCollection
+        band: Entry of ZOOM_BANDS
+        latitude: Reference latitude for the pixel size
+
+    Returns:
+        New FeatureCollection sharing property dicts with the source
+    """
+    features = [f for f in collection.get('features', []) if f.get('geometry')]
+    if not features:
+        return {'type': 'FeatureCollection', 'features': []}
+
+    geometries = np.array([shape(f['geometry']) for f in features], dtype=object)
+    tolerance = simplify_tolerance(band['max_zoom'], latitude)
+    simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+    decimals = band['decimals']
+    quantized = shapely.transform(simplified, lambda coords: np.round(coords, decimals))
+
+    dimension = shapely.get_dimensions(quantized)
+    keep = ~shapely.is_empty(quantized)
+    keep &= np.where(dimension == 2, shapely.area(quantized) > 0, True)
+    keep &= np.where(dimension == 1, shapely.length(quantized) > 0, True)
+
+    lod_features: List[Dict] = []
+    for feature, geometry in zip(
+        (features[i] for i in np.flatnonzero(keep)),
+        quantized[keep]
+    ):
+        lod_features.append({
+            'type': 'Feature',
+            'properties': feature.get('properties', {}),
+            'geometry': mapping(geometry),
+        })
+
+    return {
+        'type': 'FeatureCollection',
+        'name': collection.get('name'),
+        'features': lod_features,
+    }
+
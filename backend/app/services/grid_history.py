@@ -0,0 +1,316 @@
+"""
+Geogrid Edit History
+Bounded undo/redo for geogrid edits using copy-on-write cell and column deltas
+"""
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Sequence
+import abc
+import numpy as np
+
+
+# Rough per-feature footprint of a grid cell dict, used for the memory budget
+FEATURE_BYTES = 1024
+VALUE_BYTES = 32
+
+
+class GridDelta(abc.ABC):
+    """
+    One reversible geogrid edit
+
+    A delta only stores the side of the edit that is *not* live in the
+    grid: the previous values while it sits on the undo stack, the newer
+    values once it has been undone. Undo and redo are therefore the same
+    ``swap`` operation and cost O(changed cells); unchanged cells are
+    shared with the live grid and never copied.
+    """
+
+    def __init__(self, meta: Optional[Dict] = None):
+        # Table meta fields to restore together with the grid (e.g. active_scenario)
+        self.meta = dict(meta or {})
+        self.label = None
+        self.version_before = None
+        self.version_after = None
+        self.created = datetime.now().isoformat()
+
+    @property
+    def columns(self) -> Optional[List[str]]:
+        """Changed grid properties, or None if the layer structure changed"""
+        return None
+
+    @property
+    def nbytes(self) -> int:
+        return 0
+
+    @abc.abstractmethod
+    def swap(self, grid: Dict) -> Dict:
+        """Exchange the stored side with the live grid; returns the live grid"""
+
+    def swap_meta(self, meta: Dict) -> None:
+        for key, stored in list(self.meta.items()):
+            current = meta.get(key)
+            if stored is None:
+                meta.pop(key, None)
+            else:
+                meta[key] = stored
+            self.meta[key] = current
+
+    def stored_values(self, column: str) -> Optional[tuple]:
+        """(indices, float values) of column held by this delta, for version reconstruction"""
+        raise ValueError("History step cannot be reconstructed column-wise")
+
+    def live_record(self, grid: Dict, meta: Dict) -> Dict:
+        """Live side of the delta as a write-ahead log record (see table_store.apply_record)"""
+        record = self._live_changes(grid)
+        record['layer'] = 'geogrid'
+        record['meta'] = {key: meta.get(key) for key in self.meta}
+        return record
+
+    @abc.abstractmethod
+    def _live_changes(self, grid: Dict) -> Dict:
+        """Record fields (op and payload) describing the live side of the delta"""
+
+    def describe(self) -> Dict:
+        return {
+            'label': self.label,
+            'created': self.created,
+            'version_before': self.version_before,
+            'version_after': self.version_after,
+            'columns': self.columns,
+        }
+
+
+def _as_float(value) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+
+class CellDelta(GridDelta):
+    """Individual features replaced (same cell count as before)"""
+
+    def __init__(self, features: Dict[int, Dict], columns: Optional[List[str]], meta: Optional[Dict] = None):
+        super().__init__(meta)
+        self.features = features
+        self._columns = columns
+
+    @property
+    def columns(self) -> Optional[List[str]]:
+        return self._columns
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.features) * FEATURE_BYTES
+
+    def swap(self, grid: Dict) -> Dict:
+        live = grid['features']
+        for index, stored in self.features.items():
+            live[index], self.features[index] = stored, live[index]
+        return grid
+
+    def _live_changes(self, grid: Dict) -> Dict:
+        live = grid['features']
+        return {'op': 'cells', 'features': {index: live[index] for index in self.features}}
+
+    def stored_values(self, column: str) -> tuple:
+        indices = np.fromiter(self.features.keys(), dtype=np.int64, count=len(self.features))
+        values = np.array([_as_float(f.get('properties', {}).get(column)) for f in self.features.values()])
+        return indices, values
+
+
+class ColumnDelta(GridDelta):
+    """Some properties rewritten across many cells (e.g. a scenario)"""
+
+    def __init__(self, columns: Dict[str, tuple], meta: Optional[Dict] = None):
+        super().__init__(meta)
+        # column -> (indices array, list of raw values)
+        self.values = columns
+
+    @classmethod
+    def capture(cls, grid: Dict, columns: Sequence[str], meta: Optional[Dict] = None) -> 'ColumnDelta':
+        """Snapshot the current values of columns before they are modified in place"""
+        features = grid.get('features', [])
+        captured = {}
+        for column in columns:
+            indices = [i for i, f in enumerate(features) if column in f.get('properties', {})]
+            captured[column] = (
+                np.array(indices, dtype=np.int64),
+                [features[i]['properties'][column] for i in indices]
+            )
+        return cls(captured, meta)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(indices.nbytes + len(values) * VALUE_BYTES for indices, values in self.values.values())
+
+    def swap(self, grid: Dict) -> Dict:
+        features = grid['features']
+        for column, (indices, stored) in self.values.items():
+            current = []
+            for index, value in zip(indices, stored):
+                props = features[index]['properties']
+                current.append(props[column])
+                props[column] = value
+            self.values[column] = (indices, current)
+        return grid
+
+    def _live_changes(self, grid: Dict) -> Dict:
+        features = grid['features']
+        return {'op': 'columns', 'columns': {
+            column: (indices.tolist(), [features[index]['properties'][column] for index in indices])
+            for column, (indices, _) in self.values.items()
+        }}
+
+    def stored_values(self, column: str) -> Optional[tuple]:
+        if column not in self.values:
+            return None
+        indices, stored = self.values[column]
+        return indices, np.array([_as_float(v) for v in stored])
+
+
+class LayerDelta(GridDelta):
+    """Whole geogrid replaced with a differently shaped one"""
+
+    def __init__(self, grid: Dict, meta: Optional[Dict] = None):
+        super().__init__(meta)
+        self.grid = grid
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.grid.get('features', [])) * FEATURE_BYTES
+
+    def swap(self, grid: Dict) -> Dict:
+        stored, self.grid = self.grid, grid
+        return stored
+
+    def _live_changes(self, grid: Dict) -> Dict:
+        return {'op': 'layer', 'data': grid}
+
+
+def diff_grids(old: Dict, new: Dict, meta: Optional[Dict] = None) -> GridDelta:
+    """
+    Delta turning the live grid old into new, for POST /geogrid
+
+    When the cell count is unchanged only differing features are kept, so
+    applying it patches the live grid in place. The delta is created in the
+    "not yet applied" state: call ``swap`` once to apply it.
+    """
+    old_features = old.get('features', [])
+    new_features = new.get('features', [])
+    if len(old_features) != len(new_features):
+        return LayerDelta(new, meta)
+
+    changed = {}
+    columns = set()
+    geometry_changed = False
+    for index, (before, after) in enumerate(zip(old_features, new_features)):
+        if before == after:
+            continue
+        changed[index] = after
+        if before.get('geometry') != after.get('geometry'):
+            geometry_changed = True
+        props_before = before.get('properties', {})
+        props_after = after.get('properties', {})
+        columns.update(
+            key for key in set(props_before) | set(props_after)
+            if props_before.get(key) != props_after.get(key)
+        )
+    return CellDelta(changed, None if geometry_changed else sorted(columns), meta)
+
+
+class GridHistory:
+    """
+    Bounded undo/redo stacks of geogrid deltas
+
+    Args:
+        max_steps: Maximum undo steps kept
+        max_bytes: Approximate memory budget for stored deltas; the oldest
+                   steps are dropped first
+    """
+
+    def __init__(self, max_steps: int = 200, max_bytes: int = 64 * 1024 * 1024):
+        self.max_steps = max_steps
+        self.max_bytes = max_bytes
+        self.undo_stack: Deque[GridDelta] = deque()
+        self.redo_stack: List[GridDelta] = []
+
+    @property
+    def nbytes(self) -> int:
+        return sum(d.nbytes for d in self.undo_stack) + sum(d.nbytes for d in self.redo_stack)
+
+    def record(self, delta: GridDelta, label: str, version_before, version_after) -> None:
+        """Push an applied edit; a new edit discards the redo stack"""
+        delta.label = label
+        delta.version_before = version_before
+        delta.version_after = version_after
+        self.undo_stack.append(delta)
+        self.redo_stack.clear()
+        while self.undo_stack and (len(self.undo_stack) > self.max_steps or self.nbytes > self.max_bytes):
+            self.undo_stack.popleft()
+
+    def undo(self, grid: Dict, meta: Dict) -> Optional[tuple]:
+        """
+        Revert the latest edit
+
+        Returns:
+            Tuple of (live grid, delta), or None when there is nothing to undo
+        """
+        if not self.undo_stack:
+            return None
+        delta = self.undo_stack.pop()
+        grid = delta.swap(grid)
+        delta.swap_meta(meta)
+        self.redo_stack.append(delta)
+        return grid, delta
+
+    def redo(self, grid: Dict, meta: Dict) -> Optional[tuple]:
+        """Re-apply the latest undone edit (same return as undo)"""
+        if not self.redo_stack:
+            return None
+        delta = self.redo_stack.pop()
+        grid = delta.swap(grid)
+        delta.swap_meta(meta)
+        self.undo_stack.append(delta)
+        return grid, delta
+
+    def columns_at(self, version, current_version, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Reconstruct grid columns as they were at an earlier geogrid version
+
+        Walks the undo stack backwards, patching copies of the current
+        column arrays with each step's stored values (O(changed cells) per
+        step).
+
+        Raises:
+            KeyError: version is not reachable through the undo stack
+            ValueError: a step in between replaced the whole layer
+        """
+        if version == current_version:
+            return columns
+        result = {name: values.copy() for name, values in columns.items()}
+        for delta in reversed(self.undo_stack):
+            for name, values in result.items():
+                stored = delta.stored_values(name)
+                if stored is not None:
+                    indices, old_values = stored
+                    values[indices] = old_values
+            if delta.version_before == version:
+                return result
+        raise KeyError(version)
+
+    def status(self) -> Dict:
+        return {
+            'can_undo': bool(self.undo_stack),
+            'can_redo': bool(self.redo_stack),
+            'undo_steps': len(self.undo_stack),
+            'redo_steps': len(self.redo_stack),
+            'max_steps': self.max_steps,
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'undo': [d.describe() for d in reversed(self.undo_stack)],
+            'redo': [d.describe() for d in reversed(self.redo_stack)],
+        }
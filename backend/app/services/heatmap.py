@@ -0,0 +1,125 @@
+"""
+Heatmap Raster Service
+Rasterizes grid indicator columns into georeferenced PNG/WebP images
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import io
+import numpy as np
+from PIL import Image
+
+from .columnar import GridIndex
+
+
+IMAGE_FORMATS = {'png': 'PNG', 'webp': 'WEBP'}
+
+# Fallback when neither the indicator nor the request names a colormap (YlOrRd)
+DEFAULT_COLORMAP = [
+    [255, 255, 178],
+    [254, 204, 92],
+    [253, 141, 60],
+    [240, 59, 32],
+    [189, 0, 38],
+]
+
+
+def colormap_lut(stops: Sequence[Sequence[int]], size: int = 256) -> np.ndarray:
+    """
+    Interpolate evenly spaced RGB colour stops into a lookup table
+
+    Returns:
+        (size, 3) uint8 array
+    """
+    stops = np.asarray(stops, dtype=float)
+    positions = np.linspace(0, 1, len(stops))
+    samples = np.linspace(0, 1, size)
+    lut = np.stack([np.interp(samples, positions, stops[:, channel]) for channel in range(3)], axis=1)
+    return lut.round().astype(np.uint8)
+
+
+def heatmap_style(config: Dict, prop: str, colormap: Optional[str] = None) -> Dict:
+    """
+    Resolve colormap stops and value domain for a grid property
+
+    The indicator entry of the table config whose ``property`` matches is
+    used; ``colormap`` (a key of the config's ``colormaps``) overrides it.
+    """
+    indicator = next(
+        (i for i in config.get('indicators', []) if i.get('property') == prop),
+        {}
+    )
+    colormaps = config.get('colormaps', {})
+    name = colormap or indicator.get('colormap')
+    return {
+        'colormap': name if name in colormaps else None,
+        'stops': colormaps.get(name, DEFAULT_COLORMAP),
+        'domain': indicator.get('domain'),
+        'name': indicator.get('name', prop),
+        'unit': indicator.get('unit'),
+    }
+
+
+def rasterize(index: GridIndex, values: np.ndarray) -> np.ndarray:
+    """
+    Lay a per-cell column out on the grid lattice, north-up
+
+    Returns:
+        (rows, cols) float array, NaN where the lattice has no cell or no value
+    """
+    raster = np.full(index.shape, np.nan)
+    occupied = index.lattice >= 0
+    raster[occupied] = values[index.lattice[occupied]]
+    return raster[::-1]
+
+
+def lattice_bounds(index: GridIndex) -> List[float]:
+    """[west, south, east, north] of the grid lattice"""
+    bounds = index.bounds
+    return [
+        float(np.nanmin(bounds[:, 0])),
+        float(np.nanmin(bounds[:, 1])),
+        float(np.nanmax(bounds[:, 2])),
+        float(np.nanmax(bounds[:, 3])),
+    ]
+
+
+def render(
+    raster: np.ndarray,
+    stops: Sequence[Sequence[int]],
+    domain: Tuple[float, float],
+    image_format: str = 'png',
+    scale: int = 1,
+    alpha: int = 200
+) -> bytes:
+    """
+    Colour a raster and encode it as an image
+
+    Args:
+        raster: Output of rasterize()
+        stops: Colormap RGB stops
+        domain: (vmin, vmax) mapped onto the colormap
+        image_format: 'png' or 'webp'
+        scale: Integer upscaling factor (nearest neighbour, keeps cell edges crisp)
+        alpha: Opacity of cells with a value, cells without one are transparent
+
+    Returns:
+        Encoded image bytes
+    """
+    vmin, vmax = domain
+    span = vmax - vmin if vmax > vmin else 1.0
+    lut = colormap_lut(stops)
+
+    valid = ~np.isnan(raster)
+    normalized = np.clip((np.nan_to_num(raster, nan=vmin) - vmin) / span, 0, 1)
+    rgba = np.zeros(raster.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = lut[(normalized * (len(lut) - 1)).round().astype(int)]
+    rgba[..., 3] = np.where(valid, alpha, 0)
+
+    if scale > 1:
+        rgba = rgba.repeat(scale, axis=0).repeat(scale, axis=1)
+
+    buffer = io.BytesIO()
+    if image_format == 'webp':
+        Image.fromarray(rgba, 'RGBA').save(buffer, IMAGE_FORMATS[image_format], lossless=True)
+    else:
+        Image.fromarray(rgba, 'RGBA').save(buffer, IMAGE_FORMATS[image_format], optimize=True)
+    return buffer.getvalue()
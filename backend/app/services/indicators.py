@@ -0,0 +1,284 @@
+"""
+Indicator Engine
+Registry of vectorized urban indicators with dependency-tracked incremental evaluation
+"""
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+import logging
+import numpy as np
+
+from .columnar import property_columns
+from .versioned_cache import VersionedCache
+
+
+logger = logging.getLogger(__name__)
+
+# (layer, column) -> version; column None means the layer's feature set
+VersionLookup = Callable[[str, Optional[str]], Hashable]
+
+AGGREGATES = {
+    'mean': np.nanmean,
+    'sum': np.nansum,
+    'min': np.nanmin,
+    'max': np.nanmax,
+    'median': np.nanmedian,
+}
+
+
+class ColumnSource:
+    """
+    Lazy column access over a table's layers
+
+    Columns are extracted from the GeoJSON layers once and cached under the
+    version of that column, so an edit to one grid property does not force
+    re-extraction of the others.
+    """
+
+    def __init__(self, table_name: str, table: Dict, versions: VersionLookup, cache: VersionedCache):
+        self.table_name = table_name
+        self.table = table
+        self.versions = versions
+        self.cache = cache
+
+    def numeric(self, layer: str, column: str) -> np.ndarray:
+        """Float array of a property (NaN where missing)"""
+        return self.cache.get_or_compute(
+            (self.table_name, 'column', layer, column),
+            self.versions(layer, column),
+            lambda: property_columns(self.table.get(layer, {}), [column])[column]
+        )
+
+    def values(self, layer: str, column: str) -> np.ndarray:
+        """Object array of a property's raw values (None where missing)"""
+        return self.cache.get_or_compute(
+            (self.table_name, 'values', layer, column),
+            self.versions(layer, column),
+            lambda: np.array(
+                [f.get('properties', {}).get(column) for f in self.table.get(layer, {}).get('features', [])],
+                dtype=object
+            )
+        )
+
+    def count(self, layer: str) -> int:
+        """Number of features in a layer"""
+        return len(self.table.get(layer, {}).get('features', []))
+
+
+class OverlayColumns(ColumnSource):
+    """
+    ColumnSource with some columns of one layer replaced
+
+    Used to evaluate indicators for hypothetical states (scenarios, history
+    versions) without touching the stored table.
+    """
+
+    def __init__(self, base: ColumnSource, layer: str, overrides: Dict[str, np.ndarray]):
+        super().__init__(base.table_name, base.table, base.versions, base.cache)
+        self.layer = layer
+        self.overrides = overrides
+
+    def numeric(self, layer: str, column: str) -> np.ndarray:
+        if layer == self.layer and column in self.overrides:
+            return self.overrides[column]
+        return super().numeric(layer, column)
+
+
+class Indicator:
+    """
+    A table-level indicator
+
+    Args:
+        key: Stable identifier
+        name: Display name (CityIO indicator name)
+        inputs: (layer, column) pairs the compute function reads; a column
+                of None means it depends on the layer's feature set
+        compute: Function of a ColumnSource returning the indicator value
+        unit: Display unit
+        description: Short description
+        precision: Decimal places to round float values to
+    """
+
+    def __init__(
+        self,
+        key: str,
+        name: str,
+        inputs: Sequence[Tuple[str, Optional[str]]],
+        compute: Callable[[ColumnSource], float],
+        unit: str = '',
+        description: str = '',
+        precision: int = 1
+    ):
+        self.key = key
+        self.name = name
+        self.inputs = list(inputs)
+        self.compute = compute
+        self.unit = unit
+        self.description = description
+        self.precision = precision
+
+    def evaluate(self, columns: ColumnSource) -> Dict:
+        value = self.compute(columns)
+        if isinstance(value, (float, np.floating)):
+            value = 0 if np.isnan(value) else round(float(value), self.precision)
+        elif isinstance(value, np.integer):
+            value = int(value)
+        return {
+            'name': self.name,
+            'value': value,
+            'unit': self.unit,
+            'description': self.description
+        }
+
+
+# Built-in indicators, in display order
+REGISTRY: Dict[str, Indicator] = {}
+
+
+def register(indicator: Indicator) -> Indicator:
+    """Add an indicator to the built-in registry (replacing one with the same key)"""
+    REGISTRY[indicator.key] = indicator
+    return indicator
+
+
+def _mean(values: np.ndarray) -> float:
+    return float(np.nanmean(values)) if np.isfinite(values).any() else 0.0
+
+
+def _distinct(values: np.ndarray) -> int:
+    return len({v for v in values if v})
+
+
+register(Indicator(
+    'walkability', 'Yürünebilirlik', [('geogrid', 'walkability')],
+    lambda c: _mean(c.numeric('geogrid', 'walkability')),
+    'puan', 'Ortalama yürünebilirlik skoru'
+))
+register(Indicator(
+    'building_count', 'Bina Sayısı', [('buildings', None)],
+    lambda c: c.count('buildings'),
+    'adet', 'Toplam bina sayısı'
+))
+register(Indicator(
+    'poi_count', 'POI Sayısı', [('pois', None)],
+    lambda c: c.count('pois'),
+    'adet', 'İlgi noktası sayısı'
+))
+register(Indicator(
+    'poi_diversity', 'POI Çeşitliliği', [('pois', 'category')],
+    lambda c: _distinct(c.values('pois', 'category')),
+    'kategori', 'Farklı POI kategori sayısı'
+))
+register(Indicator(
+    'grid_cells', 'Grid Hücreleri', [('geogrid', None)],
+    lambda c: c.count('geogrid'),
+    'hücre', 'Analiz grid hücre sayısı'
+))
+
+
+def config_indicator(definition: Dict) -> Optional[Indicator]:
+    """
+    Build a grid aggregate indicator from a table config entry
+
+    Entries need a ``property``; ``aggregate`` (mean, sum, min, max,
+    median; default mean) and ``scale`` (multiplier, e.g. 100 for ratios
+    shown in %) are optional.
+    """
+    prop = definition.get('property')
+    aggregate = AGGREGATES.get(definition.get('aggregate', 'mean'))
+    if not prop or aggregate is None:
+        return None
+    scale = definition.get('scale', 1)
+
+    def compute(columns: ColumnSource) -> float:
+        values = columns.numeric('geogrid', prop)
+        if not np.isfinite(values).any():
+            return 0.0
+        return float(aggregate(values)) * scale
+
+    return Indicator(
+        f"config:{prop}:{definition.get('aggregate', 'mean')}",
+        definition.get('name', prop),
+        [('geogrid', prop)],
+        compute,
+        definition.get('unit', ''),
+        definition.get('description', f"Grid {prop} ({definition.get('aggregate', 'mean')})"),
+        definition.get('precision', 1)
+    )
+
+
+def table_indicators(config: Dict) -> List[Indicator]:
+    """Built-in indicators followed by the config's grid indicators (by unique name)"""
+    indicators = list(REGISTRY.values())
+    names = {i.name for i in indicators}
+    for definition in config.get('indicators', []):
+        indicator = config_indicator(definition)
+        if indicator and indicator.name not in names:
+            indicators.append(indicator)
+            names.add(indicator.name)
+    return indicators
+
+
+class IndicatorEngine:
+    """
+    Evaluates indicators, recomputing only those whose inputs changed
+
+    Each result is cached under the tuple of its input versions; after an
+    edit only indicators reading an edited column (or a replaced layer) miss
+    the cache.
+    """
+
+    def __init__(self, cache: Optional[VersionedCache] = None):
+        self.cache = cache if cache is not None else VersionedCache(max_entries=1024)
+        self.last_recomputed: List[str] = []
+
+    def columns(self, table_name: str, table: Dict, versions: VersionLookup) -> ColumnSource:
+        return ColumnSource(table_name, table, versions, self.cache)
+
+    def evaluate(
+        self,
+        table_name: str,
+        table: Dict,
+        versions: VersionLookup,
+        indicators: Sequence[Indicator]
+    ) -> List[Dict]:
+        """
+        Evaluate indicators for a table
+
+        Args:
+            table_name: Table key (cache namespace)
+            table: CityIO table dict with the layer FeatureCollections
+            versions: Version lookup for (layer, column) inputs
+            indicators: Indicators to evaluate, in output order
+
+        Returns:
+            List of CityIO indicator dicts
+        """
+        columns = self.columns(table_name, table, versions)
+        recomputed = []
+        results = []
+        for indicator in indicators:
+            input_version = tuple(versions(layer, column) for layer, column in indicator.inputs)
+            key = (table_name, 'indicator', indicator.key)
+            result = self.cache.get(key, input_version)
+            if result is None:
+                result = indicator.evaluate(columns)
+                self.cache.put(key, input_version, result)
+                recomputed.append(indicator.key)
+            results.append(result)
+
+        self.last_recomputed = recomputed
+        if recomputed:
+            logger.debug(f"{table_name}: recomputed indicators {recomputed}")
+        return results
+
+    def evaluate_overlay(
+        self,
+        table_name: str,
+        table: Dict,
+        versions: VersionLookup,
+        indicators: Sequence[Indicator],
+        layer: str,
+        overrides: Dict[str, np.ndarray]
+    ) -> List[Dict]:
+        """Evaluate indicators with some columns of layer replaced (not cached)"""
+        columns = OverlayColumns(self.columns(table_name, table, versions), layer, overrides)
+        return [indicator.evaluate(columns) for indicator in indicators]
@@ -0,0 +1,150 @@
+"""
+Layer File Readers
+Loads table layers from GeoParquet, FlatGeobuf, GeoJSON or GeoJSONSeq, preferring the columnar formats
+"""
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+import json
+import logging
+import shapely
+from shapely.geometry import shape
+
+
+logger = logging.getLogger(__name__)
+
+# Extensions tried for a layer, fastest first. GeoParquet and FlatGeobuf need
+# geopandas (and pyarrow / pyogrio); without it those files are skipped.
+LAYER_EXTENSIONS = ('parquet', 'fgb', 'geojson', 'geojsonseq')
+
+# Formats parsed with the standard library
+TEXT_EXTENSIONS = ('geojson', 'geojsonseq')
+
+try:
+    import geopandas
+except ImportError:  # columnar layers are optional
+    geopandas = None
+
+
+def find_layer(directory: Path, stem: str) -> Optional[Path]:
+    """
+    First existing <stem>.<ext> in LAYER_EXTENSIONS order that can be read here
+
+    Columnar copies are written right after the GeoJSON they were made
+    from, so any copy older than the newest GeoJSON/GeoJSONSeq of the layer
+    is left over from an earlier run and skipped.
+    """
+    existing = [
+        (extension, path) for extension, path in
+        ((extension, Path(directory) / f'{stem}.{extension}') for extension in LAYER_EXTENSIONS)
+        if path.exists()
+    ]
+    newest_text = max(
+        (path.stat().st_mtime for extension, path in existing if extension in TEXT_EXTENSIONS),
+        default=None
+    )
+    for extension, path in existing:
+        if newest_text is not None and path.stat().st_mtime < newest_text:
+            logger.warning(f"{path.name}: older than the GeoJSON copy of the layer, skipping it")
+            continue
+        if extension not in TEXT_EXTENSIONS and geopandas is None:
+            logger.warning(f"{path.name}: geopandas is not installed, looking for a GeoJSON copy")
+            continue
+        return path
+    return None
+
+
+def read_layer(
+    path: Path,
+    columns: Optional[Sequence[str]] = None,
+    bbox: Optional[Sequence[float]] = None
+) -> Dict:
+    """
+    Read a layer file into a GeoJSON FeatureCollection
+
+    Only the requested property columns are read, and GeoParquet (with a
+    bbox covering column or row-group statistics) and FlatGeobuf (with its
+    packed R-tree) skip data outside the bbox without decoding it.
+
+    Args:
+        path: .parquet, .fgb, .geojson or .geojsonseq file
+        columns: Feature properties to keep (None = all)
+        bbox: (minx, miny, maxx, maxy) features must intersect (None = all)
+
+    Returns:
+        FeatureCollection dict
+    """
+    path = Path(path)
+    if path.suffix == '.geojson':
+        with open(path, 'r', encoding='utf-8') as f:
+            return filter_collection(json.load(f), columns, bbox)
+
+    if path.suffix == '.geojsonseq':
+        return filter_collection(read_feature_lines(path), columns, bbox)
+
+    if path.suffix == '.parquet':
+        if columns is not None:
+            columns = [*columns, 'geometry']
+        try:
+            gdf = geopandas.read_parquet(path, columns=columns, bbox=bbox)
+        except TypeError:  # geopandas < 1.0 has no bbox filter
+            gdf = geopandas.read_parquet(path, columns=columns)
+            if bbox is not None:
+                gdf = gdf[gdf.intersects(shapely.box(*bbox))]
+    else:
+        gdf = geopandas.read_file(path, bbox=tuple(bbox) if bbox is not None else None, columns=columns)
+    if gdf.crs is not None and not gdf.crs.equals('EPSG:4326'):
+        gdf = gdf.to_crs('EPSG:4326')
+    return gdf.to_geo_dict(drop_id=True)
+
+
+def read_feature_lines(path: Path) -> Dict:
+    """FeatureCollection from newline-delimited GeoJSON (RFC 8142 RS prefixes are tolerated)"""
+    features = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip('\x1e \t\r\n')
+            if line:
+                features.append(json.loads(line))
+    return {"type": "FeatureCollection", "features": features}
+
+
+def filter_collection(
+    collection: Dict,
+    columns: Optional[Sequence[str]] = None,
+    bbox: Optional[Sequence[float]] = None
+) -> Dict:
+    """Apply read_layer's column and bbox selection to an already parsed FeatureCollection"""
+    features = collection.get('features', [])
+    if bbox is not None and features:
+        geometries = [shape(feature['geometry']) if feature.get('geometry') else None for feature in features]
+        keep = shapely.intersects(geometries, shapely.box(*bbox))
+        features = [feature for feature, inside in zip(features, keep) if inside]
+    if columns is not None:
+        columns = set(columns)
+        features = [
+            {**feature, 'properties': {k: v for k, v in feature.get('properties', {}).items() if k in columns}}
+            for feature in features
+        ]
+    if features is collection.get('features'):
+        return collection
+    return {**collection, 'features': features}
+
+
+def load_layer(
+    directory: Path,
+    stem: str,
+    columns: Optional[Sequence[str]] = None,
+    bbox: Optional[Sequence[float]] = None
+) -> Optional[Dict]:
+    """
+    Load <stem> from the preferred available format
+
+    Returns:
+        FeatureCollection dict, or None when no file exists
+    """
+    path = find_layer(directory, stem)
+    if path is None:
+        return None
+    collection = read_layer(path, columns, bbox)
+    logger.info(f"{path.name}: {len(collection.get('features', []))} features")
+    return collection
@@ -3,13 +3,16 @@ Traffic Analysis Scheduler
 Runs hourly satellite image analysis automatically
 """
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 import logging
 
-from ..database import SessionLocal
+from ..database import SessionLocal, engine
 from .sentinel_service import SentinelHubService
 from .yolo_service import VehicleDetectionService
+from .traffic_retention import apply_retention
+from .stock_ledger import take_snapshots
 from .. import models
 import json
 
@@ -38,6 +41,24 @@ class TrafficAnalysisScheduler:
             replace_existing=True,
         )
 
+        # Expire old traffic rows once a day, off the hourly analysis slot
+        self.scheduler.add_job(
+            func=self.run_retention,
+            trigger=CronTrigger(hour=3, minute=30),
+            id="daily_traffic_retention",
+            name="Apply traffic data retention",
+            replace_existing=True,
+        )
+
+        # Daily balance snapshots bound the ledger rows a point-in-time balance sums
+        self.scheduler.add_job(
+            func=self.run_inventory_snapshots,
+            trigger=CronTrigger(hour=0, minute=5),
+            id="daily_inventory_snapshots",
+            name="Snapshot inventory balances",
+            replace_existing=True,
+        )
+
         self.scheduler.start()
         logger.info("🚀 Traffic analysis scheduler started - will run every hour")
 
@@ -109,8 +130,8 @@ class TrafficAnalysisScheduler:
 
             # Create traffic density record
             traffic_density = models.TrafficDensity(
-                latitude=str(center_lat),
-                longitude=str(center_lon),
+                latitude=center_lat,
+                longitude=center_lon,
                 density_score=density_score,
                 vehicle_count=vehicle_count,
                 satellite_image_id=image_id
@@ -143,6 +164,22 @@ class TrafficAnalysisScheduler:
         finally:
             db.close()
 
+    def run_retention(self):
+        """Move expired traffic rows into monthly partitions and drop old partitions"""
+        try:
+            apply_retention(engine)
+        except Exception:
+            # Retention is retried on the next run; never crash the scheduler
+            logger.exception("❌ Traffic retention failed")
+
+    def run_inventory_snapshots(self):
+        """Record every item's current balance"""
+        try:
+            count = take_snapshots(engine)
+            logger.info(f"📦 Inventory balance snapshots taken for {count} items")
+        except Exception:
+            logger.exception("❌ Inventory snapshot failed")
+
     def run_now(self):
         """Run analysis immediately (for testing)"""
         logger.info("▶️ Running traffic analysis immediately (manual trigger)")
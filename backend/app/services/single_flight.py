@@ -0,0 +1,162 @@
+"""
+Single-Flight Request Coalescing
+Concurrent identical computations share one in-flight call and a short-lived result
+"""
+from concurrent.futures import Future
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+import asyncio
+import threading
+import time
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one computation
+
+    The first caller for a key (the leader) runs the computation; callers
+    arriving while it is in flight wait for and receive the same result
+    (or exception). Results are then kept for ttl seconds so a burst of
+    requests just after completion is also served without recomputing.
+
+    Keys should include everything the result depends on (endpoint,
+    parameters, data version).
+
+    Args:
+        ttl: Seconds a finished result is reused (0 = only coalesce in-flight calls)
+        max_entries: Maximum number of finished results kept
+    """
+
+    def __init__(self, ttl: float = 0.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        # key -> (expiry, value)
+        self._results: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Running leader tasks of do_async (the event loop keeps only weak references)
+        self._tasks = set()
+        self.calls = 0
+        self.coalesced = 0
+
+    def _cached(self, key: Hashable):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._results[key]
+            return None
+        return entry
+
+    def _join(self, key: Hashable):
+        """Under the lock: (cached entry, in-flight future, is_leader)"""
+        self.calls += 1
+        entry = self._cached(key)
+        if entry is not None:
+            self.coalesced += 1
+            return entry, None, False
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            return None, flight, False
+        flight = self._inflight[key] = Future()
+        return None, flight, True
+
+    def do(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the result for key, computing it at most once concurrently
+
+        Args:
+            key: Identity of the computation (must be hashable)
+            compute: Zero-argument callable producing the result
+
+        Returns:
+            The shared result
+        """
+        with self._lock:
+            entry, flight, leader = self._join(key)
+        if entry is not None:
+            return entry[1]
+        if not leader:
+            return flight.result()
+        return self._lead(key, flight, compute)
+
+    async def do_async(self, key: Hashable, compute: Callable[[], Any], executor=None) -> Any:
+        """
+        Async variant of do()
+
+        A coroutine function runs in a task owned by the flight, any other
+        callable in executor, so the computation never belongs to one
+        caller's request. Every caller awaits the shared future through
+        asyncio.shield: a caller that is cancelled (e.g. its client
+        disconnected) stops waiting without cancelling the computation or
+        the other callers. compute must not use request-scoped resources
+        such as the leader's database session.
+        """
+        with self._lock:
+            entry, flight, leader = self._join(key)
+        if entry is not None:
+            return entry[1]
+        if leader:
+            if asyncio.iscoroutinefunction(compute):
+                task = asyncio.ensure_future(self._lead_async(key, flight, compute))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            else:
+                try:
+                    asyncio.get_running_loop().run_in_executor(executor, self._lead_quietly, key, flight, compute)
+                except BaseException as e:  # executor shut down
+                    self._fail(key, flight, e)
+                    raise
+        return await asyncio.shield(asyncio.wrap_future(flight))
+
+    async def _lead_async(self, key: Hashable, flight: Future, compute: Callable[[], Any]) -> None:
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            # Only happens when the loop shuts down; waiters get an error, not a cancellation
+            self._fail(key, flight, RuntimeError(f"Computation for {key!r} was cancelled"))
+        except BaseException as e:
+            self._fail(key, flight, e)
+        else:
+            self._succeed(key, flight, value)
+
+    def _lead_quietly(self, key: Hashable, flight: Future, compute: Callable[[], Any]) -> None:
+        """_lead() for a worker thread: the outcome is delivered through flight only"""
+        try:
+            self._lead(key, flight, compute)
+        except BaseException:
+            pass
+
+    def _lead(self, key: Hashable, flight: Future, compute: Callable[[], Any]) -> Any:
+        try:
+            value = compute()
+        except BaseException as e:
+            self._fail(key, flight, e)
+            raise
+        return self._succeed(key, flight, value)
+
+    def _fail(self, key: Hashable, flight: Future, error: BaseException) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+        flight.set_exception(error)
+
+    def _succeed(self, key: Hashable, flight: Future, value: Any) -> Any:
+        with self._lock:
+            if self.ttl > 0:
+                self._results[key] = (time.monotonic() + self.ttl, value)
+                self._results.move_to_end(key)
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+            self._inflight.pop(key, None)
+        flight.set_result(value)
+        return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._inflight),
+                'cached': len(self._results),
+            }
@@ -0,0 +1,112 @@
+"""
+Stock Alerts
+In-process publish/subscribe of low-stock threshold crossings, delivered after commit
+"""
+from typing import Dict, Optional
+import asyncio
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+# Alerts buffered per subscriber before the oldest are dropped (slow clients)
+SUBSCRIBER_BUFFER = 256
+
+_PENDING_KEY = "stock_alerts"
+
+
+def threshold_crossing(item, before: Optional[int]) -> Optional[Dict]:
+    """
+    Alert for an item whose quantity moved across its critical level
+
+    Args:
+        item: Inventory item after the change (id, sku, name, quantity, critical_level)
+        before: Quantity before the change (None for a new item, which never alerts)
+
+    Returns:
+        Alert dict, or None when the item stayed on the same side
+    """
+    if before is None or item.critical_level is None:
+        return None
+    was_low = before <= item.critical_level
+    is_low = item.quantity <= item.critical_level
+    if was_low == is_low:
+        return None
+    return {
+        "event": "low_stock" if is_low else "restocked",
+        "inventory_item_id": item.id,
+        "sku": item.sku,
+        "name": item.name,
+        "quantity": item.quantity,
+        "critical_level": item.critical_level,
+    }
+
+
+class AlertBroker:
+    """
+    Fan-out of alerts to subscriber queues (SSE streams, WebSockets)
+
+    Alerts only reach subscribers of the same process; run the API with one
+    worker per warehouse screen group, or put a shared broker in front.
+    """
+
+    def __init__(self, buffer: int = SUBSCRIBER_BUFFER):
+        self.buffer = buffer
+        self.subscribers: Dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.buffer)
+        self.subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.pop(queue, None)
+
+    def publish(self, alert: Dict) -> None:
+        """Deliver to every subscriber; safe to call from any thread"""
+        for queue, loop in list(self.subscribers.items()):
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                self._offer(queue, alert)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(self._offer, queue, alert)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, alert: Dict) -> None:
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(alert)
+
+
+broker = AlertBroker()
+
+
+def queue_alert(db: AsyncSession, alert: Optional[Dict]) -> None:
+    """Hold an alert until the session's transaction commits (dropped on rollback)"""
+    if alert is not None:
+        db.info.setdefault(_PENDING_KEY, []).append(alert)
+
+
+def _publish_committed(session: Session) -> None:
+    for alert in session.info.pop(_PENDING_KEY, []):
+        broker.publish(alert)
+
+
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+_installed = False
+
+
+def install_alert_hooks() -> None:
+    """Publish queued alerts when a session commits (sync and async sessions)"""
+    global _installed
+    if not _installed:
+        event.listen(Session, "after_commit", _publish_committed)
+        event.listen(Session, "after_rollback", _discard_rolled_back)
+        _installed = True
@@ -0,0 +1,184 @@
+"""
+Stock Ledger
+Atomic conditional stock changes recorded in an append-only movement ledger with balance snapshots
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+from .stock_alerts import queue_alert, threshold_crossing
+
+
+def conditional_change(delta: int, *criteria):
+    """
+    UPDATE adding delta to an item's quantity only if it stays non-negative
+
+    The check and the write are one statement, so concurrent consumers can
+    never drive stock below zero or overwrite each other's changes, and no
+    row is held locked beyond the statement itself.
+    """
+    item = models.InventoryItem
+    return (
+        update(item)
+        .where(*criteria, item.quantity + delta >= 0)
+        .values(quantity=item.quantity + delta)
+        .returning(item)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def ledger_entry(item_id: int, delta: int, balance: int, reason: str, work_order_id: Optional[int] = None) -> Dict:
+    return {
+        "inventory_item_id": item_id,
+        "quantity_change": delta,
+        "balance_after": balance,
+        "reason": reason,
+        "work_order_id": work_order_id,
+    }
+
+
+async def append(db: AsyncSession, entries: List[Dict]) -> None:
+    """Write ledger rows (one executemany INSERT)"""
+    if entries:
+        await db.execute(insert(models.InventoryMovement), entries)
+
+
+async def change_stock(
+    db: AsyncSession,
+    delta: int,
+    reason: str,
+    *criteria,
+    work_order_id: Optional[int] = None,
+    entries: Optional[List[Dict]] = None,
+) -> Optional[models.InventoryItem]:
+    """
+    Apply a stock change to the item matching the criteria and record it
+
+    Runs in the caller's transaction; the caller commits.
+
+    Args:
+        db: Session
+        delta: Quantity to add (negative to remove)
+        reason: Ledger reason (movement, work_order, ...)
+        criteria: Filter selecting one item (e.g. InventoryItem.sku == sku)
+        work_order_id: Work order consuming the stock, if any
+        entries: Collect the ledger row here instead of writing it now (for batches)
+
+    Returns:
+        The updated item, or None when no item matches or stock would go negative
+    """
+    item = await db.scalar(conditional_change(delta, *criteria))
+    if item is None:
+        return None
+    queue_alert(db, threshold_crossing(item, item.quantity - delta))
+    entry = ledger_entry(item.id, delta, item.quantity, reason, work_order_id)
+    if entries is not None:
+        entries.append(entry)
+    else:
+        await append(db, [entry])
+    return item
+
+
+async def record_balances(db: AsyncSession, items: Iterable, reason: str) -> None:
+    """
+    Record quantities that were set outright (new items, stocktakes) as ledger rows
+
+    The change is measured from each item's last ledger balance; items that
+    cross their critical level that way raise an alert.
+
+    Args:
+        items: Items (or rows) with id, sku, name, quantity and critical_level after the write
+    """
+    items = list(items)
+    if not items:
+        return
+    movement = models.InventoryMovement
+    last_ids = (
+        select(func.max(movement.id))
+        .where(movement.inventory_item_id.in_([item.id for item in items]))
+        .group_by(movement.inventory_item_id)
+    )
+    previous = dict((await db.execute(
+        select(movement.inventory_item_id, movement.balance_after).where(movement.id.in_(last_ids))
+    )).all())
+    entries = []
+    for item in items:
+        before = previous.get(item.id)
+        if item.quantity != before:
+            entries.append(ledger_entry(item.id, item.quantity - (before or 0), item.quantity, reason))
+            queue_alert(db, threshold_crossing(item, before))
+    await append(db, entries)
+
+
+async def balance_at(db: AsyncSession, item_id: int, moment: datetime) -> int:
+    """
+    Quantity of an item at a past moment
+
+    The balance_after of the item's newest ledger row recorded by the moment.
+    Changes to one item are serialized by its row lock, so their ledger rows
+    are in id order. The latest snapshot taken before the moment only bounds
+    how far back the lookup scans. Rows are never summed, so a row that
+    becomes visible late cannot skew later balances.
+    """
+    snapshot = models.InventoryBalanceSnapshot
+    movement = models.InventoryMovement
+    base = (await db.execute(
+        select(snapshot.quantity, snapshot.movement_id)
+        .where(snapshot.inventory_item_id == item_id, snapshot.taken_at <= moment)
+        .order_by(snapshot.taken_at.desc(), snapshot.id.desc())
+        .limit(1)
+    )).first()
+    quantity, from_id = base if base is not None else (0, 0)
+    balance = await db.scalar(
+        select(movement.balance_after)
+        .where(
+            movement.inventory_item_id == item_id,
+            movement.id >= from_id,
+            movement.created_at <= moment,
+        )
+        .order_by(movement.id.desc())
+        .limit(1)
+    )
+    return quantity if balance is None else balance
+
+
+def take_snapshots(engine: Engine) -> int:
+    """
+    Snapshot every item's balance as recorded by its last ledger row
+
+    The quantity is that row's balance_after, not the item's current
+    quantity, so a snapshot always matches the ledger row it points at.
+
+    Returns:
+        Number of snapshots written
+    """
+    movement = models.InventoryMovement.__table__
+    snapshot = models.InventoryBalanceSnapshot.__table__
+    last_rows = select(func.max(movement.c.id)).group_by(movement.c.inventory_item_id)
+    with engine.begin() as connection:
+        return connection.execute(
+            snapshot.insert().from_select(
+                ["inventory_item_id", "movement_id", "quantity"],
+                select(movement.c.inventory_item_id, movement.c.id, movement.c.balance_after)
+                .where(movement.c.id.in_(last_rows)),
+            )
+        ).rowcount
+
+
+def seed_ledger(engine: Engine) -> int:
+    """Give items that predate the ledger an initial entry with their current quantity"""
+    item = models.InventoryItem.__table__
+    movement = models.InventoryMovement.__table__
+    has_movement = select(movement.c.id).where(movement.c.inventory_item_id == item.c.id).exists()
+    with engine.begin() as connection:
+        return connection.execute(
+            movement.insert().from_select(
+                ["inventory_item_id", "quantity_change", "balance_after", "reason"],
+                select(item.c.id, func.coalesce(item.c.quantity, 0), func.coalesce(item.c.quantity, 0), literal("initial"))
+                .where(~has_movement),
+            )
+        ).rowcount
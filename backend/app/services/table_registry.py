@@ -0,0 +1,217 @@
+"""
+Table Registry
+Discovers CityIO table definitions on disk, loads them lazily and evicts cold tables under a memory budget
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import logging
+import sys
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+CONFIG_SUFFIX = '_config.json'
+
+
+def discover_tables(directories: Iterable[Path]) -> Dict[str, Path]:
+    """
+    Find table definitions (``<name>_config.json``)
+
+    Returns:
+        Dict of table name -> directory holding its config and layers; the
+        first directory wins when a name appears more than once
+    """
+    found = {}
+    for directory in directories:
+        directory = Path(directory)
+        if not directory.is_dir():
+            continue
+        for path in sorted(directory.glob(f"*{CONFIG_SUFFIX}")):
+            found.setdefault(path.name[:-len(CONFIG_SUFFIX)], directory)
+    return found
+
+
+def deep_sizeof(obj) -> int:
+    """
+    Approximate memory held by a nested dict/list structure
+
+    Walks containers iteratively and counts each object once; strings,
+    numbers and numpy arrays are counted by their own size.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+    return total
+
+
+class TableRegistry:
+    """
+    Dict-like access to tables, loading them on first use
+
+    ``name in registry`` checks the known (discovered) tables without loading
+    them; ``registry[name]`` loads the table if needed and marks it as
+    recently used. When the loaded tables exceed the memory budget the least
+    recently used ones are evicted, the table being accessed excepted.
+    Tables pinned by an operation in progress are never evicted, so edits
+    cannot land in a dict that was already unloaded.
+
+    Args:
+        discover: Returns the currently known table names
+        load: Builds a table dict for a name
+        budget_bytes: Memory budget for loaded tables (0 = unbounded)
+        on_load: Called with the name once a loaded table is reachable
+                 through the registry (derived data, indicators)
+        on_evict: Called with (name, table) before a table is dropped, e.g.
+                  to checkpoint it when it has unsaved changes
+        sizeof: Memory estimate of a table dict
+    """
+
+    def __init__(
+        self,
+        discover: Callable[[], Iterable[str]],
+        load: Callable[[str], Dict],
+        budget_bytes: int = 0,
+        on_load: Optional[Callable[[str], None]] = None,
+        on_evict: Optional[Callable[[str, Dict], None]] = None,
+        sizeof: Callable[[Dict], int] = deep_sizeof
+    ):
+        self.discover = discover
+        self.load = load
+        self.budget_bytes = budget_bytes
+        self.on_load = on_load
+        self.on_evict = on_evict
+        self.sizeof = sizeof
+        self._tables: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        # table -> number of operations in progress using it
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+    def names(self) -> List[str]:
+        """Known tables, loaded or not"""
+        with self._lock:
+            return sorted(set(self.discover()) | set(self._tables))
+
+    def __contains__(self, name) -> bool:
+        with self._lock:
+            return name in self._tables or name in set(self.discover())
+
+    def __getitem__(self, name: str) -> Dict:
+        with self._lock:
+            if name in self._tables:
+                self._tables.move_to_end(name)
+                return self._tables[name]
+            if name not in set(self.discover()):
+                raise KeyError(name)
+
+            table = self.load(name)
+            self._tables[name] = table
+            self._sizes[name] = self.sizeof(table)
+            logger.info(f"Loaded table {name} ({self._sizes[name] / 1e6:.1f} MB)")
+            if self.on_load:
+                self.on_load(name)
+            self._evict(keep=name)
+            return table
+
+    def __setitem__(self, name: str, table: Dict) -> None:
+        with self._lock:
+            self._tables[name] = table
+            self._tables.move_to_end(name)
+            self._sizes[name] = self.sizeof(table)
+            self._evict(keep=name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names())
+
+    def __len__(self) -> int:
+        return len(self.names())
+
+    def keys(self) -> List[str]:
+        return self.names()
+
+    def loaded(self) -> List[str]:
+        """Tables currently in memory, least recently used first"""
+        with self._lock:
+            return list(self._tables)
+
+    def measure(self, name: str) -> int:
+        """Re-estimate a loaded table's footprint after it grew or shrank"""
+        with self._lock:
+            if name not in self._tables:
+                return 0
+            self._sizes[name] = self.sizeof(self._tables[name])
+            self._evict(keep=name)
+            return self._sizes[name]
+
+    @contextmanager
+    def pinned(self, name: str):
+        """
+        Keep a table from being evicted while the block runs
+
+        The table may be loaded inside the block; pins nest. The budget is
+        enforced again once the last pin is released.
+        """
+        with self._lock:
+            self._pins[name] = self._pins.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[name] -= 1
+                if not self._pins[name]:
+                    del self._pins[name]
+                    self._evict(keep=name)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def evict(self, name: str) -> bool:
+        """Drop a loaded table (it is reloaded on next access); pinned tables are kept"""
+        with self._lock:
+            table = self._tables.get(name)
+            if table is None or name in self._pins:
+                return False
+            if self.on_evict:
+                self.on_evict(name, table)
+            del self._tables[name]
+            self._sizes.pop(name, None)
+            self.evictions += 1
+            logger.info(f"Evicted table {name}")
+            return True
+
+    def _evict(self, keep: str) -> None:
+        if not self.budget_bytes:
+            return
+        for name in list(self._tables):
+            if self.nbytes <= self.budget_bytes:
+                break
+            if name != keep and name not in self._pins:
+                self.evict(name)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'known': len(self.names()),
+                'loaded': list(self._tables),
+                'bytes': self.nbytes,
+                'budget_bytes': self.budget_bytes,
+                'pinned': sorted(self._pins),
+                'evictions': self.evictions,
+                'sizes': dict(self._sizes),
+            }
@@ -0,0 +1,300 @@
+"""
+Table Store
+Write-ahead log and memory-mapped binary checkpoints for in-memory CityIO tables
+"""
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_MAGIC = b'CIOCKPT1'
+# WAL frame: payload length, crc32 of payload, sequence number
+FRAME = struct.Struct('<IIQ')
+# Checkpoint preamble after the magic: header length
+HEADER_LENGTH = struct.Struct('<I')
+PICKLE_PROTOCOL = 5
+
+
+def apply_record(table: Dict, record: Dict) -> None:
+    """
+    Re-apply one logged mutation to a table dict
+
+    Records describe the resulting state, not the operation that produced
+    it, so replay does not depend on the undo history or scenario rules.
+
+    Record ops:
+        cells: {'layer', 'features': {index: feature}}
+        columns: {'layer', 'columns': {column: (indices, values)}}
+        layer: {'layer', 'data': FeatureCollection}
+    Every record may carry 'meta' updates; a None value removes the key.
+    """
+    op = record['op']
+    layer = record.get('layer')
+    if op == 'cells':
+        features = table[layer]['features']
+        for index, feature in record['features'].items():
+            features[index] = feature
+    elif op == 'columns':
+        features = table[layer]['features']
+        for column, (indices, values) in record['columns'].items():
+            for index, value in zip(indices, values):
+                features[index]['properties'][column] = value
+    elif op == 'layer':
+        table[layer] = record['data']
+    else:
+        raise ValueError(f"Unknown WAL record op: {op}")
+
+    meta = table.setdefault('meta', {})
+    for key, value in record.get('meta', {}).items():
+        if value is None:
+            meta.pop(key, None)
+        else:
+            meta[key] = value
+
+
+class TableStore:
+    """
+    Durable storage for in-memory tables
+
+    Each table has a checkpoint (``<name>.ckpt``) holding every top-level
+    table entry as a separately pickled, checksummed blob, and a write-ahead
+    log (``<name>.wal``) of mutations made since. Recovery maps the
+    checkpoint, decodes its blobs and replays the log tail. Decoding is
+    proportional to the table size but much cheaper than re-parsing the
+    seed GeoJSON; only the replay grows with the edits since the last
+    checkpoint. Every layer is decoded up front because loading a table
+    builds its indicators and LODs from all layers anyway.
+
+    Args:
+        root: Directory for checkpoint and log files
+        checkpoint_every: Log records after which a checkpoint is due
+        checkpoint_bytes: Log size after which a checkpoint is due
+        fsync: Flush every log append to disk before acknowledging it
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        checkpoint_every: int = 500,
+        checkpoint_bytes: int = 64 * 1024 * 1024,
+        fsync: bool = True
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_bytes = checkpoint_bytes
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._logs: Dict[str, object] = {}
+        # table -> last sequence number written / covered by the checkpoint
+        self._seq: Dict[str, int] = {}
+        self._checkpoint_seq: Dict[str, int] = {}
+
+    def checkpoint_path(self, table_name: str) -> Path:
+        return self.root / f"{table_name}.ckpt"
+
+    def wal_path(self, table_name: str) -> Path:
+        return self.root / f"{table_name}.wal"
+
+    def exists(self, table_name: str) -> bool:
+        return self.checkpoint_path(table_name).exists()
+
+    def tables(self) -> list:
+        """Names of tables with a checkpoint on disk"""
+        return sorted(path.stem for path in self.root.glob('*.ckpt'))
+
+    # ------------------------------------------------------------------
+    # Write-ahead log
+    # ------------------------------------------------------------------
+
+    def _log(self, table_name: str):
+        if table_name not in self._logs:
+            self._logs[table_name] = open(self.wal_path(table_name), 'ab')
+        return self._logs[table_name]
+
+    def append(self, table_name: str, record: Dict) -> int:
+        """
+        Durably log a mutation before it is acknowledged
+
+        Returns:
+            Sequence number of the record
+        """
+        payload = pickle.dumps(record, protocol=PICKLE_PROTOCOL)
+        with self._lock:
+            seq = self._seq.get(table_name, 0) + 1
+            log = self._log(table_name)
+            log.write(FRAME.pack(len(payload), zlib.crc32(payload), seq) + payload)
+            log.flush()
+            if self.fsync:
+                os.fsync(log.fileno())
+            self._seq[table_name] = seq
+        return seq
+
+    def _read_log(self, table_name: str) -> Iterator[Tuple[int, Dict]]:
+        """
+        Yield (seq, record) from the log, stopping at a torn or corrupt tail
+
+        The log is truncated after the last intact record so later appends
+        are not hidden behind garbage.
+        """
+        path = self.wal_path(table_name)
+        if not path.exists() or path.stat().st_size == 0:
+            return
+        valid_end = 0
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0
+            size = len(data)
+            while offset + FRAME.size <= size:
+                length, crc, seq = FRAME.unpack_from(data, offset)
+                start = offset + FRAME.size
+                payload = data[start:start + length]
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                yield seq, pickle.loads(payload)
+                offset = valid_end = start + length
+        if valid_end < path.stat().st_size:
+            logger.warning(f"{table_name}: discarding {path.stat().st_size - valid_end} bytes of torn WAL tail")
+            with open(path, 'r+b') as f:
+                f.truncate(valid_end)
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+
+    def pending(self, table_name: str) -> int:
+        """Log records not yet covered by a checkpoint"""
+        with self._lock:
+            return self._seq.get(table_name, 0) - self._checkpoint_seq.get(table_name, 0)
+
+    def checkpoint_due(self, table_name: str) -> bool:
+        with self._lock:
+            pending = self.pending(table_name)
+            if pending >= self.checkpoint_every:
+                return True
+            path = self.wal_path(table_name)
+            return pending > 0 and path.exists() and path.stat().st_size >= self.checkpoint_bytes
+
+    def checkpoint(self, table_name: str, table: Dict) -> Path:
+        """
+        Write a checkpoint of the table and reset its log
+
+        The checkpoint is written to a temporary file, synced and renamed
+        over the previous one, so a crash at any point leaves either the old
+        checkpoint plus the full log or the new one. Log records it already
+        covers are skipped on replay if the log reset did not happen.
+        """
+        with self._lock:
+            seq = self._seq.get(table_name, 0)
+            blobs = []
+            entries = {}
+            offset = 0
+            for key, value in table.items():
+                blob = pickle.dumps(value, protocol=PICKLE_PROTOCOL)
+                entries[key] = [offset, len(blob), zlib.crc32(blob)]
+                blobs.append(blob)
+                offset += len(blob)
+            header = json.dumps({'table': table_name, 'seq': seq, 'entries': entries}).encode('utf-8')
+
+            path = self.checkpoint_path(table_name)
+            tmp = path.with_suffix('.ckpt.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(CHECKPOINT_MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+                for blob in blobs:
+                    f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+
+            # Start a fresh log; sequence numbers keep increasing
+            log = self._logs.pop(table_name, None)
+            if log:
+                log.close()
+            with open(self.wal_path(table_name), 'wb') as f:
+                os.fsync(f.fileno())
+            self._checkpoint_seq[table_name] = seq
+            logger.info(f"{table_name}: checkpoint at seq {seq} ({offset} bytes)")
+            return path
+
+    def _read_checkpoint(self, table_name: str) -> Tuple[Dict, int]:
+        path = self.checkpoint_path(table_name)
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC:
+                raise ValueError(f"{path} is not a table checkpoint")
+            (header_length,) = HEADER_LENGTH.unpack_from(data, len(CHECKPOINT_MAGIC))
+            start = len(CHECKPOINT_MAGIC) + HEADER_LENGTH.size
+            header = json.loads(data[start:start + header_length])
+            base = start + header_length
+
+            table = {}
+            view = memoryview(data)
+            try:
+                for key, (offset, length, crc) in header['entries'].items():
+                    blob = view[base + offset:base + offset + length]
+                    if zlib.crc32(blob) != crc:
+                        raise ValueError(f"{path}: checksum mismatch in '{key}'")
+                    table[key] = pickle.loads(blob)
+                    blob.release()
+            finally:
+                view.release()
+        return table, header['seq']
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+
+    def recover(self, table_name: str) -> Optional[Tuple[Dict, int]]:
+        """
+        Load the latest checkpoint and replay the log tail
+
+        Returns:
+            Tuple of (table dict, replayed record count), or None when the
+            table has never been checkpointed
+        """
+        if not self.exists(table_name):
+            return None
+        with self._lock:
+            table, checkpoint_seq = self._read_checkpoint(table_name)
+            seq = checkpoint_seq
+            replayed = 0
+            for record_seq, record in self._read_log(table_name):
+                if record_seq <= checkpoint_seq:
+                    continue
+                apply_record(table, record)
+                seq = record_seq
+                replayed += 1
+            self._seq[table_name] = seq
+            self._checkpoint_seq[table_name] = checkpoint_seq
+        logger.info(f"{table_name}: recovered checkpoint seq {checkpoint_seq}, replayed {replayed} WAL records")
+        return table, replayed
+
+    def status(self, table_name: str) -> Dict:
+        wal = self.wal_path(table_name)
+        checkpoint = self.checkpoint_path(table_name)
+        return {
+            'seq': self._seq.get(table_name, 0),
+            'checkpoint_seq': self._checkpoint_seq.get(table_name, 0),
+            'wal_bytes': wal.stat().st_size if wal.exists() else 0,
+            'checkpoint_bytes': checkpoint.stat().st_size if checkpoint.exists() else 0,
+        }
+
+    def release(self, table_name: str) -> None:
+        """Close a table's log handle (e.g. when the table is unloaded)"""
+        with self._lock:
+            log = self._logs.pop(table_name, None)
+            if log:
+                log.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for log in self._logs.values():
+                log.close()
+            self._logs.clear()
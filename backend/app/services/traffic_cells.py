@@ -0,0 +1,45 @@
+"""
+Traffic Grid Cells
+Fixed lat/lon grid keys that let area + time queries use a (cell_key, analyzed_at) index
+"""
+from typing import List, Optional
+import math
+import os
+
+
+# Cell edge in degrees (~1.1 km north-south). Stored keys depend on it, so
+# changing it requires re-running the traffic_density cell key migration.
+CELL_DEG = float(os.getenv("TRAFFIC_CELL_DEG", 0.01))
+
+# Keys are row * CELL_COLS + col; 360 / CELL_DEG columns must fit
+CELL_COLS = 10 ** (len(str(int(math.ceil(360 / CELL_DEG)))))
+
+# Bounding boxes spanning more cells than this are filtered on coordinates only
+MAX_QUERY_CELLS = 2000
+
+
+def cell_row_col(latitude: float, longitude: float):
+    return int(math.floor((latitude + 90) / CELL_DEG)), int(math.floor((longitude + 180) / CELL_DEG))
+
+
+def cell_key(latitude: Optional[float], longitude: Optional[float]) -> Optional[int]:
+    """Grid cell containing a point (None when a coordinate is missing)"""
+    if latitude is None or longitude is None:
+        return None
+    row, col = cell_row_col(latitude, longitude)
+    return row * CELL_COLS + col
+
+
+def cells_in_bbox(min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> Optional[List[int]]:
+    """
+    Keys of all cells intersecting a bounding box
+
+    Returns:
+        List of cell keys, or None when the box covers more than
+        MAX_QUERY_CELLS cells (the caller should then skip the key filter)
+    """
+    row0, col0 = cell_row_col(min_lat, min_lon)
+    row1, col1 = cell_row_col(max_lat, max_lon)
+    if (row1 - row0 + 1) * (col1 - col0 + 1) > MAX_QUERY_CELLS:
+        return None
+    return [row * CELL_COLS + col for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)]
@@ -0,0 +1,240 @@
+"""
+Traffic Retention
+Keeps raw traffic rows for a bounded window and moves older ones into monthly partitions
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+import os
+import re
+
+from sqlalchemy import Index, MetaData, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .. import models
+from .traffic_rollups import to_utc_naive
+
+
+logger = logging.getLogger(__name__)
+
+# Raw traffic_density / satellite_images rows are kept this long (0 = forever).
+# Older densities live on in the rollups.
+RAW_RETENTION_DAYS = int(os.getenv("TRAFFIC_RAW_RETENTION_DAYS", 30))
+# Hourly rollups are kept this long (0 = forever); daily rollups are kept forever
+HOURLY_RETENTION_DAYS = int(os.getenv("TRAFFIC_HOURLY_RETENTION_DAYS", 365))
+# Monthly partitions of expired raw rows kept before being dropped (0 = no archive)
+ARCHIVE_MONTHS = int(os.getenv("TRAFFIC_ARCHIVE_MONTHS", 12))
+# SQLite: directory of the per-month archive files (default: next to the database)
+ARCHIVE_DIR = os.getenv("TRAFFIC_ARCHIVE_DIR")
+
+# Archived tables and the timestamp that places a row in a month
+ARCHIVED_TABLES = {
+    models.TrafficDensity.__table__: "analyzed_at",
+    models.SatelliteImage.__table__: "processed_at",
+}
+
+PARTITION_NAME = re.compile(r"^(?P<table>\w+?)_(?P<month>\d{6})$")
+
+
+def raw_cutoff(now: Optional[datetime] = None) -> Optional[datetime]:
+    """Start of the raw retention window (hour aligned), None when raw rows are kept forever"""
+    if RAW_RETENTION_DAYS <= 0:
+        return None
+    moment = (now or datetime.utcnow()) - timedelta(days=RAW_RETENTION_DAYS)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def hourly_cutoff(now: Optional[datetime] = None) -> Optional[datetime]:
+    """Start of the hourly rollup window (day aligned), None when hourly rollups are kept forever"""
+    if HOURLY_RETENTION_DAYS <= 0:
+        return None
+    moment = (now or datetime.utcnow()) - timedelta(days=HOURLY_RETENTION_DAYS)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(moment: datetime) -> datetime:
+    return month_start(month_start(moment) + timedelta(days=32))
+
+
+def month_label(moment: datetime) -> str:
+    return moment.strftime("%Y%m")
+
+
+def months_before(moment: datetime, months: int) -> str:
+    """Label of the month the given number of months before moment's month"""
+    index = moment.year * 12 + moment.month - 1 - months
+    return f"{index // 12:04d}{index % 12 + 1:02d}"
+
+
+def partition_table(table: Table, schema: Optional[str], name: str) -> Table:
+    """Copy of a table's columns and primary key with a single index on its month timestamp"""
+    partition = table.to_metadata(MetaData(), schema=schema, name=name)
+    for index in list(partition.indexes):
+        partition.indexes.discard(index)
+    for constraint in list(partition.constraints):
+        if constraint is not partition.primary_key:
+            partition.constraints.discard(constraint)
+    timestamp = ARCHIVED_TABLES[table]
+    Index(f"ix_{name}_{timestamp}", partition.c[timestamp])
+    return partition
+
+
+class PartitionStore:
+    """
+    Where monthly partitions live
+
+    SQLite: one database file per month, attached while rows are moved in
+    (dropping a month deletes the file). PostgreSQL and others: one table
+    per month and source table (dropping a month is DROP TABLE).
+    """
+
+    def __init__(self, engine: Engine, archive_dir: Optional[str] = ARCHIVE_DIR):
+        self.engine = engine
+        self.sqlite = engine.dialect.name == "sqlite"
+        if self.sqlite:
+            database = engine.url.database
+            if archive_dir:
+                self.archive_dir = Path(archive_dir)
+            elif database and database != ":memory:":
+                self.archive_dir = Path(database).resolve().parent / "traffic_archive"
+            else:
+                self.archive_dir = None
+
+    @property
+    def enabled(self) -> bool:
+        return ARCHIVE_MONTHS > 0 and (not self.sqlite or self.archive_dir is not None)
+
+    def month_file(self, label: str) -> Path:
+        return self.archive_dir / f"traffic_{label}.db"
+
+    def months(self) -> List[str]:
+        """Labels (YYYYMM) of the existing partitions, oldest first"""
+        if self.sqlite:
+            if self.archive_dir is None or not self.archive_dir.is_dir():
+                return []
+            return sorted(path.stem.split("_", 1)[1] for path in self.archive_dir.glob("traffic_*.db"))
+        labels = set()
+        for name in inspect(self.engine).get_table_names():
+            match = PARTITION_NAME.match(name)
+            if match and match["table"] in {table.name for table in ARCHIVED_TABLES}:
+                labels.add(match["month"])
+        return sorted(labels)
+
+    def move_month(self, table: Table, start: datetime, end: datetime) -> int:
+        """
+        Move the rows of a table with timestamps in [start, end) into the partition of start's month
+
+        Copy and delete happen in one transaction (per database file on
+        SQLite, where already copied rows are skipped if a run is repeated).
+        """
+        label = month_label(start)
+        timestamp = table.c[ARCHIVED_TABLES[table]]
+        in_range = (timestamp >= start) & (timestamp < end)
+        with self.engine.connect() as connection:
+            if self.sqlite:
+                self.archive_dir.mkdir(parents=True, exist_ok=True)
+                schema = f"archive_{label}"
+                connection.exec_driver_sql(f'ATTACH DATABASE ? AS "{schema}"', (str(self.month_file(label)),))
+                partition = partition_table(table, schema, table.name)
+            else:
+                schema = None
+                partition = partition_table(table, table.schema, f"{table.name}_{label}")
+            try:
+                partition.create(connection, checkfirst=True)
+                columns = [column.name for column in table.columns]
+                copy = partition.insert().from_select(columns, select(*table.columns).where(in_range))
+                if self.sqlite:
+                    copy = copy.prefix_with("OR IGNORE")
+                connection.execute(copy)
+                moved = connection.execute(table.delete().where(in_range)).rowcount
+                connection.commit()
+            finally:
+                if self.sqlite:
+                    connection.rollback()
+                    connection.exec_driver_sql(f'DETACH DATABASE "{schema}"')
+        return moved
+
+    def drop_month(self, label: str) -> None:
+        if self.sqlite:
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                Path(f"{self.month_file(label)}{suffix}").unlink(missing_ok=True)
+            return
+        with self.engine.begin() as connection:
+            for table in ARCHIVED_TABLES:
+                connection.execute(text(f'DROP TABLE IF EXISTS "{table.name}_{label}"'))
+
+
+def expire_raw_rows(engine: Engine, store: PartitionStore, cutoff: datetime) -> Dict[str, int]:
+    """
+    Move raw rows older than the cutoff into their monthly partitions (or delete them)
+
+    Work is done one month at a time so no transaction holds the write lock
+    long; months without rows are skipped, so no empty partitions are created.
+    """
+    expired = {}
+    for table, column in ARCHIVED_TABLES.items():
+        timestamp = table.c[column]
+        with engine.connect() as connection:
+            oldest = connection.execute(select(func.min(timestamp)).where(timestamp < cutoff)).scalar()
+        count = 0
+        if oldest is not None and not store.enabled:
+            with engine.begin() as connection:
+                count = connection.execute(table.delete().where(timestamp < cutoff)).rowcount
+        else:
+            while oldest is not None:
+                start = month_start(to_utc_naive(oldest))
+                end = min(next_month(start), cutoff)
+                count += store.move_month(table, start, end)
+                # Continue with the month of the next remaining row
+                with engine.connect() as connection:
+                    oldest = connection.execute(
+                        select(func.min(timestamp)).where(timestamp >= end, timestamp < cutoff)
+                    ).scalar()
+        expired[table.name] = count
+    return expired
+
+
+def expire_hourly_rollups(connection: Connection, cutoff: datetime) -> int:
+    """Drop hourly rollups older than the cutoff; the daily rollups keep their totals"""
+    hourly = models.TrafficRollupHourly.__table__
+    return connection.execute(hourly.delete().where(hourly.c.bucket < cutoff)).rowcount
+
+
+def apply_retention(engine: Engine, now: Optional[datetime] = None) -> Dict:
+    """
+    Enforce the retention settings once
+
+    Args:
+        engine: Sync engine of the primary database
+        now: Reference time (UTC), defaults to the current time
+
+    Returns:
+        Summary of expired rows and dropped partitions
+    """
+    now = now or datetime.utcnow()
+    store = PartitionStore(engine)
+    summary = {"expired": {}, "hourly_rollups_deleted": 0, "partitions_dropped": []}
+
+    cutoff = raw_cutoff(now)
+    if cutoff is not None:
+        summary["expired"] = expire_raw_rows(engine, store, cutoff)
+
+    cutoff = hourly_cutoff(now)
+    if cutoff is not None:
+        with engine.begin() as connection:
+            summary["hourly_rollups_deleted"] = expire_hourly_rollups(connection, cutoff)
+
+    if ARCHIVE_MONTHS > 0:
+        keep_from = months_before(now, ARCHIVE_MONTHS)
+        for label in store.months():
+            if label < keep_from:
+                store.drop_month(label)
+                summary["partitions_dropped"].append(label)
+
+    logger.info(f"Traffic retention applied: {summary}")
+    return summary
@@ -0,0 +1,281 @@
+"""
+Traffic Rollups
+Hourly and daily per-cell aggregates of traffic densities, maintained on insert
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .. import models
+
+
+# Rollup key for densities without coordinates
+NO_CELL = -1
+
+GRANULARITIES = {
+    "hour": models.TrafficRollupHourly,
+    "day": models.TrafficRollupDaily,
+}
+
+BACKFILL_BATCH = 10000
+
+
+def to_utc_naive(moment: datetime) -> datetime:
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    moment = to_utc_naive(moment).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == "day" else moment
+
+
+def accumulate(rows: Iterable[Tuple[datetime, Optional[int], int, int]]) -> Dict:
+    """
+    Fold (analyzed_at, cell_key, density_score, vehicle_count) rows into rollup deltas
+
+    Returns:
+        {(granularity, bucket, cell_key): [count, density_sum, density_min, density_max, vehicle_sum]}
+    """
+    totals = {}
+    for analyzed_at, cell, density, vehicles in rows:
+        density = density or 0
+        vehicles = vehicles or 0
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(analyzed_at, granularity), NO_CELL if cell is None else cell)
+            total = totals.get(key)
+            if total is None:
+                totals[key] = [1, density, density, density, vehicles]
+            else:
+                total[0] += 1
+                total[1] += density
+                total[2] = min(total[2], density)
+                total[3] = max(total[3], density)
+                total[4] += vehicles
+    return totals
+
+
+def upsert_rollups(connection: Connection, totals: Dict) -> None:
+    """Add rollup deltas to the rollup tables (INSERT ... ON CONFLICT DO UPDATE)"""
+    if not totals:
+        return
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        least, greatest = func.least, func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        least, greatest = func.min, func.max
+
+    rows = defaultdict(list)
+    for (granularity, bucket, cell), (count, density_sum, density_min, density_max, vehicle_sum) in totals.items():
+        rows[granularity].append({
+            "bucket": bucket,
+            "cell_key": cell,
+            "record_count": count,
+            "density_sum": density_sum,
+            "density_min": density_min,
+            "density_max": density_max,
+            "vehicle_sum": vehicle_sum,
+        })
+
+    for granularity, values in rows.items():
+        table = GRANULARITIES[granularity].__table__
+        statement = insert(table)
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.bucket, table.c.cell_key],
+            set_={
+                "record_count": table.c.record_count + excluded.record_count,
+                "density_sum": table.c.density_sum + excluded.density_sum,
+                "density_min": least(table.c.density_min, excluded.density_min),
+                "density_max": greatest(table.c.density_max, excluded.density_max),
+                "vehicle_sum": table.c.vehicle_sum + excluded.vehicle_sum,
+            }
+        )
+        connection.execute(statement, values)
+
+
+# ============================================
+# Incremental maintenance
+# ============================================
+
+def _stamp_new_densities(session: Session, flush_context, instances) -> None:
+    """Give new densities their timestamp client-side so their bucket is known at flush"""
+    for instance in session.new:
+        if isinstance(instance, models.TrafficDensity) and instance.analyzed_at is None:
+            instance.analyzed_at = datetime.utcnow()
+
+
+def _roll_up_new_densities(session: Session, flush_context) -> None:
+    """Fold densities inserted by this flush into the rollups, in the same transaction"""
+    densities = [instance for instance in session.new if isinstance(instance, models.TrafficDensity)]
+    if densities:
+        totals = accumulate(
+            (d.analyzed_at, d.cell_key, d.density_score, d.vehicle_count) for d in densities
+        )
+        upsert_rollups(session.connection(), totals)
+
+
+_installed = False
+
+
+def install_rollup_hooks() -> None:
+    """
+    Maintain rollups for every session (sync and async, API and scheduler)
+
+    Only ORM inserts are rolled up; bulk Core inserts into traffic_density
+    must call upsert_rollups(accumulate(...)) themselves.
+    """
+    global _installed
+    if not _installed:
+        event.listen(Session, "before_flush", _stamp_new_densities)
+        event.listen(Session, "after_flush", _roll_up_new_densities)
+        _installed = True
+
+
+def backfill_rollups(engine: Engine) -> int:
+    """
+    Build the rollups from traffic_density when they are empty (first start after upgrading)
+
+    Returns:
+        Number of density rows rolled up
+    """
+    density = models.TrafficDensity.__table__
+    with engine.begin() as connection:
+        if connection.execute(select(func.count()).select_from(models.TrafficRollupHourly.__table__)).scalar():
+            return 0
+        rows = connection.execute(
+            select(density.c.analyzed_at, density.c.cell_key, density.c.density_score, density.c.vehicle_count)
+            .where(density.c.analyzed_at.is_not(None))
+        )
+        # Accumulate everything before writing: upserting per batch would
+        # interleave writes with the open read cursor
+        totals = {}
+        count = 0
+        while True:
+            batch = rows.fetchmany(BACKFILL_BATCH)
+            if not batch:
+                break
+            for key, (n, dsum, dmin, dmax, vsum) in accumulate(batch).items():
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = [n, dsum, dmin, dmax, vsum]
+                else:
+                    total[0] += n
+                    total[1] += dsum
+                    total[2] = min(total[2], dmin)
+                    total[3] = max(total[3], dmax)
+                    total[4] += vsum
+            count += len(batch)
+        upsert_rollups(connection, totals)
+    return count
+
+
+# ============================================
+# Queries
+# ============================================
+
+def _aggregate_row(record_count, density_sum, density_min, density_max, vehicle_sum) -> List:
+    return [record_count or 0, density_sum or 0, density_min, density_max, vehicle_sum or 0]
+
+
+def _combine(parts: List[List]) -> List:
+    return [
+        sum(part[0] for part in parts),
+        sum(part[1] for part in parts),
+        min((part[2] for part in parts if part[2] is not None), default=None),
+        max((part[3] for part in parts if part[3] is not None), default=None),
+        sum(part[4] for part in parts),
+    ]
+
+
+async def _rollup_totals(db: AsyncSession, rollup, start: datetime, end: Optional[datetime] = None) -> List:
+    query = select(
+        func.sum(rollup.record_count),
+        func.sum(rollup.density_sum),
+        func.min(rollup.density_min),
+        func.max(rollup.density_max),
+        func.sum(rollup.vehicle_sum),
+    ).where(rollup.bucket >= start)
+    if end is not None:
+        query = query.where(rollup.bucket < end)
+    return _aggregate_row(*(await db.execute(query)).one())
+
+
+async def _raw_totals(db: AsyncSession, start: datetime, end: datetime) -> List:
+    density = models.TrafficDensity
+    return _aggregate_row(*(await db.execute(
+        select(
+            func.count(density.id),
+            func.sum(density.density_score),
+            func.min(density.density_score),
+            func.max(density.density_score),
+            func.sum(density.vehicle_count),
+        ).where(density.analyzed_at >= start, density.analyzed_at < end)
+    )).one())
+
+
+async def window_totals(db: AsyncSession, since: datetime) -> List:
+    """
+    [count, density_sum, density_min, density_max, vehicle_sum] of all densities since a moment
+
+    Whole hours come from the hourly rollup; the partial hour at the start of
+    the window is aggregated from the raw rows (one indexed range query).
+    Past the retention windows the raw rows and hourly rollups are gone, so
+    older stretches are read from coarser data and counted in whole buckets.
+    """
+    from .traffic_retention import hourly_cutoff, raw_cutoff
+
+    since = to_utc_naive(since)
+    parts = []
+
+    hourly_from = hourly_cutoff()
+    if hourly_from is not None and since < hourly_from:
+        parts.append(await _rollup_totals(db, models.TrafficRollupDaily, bucket_start(since, "day"), hourly_from))
+        since = hourly_from
+
+    first_full_hour = bucket_start(since, "hour")
+    raw_from = raw_cutoff()
+    if first_full_hour < since and (raw_from is None or since >= raw_from):
+        first_full_hour += timedelta(hours=1)
+        parts.append(await _raw_totals(db, since, first_full_hour))
+
+    parts.append(await _rollup_totals(db, models.TrafficRollupHourly, first_full_hour))
+    return _combine(parts)
+
+
+async def trend(db: AsyncSession, since: datetime, granularity: str = "hour", cell: Optional[int] = None) -> List[Dict]:
+    """Per-bucket statistics since a moment (buckets overlapping the start are included whole)"""
+    rollup = GRANULARITIES[granularity]
+    query = (
+        select(
+            rollup.bucket,
+            func.sum(rollup.record_count),
+            func.sum(rollup.density_sum),
+            func.min(rollup.density_min),
+            func.max(rollup.density_max),
+            func.sum(rollup.vehicle_sum),
+        )
+        .where(rollup.bucket >= bucket_start(since, granularity))
+        .group_by(rollup.bucket)
+        .order_by(rollup.bucket)
+    )
+    if cell is not None:
+        query = query.where(rollup.cell_key == cell)
+    return [
+        {
+            "bucket": bucket,
+            "total_records": count,
+            "avg_density_score": density_sum / count if count else None,
+            "min_density_score": density_min,
+            "max_density_score": density_max,
+            "total_vehicles_detected": vehicle_sum,
+        }
+        for bucket, count, density_sum, density_min, density_max, vehicle_sum in await db.execute(query)
+    ]
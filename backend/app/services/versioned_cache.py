@@ -0,0 +1,83 @@
+"""
+Versioned Result Cache
+Caches derived results (analyses, columns, tiles) tagged with the data versions they were computed from
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from .single_flight import SingleFlight
+
+
+class VersionedCache:
+    """
+    Bounded LRU cache whose entries are only valid for a given data version.
+
+    Each entry is stored under a key (e.g. ``("konya", "bike_coverage", params)``)
+    together with the version it was computed for. A lookup with a different
+    version recomputes and replaces the stale entry, so at most one version
+    per key is ever kept in memory.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """Return the cached value for key if it was computed for version"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, version: Hashable, value: Any) -> None:
+        """Store value for key at version, evicting least recently used entries"""
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        version: Hashable,
+        compute: Callable[[], Any]
+    ) -> Any:
+        """
+        Return the cached value or compute and cache it
+
+        Args:
+            key: Cache key (must be hashable)
+            version: Data version the value depends on
+            compute: Zero-argument callable producing the value
+
+        Returns:
+            Cached or freshly computed value
+        """
+        value = self.get(key, version)
+        if value is not None:
+            return value
+
+        def compute_and_store():
+            result = compute()
+            self.put(key, version, result)
+            return result
+
+        return self._flights.do((key, version), compute_and_store)
+
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drop all entries, or only those whose key starts with table_name"""
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if isinstance(k, tuple) and k and k[0] == table_name]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -7,12 +7,23 @@ Bu script Konya'nın OpenStreetMap verilerini çeker ve CityScope formatına dö
 import osmnx as ox
 import geopandas as gpd
 import pandas as pd
+import argparse
+import hashlib
 import json
+import os
+import pickle
+import threading
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from shapely.geometry import box, Point, Polygon
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from osmnx._errors import InsufficientResponseError
+except ImportError:  # eski osmnx sürümleri
+    InsufficientResponseError = ValueError
+
 # Konya merkez koordinatları
 KONYA_CENTER = (37.8746, 32.4932)  # lat, lon
 KONYA_BBOX = {
@@ -22,17 +33,188 @@ KONYA_BBOX = {
     'west': 32.40
 }
 
-def fetch_buildings(place="Konya, Turkey", bbox=None):
+# ============================================
+# Karolu, önbellekli ve devam ettirilebilir OSM çekimi
+# ============================================
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(DATA_DIR, 'osm_cache')
+TILE_SIZE = 0.02  # derece (~2 km)
+FETCH_WORKERS = 4
+
+def split_bbox(bbox, tile_size=TILE_SIZE):
+    """(south, north, west, east) kutusunu yaklaşık tile_size derecelik karolara böl"""
+    south, north, west, east = bbox
+    lats = np.linspace(south, north, max(1, int(np.ceil((north - south) / tile_size))) + 1)
+    lons = np.linspace(west, east, max(1, int(np.ceil((east - west) / tile_size))) + 1)
+    return [
+        (round(float(s), 6), round(float(n), 6), round(float(w), 6), round(float(e), 6))
+        for s, n in zip(lats[:-1], lats[1:])
+        for w, e in zip(lons[:-1], lons[1:])
+    ]
+
+def osm_bbox(tile):
+    """(south, north, west, east) -> osmnx bbox sırası (left, bottom, right, top)"""
+    south, north, west, east = tile
+    return (west, south, east, north)
+
+class OSMCache:
+    """
+    İçerik adresli, diskte kalıcı karo önbelleği
+
+    Her karo isteğinin sonucu pickle edilip içeriğinin SHA-256 özetiyle
+    ``blobs/`` altına yazılır; ``manifest.json`` istek anahtarını blob
+    özetine bağlar ve her karodan sonra atomik olarak güncellenir (kontrol
+    noktası). Yarıda kalan bir çalışma manifestteki karoları atlayarak
+    devam eder; aynı içerikli karolar (ör. boş karolar) tek blob paylaşır.
+
+    Args:
+        root: Önbellek klasörü (testlerde hazır bir fixture klasörü)
+        offline: True ise ağa çıkılmaz; önbellekte olmayan karo hata verir
+    """
+
+    def __init__(self, root=CACHE_DIR, offline=False):
+        self.root = root
+        self.offline = offline
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    @staticmethod
+    def key(kind, tags, tile):
+        """İsteğin kimliği: katman türü, etiketler ve karo sınırları"""
+        request = json.dumps({'kind': kind, 'tags': tags, 'tile': tile}, sort_keys=True)
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def get(self, key):
+        """Önbellekteki karo sonucu; yoksa veya bozuksa None"""
+        digest = self.manifest.get(key)
+        if digest is None:
+            return None
+        try:
+            with open(self._blob_path(digest), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            return None
+        return pickle.loads(data)
+
+    def put(self, key, gdf):
+        """Karo sonucunu yaz ve manifesti güncelle"""
+        data = pickle.dumps(gdf, protocol=5)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        with self._lock:
+            self.manifest[key] = digest
+            tmp = f"{self.manifest_path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.manifest_path)
+
+class TileFetcher:
+    """
+    Bir bbox'ı karolara bölüp paralel çeken ve birleştiren yardımcı
+
+    Karolar iş parçacığı havuzunda (ağ beklemesi baskın) çekilir; her karo
+    önce önbellekten aranır. Karo sınırını kesen nesneler birden çok karoda
+    döner ve birleştirmede OSM kimliğine (indeks) göre tekilleştirilir.
+    Hata veren karolar çalışmanın sonunda raporlanır; başarılı karolar
+    önbellekte kaldığından yeniden çalıştırma yalnızca eksikleri çeker.
+
+    Args:
+        cache: OSMCache (varsayılan: data/osm_cache)
+        workers: Paralel karo isteği sayısı
+        tile_size: Karo boyutu (derece)
+    """
+
+    def __init__(self, cache=None, workers=FETCH_WORKERS, tile_size=TILE_SIZE):
+        self.cache = cache if cache is not None else OSMCache()
+        self.workers = workers
+        self.tile_size = tile_size
+        if not self.cache.offline:
+            # Ham Overpass yanıtları da aynı klasörde saklanır
+            ox.settings.use_cache = True
+            ox.settings.cache_folder = os.path.join(self.cache.root, 'http')
+
+    def _tile(self, kind, tags, tile, fetch_tile):
+        key = self.cache.key(kind, tags, tile)
+        gdf = self.cache.get(key)
+        if gdf is not None:
+            return gdf, True
+        if self.cache.offline:
+            raise LookupError(f"{kind} karosu önbellekte yok: {tile}")
+        try:
+            gdf = fetch_tile(tile)
+        except InsufficientResponseError:
+            gdf = gpd.GeoDataFrame()
+        self.cache.put(key, gdf)
+        return gdf, False
+
+    def fetch(self, kind, tags, bbox, fetch_tile):
+        """
+        Bir katmanı karo karo çek
+
+        Args:
+            kind: Katman adı (önbellek anahtarının parçası)
+            tags: OSM etiketleri (önbellek anahtarının parçası)
+            bbox: (south, north, west, east)
+            fetch_tile: Bir karo için GeoDataFrame döndüren fonksiyon
+
+        Returns:
+            Tekilleştirilmiş GeoDataFrame
+        """
+        tiles = split_bbox(bbox, self.tile_size)
+        frames, failures, cached = [], [], 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._tile, kind, tags, tile, fetch_tile): tile for tile in tiles}
+            for future in as_completed(futures):
+                try:
+                    gdf, hit = future.result()
+                except Exception as e:
+                    failures.append((futures[future], e))
+                    continue
+                cached += hit
+                if len(gdf) > 0:
+                    frames.append(gdf)
+        print(f"   {kind}: {len(tiles)} karo, {cached} önbellekten")
+        if failures:
+            tile, error = failures[0]
+            raise RuntimeError(f"{len(failures)}/{len(tiles)} karo alınamadı (ilk: {tile}: {error}); "
+                               "yeniden çalıştırınca kalan karolardan devam edilir")
+        if not frames:
+            return gpd.GeoDataFrame()
+        combined = pd.concat(frames)
+        combined = combined[~combined.index.duplicated(keep='first')]
+        return gpd.GeoDataFrame(combined, geometry='geometry', crs=frames[0].crs)
+
+def fetch_buildings(place="Konya, Turkey", bbox=None, fetcher=None):
     """Konya binalarını çek"""
     print("📦 Binalar çekiliyor...")
     try:
+        tags = {'building': True}
         if bbox:
-            buildings = ox.features_from_bbox(
-                bbox=bbox,
-                tags={'building': True}
+            fetcher = fetcher or TileFetcher()
+            buildings = fetcher.fetch(
+                'buildings', tags, bbox,
+                lambda tile: ox.features_from_bbox(bbox=osm_bbox(tile), tags=tags)
             )
         else:
-            buildings = ox.features_from_place(place, tags={'building': True})
+            buildings = ox.features_from_place(place, tags=tags)
         
         # Sadece polygon geometrileri al
         buildings = buildings[buildings.geometry.type.isin(['Polygon', 'MultiPolygon'])]
@@ -42,24 +224,32 @@ def fetch_buildings(place="Konya, Turkey", bbox=None):
         print(f"   ✗ Hata: {e}")
         return gpd.GeoDataFrame()
 
-def fetch_roads(place="Konya, Turkey", bbox=None):
+def fetch_roads(place="Konya, Turkey", bbox=None, fetcher=None):
     """Konya yol ağını çek"""
     print("🛣️  Yollar çekiliyor...")
     try:
         if bbox:
-            G = ox.graph_from_bbox(bbox=bbox, network_type='drive')
+            # Karo sınırını kesen kenarlar iki karodan da gelir (truncate_by_edge);
+            # kopyalar (u, v, key) indeksiyle tekilleştirilir
+            fetcher = fetcher or TileFetcher()
+            edges = fetcher.fetch(
+                'roads', {'network_type': 'drive', 'truncate_by_edge': True}, bbox,
+                lambda tile: ox.graph_to_gdfs(
+                    ox.graph_from_bbox(bbox=osm_bbox(tile), network_type='drive', truncate_by_edge=True),
+                    nodes=False
+                )
+            )
         else:
             G = ox.graph_from_place(place, network_type='drive')
-        
-        # Graph'ı GeoDataFrame'e çevir
-        edges = ox.graph_to_gdfs(G, nodes=False)
+            # Graph'ı GeoDataFrame'e çevir
+            edges = ox.graph_to_gdfs(G, nodes=False)
         print(f"   ✓ {len(edges)} yol segmenti bulundu")
         return edges
     except Exception as e:
         print(f"   ✗ Hata: {e}")
         return gpd.GeoDataFrame()
 
-def fetch_pois(place="Konya, Turkey", bbox=None):
+def fetch_pois(place="Konya, Turkey", bbox=None, fetcher=None):
     """Konya POI'lerini çek (okul, hastane, park, market vb.)"""
     print("📍 İlgi noktaları çekiliyor...")
     
@@ -73,21 +263,25 @@ def fetch_pois(place="Konya, Turkey", bbox=None):
     }
     
     all_pois = []
+    if bbox:
+        fetcher = fetcher or TileFetcher()
     
     for tag_key, tag_values in poi_tags.items():
+        tags = {tag_key: tag_values}
         try:
             if bbox:
-                pois = ox.features_from_bbox(
-                    bbox=bbox,
-                    tags={tag_key: tag_values}
+                pois = fetcher.fetch(
+                    'pois', tags, bbox,
+                    lambda tile, tags=tags: ox.features_from_bbox(bbox=osm_bbox(tile), tags=tags)
                 )
             else:
-                pois = ox.features_from_place(place, tags={tag_key: tag_values})
+                pois = ox.features_from_place(place, tags=tags)
             
             if len(pois) > 0:
                 pois['poi_type'] = tag_key
                 all_pois.append(pois)
-        except:
+        except Exception as e:
+            print(f"   ✗ {tag_key}: {e}")
             continue
     
     if all_pois:
@@ -99,7 +293,7 @@ def fetch_pois(place="Konya, Turkey", bbox=None):
     
     return gpd.GeoDataFrame()
 
-def fetch_landuse(place="Konya, Turkey", bbox=None):
+def fetch_landuse(place="Konya, Turkey", bbox=None, fetcher=None):
     """Arazi kullanım verilerini çek"""
     print("🏞️  Arazi kullanımı çekiliyor...")
     try:
@@ -109,7 +303,11 @@ def fetch_landuse(place="Konya, Turkey", bbox=None):
         }
         
         if bbox:
-            landuse = ox.features_from_bbox(bbox=bbox, tags=landuse_tags)
+            fetcher = fetcher or TileFetcher()
+            landuse = fetcher.fetch(
+                'landuse', landuse_tags, bbox,
+                lambda tile: ox.features_from_bbox(bbox=osm_bbox(tile), tags=landuse_tags)
+            )
         else:
             landuse = ox.features_from_place(place, tags=landuse_tags)
         
@@ -149,69 +347,217 @@ def create_grid(bbox, cell_size=100):
     print(f"   ✓ {len(grid)} hücre oluşturuldu")
     return grid
 
-def calculate_indicators(grid, buildings, pois, roads):
-    """Her grid hücresi için kentsel göstergeler hesapla"""
+def grid_tiles(grid, cells_per_tile=2500):
+    """
+    Grid hücrelerini kare karolara böl
+
+    Args:
+        grid: Grid GeoDataFrame'i
+        cells_per_tile: Karo başına yaklaşık hücre sayısı
+
+    Returns:
+        Karo başına grid satır konumlarının (iloc) listesi
+    """
+    if len(grid) == 0:
+        return []
+    n = max(1, int(np.ceil(np.sqrt(len(grid) / cells_per_tile))))
+    bounds = grid.geometry.bounds
+    keys = 0
+    for axis, stride in (('minx', n), ('miny', 1)):
+        values = bounds[axis].to_numpy()
+        span = values.max() - values.min() or 1
+        keys = keys + np.minimum((values - values.min()) / span * n, n - 1).astype(int) * stride
+    order = np.argsort(keys, kind='stable')
+    splits = np.flatnonzero(np.diff(keys[order])) + 1
+    return np.split(order, splits)
+
+def _measured(gdf, measure, crs):
+    """Sadece geometri ve ölçü sütunu içeren hafif kopya (join ve süreçler arası aktarım için)"""
+    if len(gdf) == 0:
+        return gpd.GeoDataFrame({'measure': []}, geometry=[], crs=crs)
+    if gdf.crs is None:
+        gdf = gdf.set_crs(crs)
+    elif gdf.crs != crs:
+        gdf = gdf.to_crs(crs)
+    if measure == 'area':
+        values = gdf.geometry.area.to_numpy()
+    elif measure == 'length':
+        values = gdf.geometry.length.to_numpy()
+    else:
+        values = gdf[measure].to_numpy() if measure in gdf else np.full(len(gdf), None)
+    return gpd.GeoDataFrame({'measure': values}, geometry=gdf.geometry.to_numpy(), crs=crs)
+
+def _candidates(layer, area):
+    """Katmanın karo sınırlarıyla kesişen nesneleri (STR-tree sorgusu)"""
+    if len(layer) == 0:
+        return layer
+    return layer.iloc[layer.sindex.query(area, predicate='intersects')]
+
+def _tile_indicators(cells, buildings, pois, roads):
+    """
+    Bir karodaki hücreler için ham toplamlar
+
+    Her katman hücrelerle indeksli spatial join ile eşleştirilir (bir nesne
+    kesiştiği her hücreye sayılır) ve hücre bazında gruplanır.
+
+    Returns:
+        Hücre id'si ile indekslenmiş DataFrame
+    """
+    def joined(layer):
+        return gpd.sjoin(layer, cells, how='inner', predicate='intersects').groupby('index_right')['measure']
+
+    columns = []
+    if len(buildings) > 0:
+        grouped = joined(buildings)
+        columns += [grouped.size().rename('building_count'), grouped.sum().rename('building_area')]
+    if len(pois) > 0:
+        grouped = joined(pois)
+        columns += [grouped.size().rename('poi_count'), grouped.nunique().rename('poi_diversity')]
+    if len(roads) > 0:
+        columns.append(joined(roads).sum().rename('road_length'))
+    return pd.concat(columns, axis=1) if columns else pd.DataFrame(index=cells.index[:0])
+
+def calculate_indicators(grid, buildings, pois, roads, workers=None, cells_per_tile=2500):
+    """
+    Her grid hücresi için kentsel göstergeler hesapla
+
+    Grid karolara bölünür; her karo için yalnızca karoyla kesişen nesneler
+    (STR-tree ile) seçilir ve karolar süreç havuzunda paralel işlenir.
+
+    Args:
+        grid: Grid GeoDataFrame'i ('id' sütunu ile)
+        buildings, pois, roads: Katman GeoDataFrame'leri
+        workers: Paralel süreç sayısı (varsayılan: çekirdek sayısı, 1 = seri)
+        cells_per_tile: Karo başına yaklaşık hücre sayısı
+    """
     print("📊 Göstergeler hesaplanıyor...")
     
-    indicators = []
+    crs = grid.crs or "EPSG:4326"
+    cells = gpd.GeoDataFrame(geometry=grid.geometry.to_numpy(), index=grid['id'].to_numpy(), crs=crs)
+    layers = (
+        _measured(buildings, 'area', crs),
+        _measured(pois, 'poi_type', crs),
+        _measured(roads, 'length', crs)
+    )
     
-    for idx, cell in grid.iterrows():
-        cell_geom = cell.geometry
-        
-        # Bina yoğunluğu
-        if len(buildings) > 0:
-            buildings_in_cell = buildings[buildings.geometry.intersects(cell_geom)]
-            building_count = len(buildings_in_cell)
-            building_area = buildings_in_cell.geometry.area.sum() if building_count > 0 else 0
-        else:
-            building_count = 0
-            building_area = 0
-        
-        # POI çeşitliliği
-        if len(pois) > 0:
-            pois_in_cell = pois[pois.geometry.intersects(cell_geom)]
-            poi_count = len(pois_in_cell)
-            poi_diversity = pois_in_cell['poi_type'].nunique() if poi_count > 0 else 0
-        else:
-            poi_count = 0
-            poi_diversity = 0
-        
-        # Yol yoğunluğu
-        if len(roads) > 0:
-            roads_in_cell = roads[roads.geometry.intersects(cell_geom)]
-            road_length = roads_in_cell.geometry.length.sum() if len(roads_in_cell) > 0 else 0
-        else:
-            road_length = 0
-        
-        indicators.append({
-            'cell_id': cell['id'],
-            'building_count': building_count,
-            'building_density': building_area * 1000000,  # normalize
-            'poi_count': poi_count,
-            'poi_diversity': poi_diversity,
-            'road_density': road_length * 100000,  # normalize
-            'walkability_score': min(100, (poi_diversity * 20 + min(building_count, 5) * 10))
-        })
+    tasks = []
+    for positions in grid_tiles(grid, cells_per_tile):
+        tile = cells.iloc[positions]
+        area = box(*tile.total_bounds)
+        tasks.append((tile, *(_candidates(layer, area) for layer in layers)))
     
-    indicators_df = pd.DataFrame(indicators)
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            parts = list(executor.map(_tile_indicators, *zip(*tasks)))
+    else:
+        parts = [_tile_indicators(*task) for task in tasks]
+    print(f"   ✓ {len(tasks)} karo işlendi")
+    
+    totals = pd.concat(parts) if parts else pd.DataFrame()
+    totals = totals.reindex(
+        index=cells.index,
+        columns=['building_count', 'building_area', 'poi_count', 'poi_diversity', 'road_length']
+    ).fillna(0)
+    
+    building_count = totals['building_count'].astype(int)
+    poi_diversity = totals['poi_diversity'].astype(int)
+    indicators_df = pd.DataFrame({
+        'cell_id': cells.index,
+        'building_count': building_count.to_numpy(),
+        'building_density': (totals['building_area'] * 1000000).to_numpy(),  # normalize
+        'poi_count': totals['poi_count'].astype(int).to_numpy(),
+        'poi_diversity': poi_diversity.to_numpy(),
+        'road_density': (totals['road_length'] * 100000).to_numpy(),  # normalize
+        'walkability_score': np.minimum(100, poi_diversity * 20 + np.minimum(building_count, 5) * 10).to_numpy()
+    })
     grid = grid.merge(indicators_df, left_on='id', right_on='cell_id')
     print("   ✓ Göstergeler hesaplandı")
     return grid
 
-def export_to_geojson(gdf, filename):
-    """GeoDataFrame'i GeoJSON olarak kaydet"""
+# GeoJSON'a ek olarak yazılan sütunsal biçimler (sunucu bunları tercih eder)
+EXPORT_FORMATS = ('geojson', 'parquet', 'fgb')
+PARQUET_ROW_GROUP = 50000
+
+def _columnar_safe(gdf):
+    """Karışık tipli (liste, sayı+metin) OSM sütunlarını Parquet/FlatGeobuf için metne çevir"""
+    gdf = gdf.copy()
+    for column in gdf.columns:
+        if column == gdf.geometry.name or gdf[column].dtype != object:
+            continue
+        values = gdf[column].dropna()
+        if not values.map(lambda v: isinstance(v, str)).all():
+            gdf[column] = gdf[column].map(
+                lambda v: v if v is None or isinstance(v, str) else json.dumps(v, ensure_ascii=False, default=str)
+            )
+    return gdf
+
+def export_to_geojson(gdf, filename, formats=EXPORT_FORMATS):
+    """
+    GeoDataFrame'i GeoJSON ve sütunsal biçimlerde kaydet
+
+    Aynı adla .parquet (GeoParquet; Hilbert sırasına dizilmiş, bbox sütunlu
+    küçük satır gruplarıyla, böylece okuyucu alan dışını atlayabilir) ve .fgb
+    (FlatGeobuf; yerleşik R-tree indeksli) dosyaları da yazılır.
+    """
     if len(gdf) > 0:
         # CRS'i ayarla
         if gdf.crs is None:
             gdf = gdf.set_crs("EPSG:4326")
-        gdf.to_file(filename, driver='GeoJSON')
-        print(f"   💾 {filename} kaydedildi")
+        stem = os.path.splitext(filename)[0]
+        if 'geojson' in formats:
+            gdf.to_file(filename, driver='GeoJSON')
+            print(f"   💾 {filename} kaydedildi")
+        if 'parquet' in formats or 'fgb' in formats:
+            columnar = _columnar_safe(gdf)
+        if 'parquet' in formats:
+            ordered = columnar.iloc[columnar.hilbert_distance().argsort()]
+            try:
+                ordered.to_parquet(f"{stem}.parquet", write_covering_bbox=True, row_group_size=PARQUET_ROW_GROUP)
+            except TypeError:  # geopandas < 1.0
+                ordered.to_parquet(f"{stem}.parquet", row_group_size=PARQUET_ROW_GROUP)
+            print(f"   💾 {stem}.parquet kaydedildi")
+        if 'fgb' in formats:
+            columnar.to_file(f"{stem}.fgb", driver='FlatGeobuf')
+            print(f"   💾 {stem}.fgb kaydedildi")
 
-def export_to_cityscope_format(grid, buildings, pois):
-    """CityIO formatında JSON oluştur"""
-    print("🔄 CityScope formatına dönüştürülüyor...")
+def iter_grid_features(grid, chunk_size=10000):
+    """
+    Grid hücrelerini CityIO geogrid Feature'ları olarak sırayla üret
+
+    Özellikler iterrows yerine sütun dizilerinden parça parça okunur.
+    """
+    def column(name, dtype):
+        if name in grid:
+            return grid[name].fillna(0).to_numpy(dtype=dtype)
+        return np.zeros(len(grid), dtype=dtype)
+    
+    ids = grid['id'].to_numpy(dtype=int)
+    building_count = column('building_count', int)
+    poi_count = column('poi_count', int)
+    walkability = column('walkability_score', float)
+    geometries = grid.geometry.to_numpy()
     
-    cityscope_data = {
+    for start in range(0, len(grid), chunk_size):
+        end = start + chunk_size
+        for geom, cell_id, buildings, pois, walk in zip(
+            geometries[start:end], ids[start:end].tolist(), building_count[start:end].tolist(),
+            poi_count[start:end].tolist(), walkability[start:end].tolist()
+        ):
+            yield {
+                "type": "Feature",
+                "geometry": geom.__geo_interface__,
+                "properties": {
+                    "id": cell_id,
+                    "building_count": buildings,
+                    "poi_count": pois,
+                    "walkability": walk
+                }
+            }
+
+def cityscope_document(grid):
+    """CityIO belgesinin geogrid özellikleri hariç kısmı (header, göstergeler)"""
+    return {
         "header": {
             "name": "konya",
             "spatial": {
@@ -233,34 +579,40 @@ def export_to_cityscope_format(grid, buildings, pois):
             "type": "FeatureCollection",
             "features": []
         },
-        "indicators": []
+        "indicators": [
+            {"name": "Bina Yoğunluğu", "value": float(grid['building_density'].mean())},
+            {"name": "POI Çeşitliliği", "value": float(grid['poi_diversity'].mean())},
+            {"name": "Yürünebilirlik", "value": float(grid['walkability_score'].mean())},
+            {"name": "Yol Yoğunluğu", "value": float(grid['road_density'].mean())}
+        ]
     }
+
+def export_to_cityscope_format(grid, buildings, pois):
+    """CityIO formatında JSON oluştur"""
+    print("🔄 CityScope formatına dönüştürülüyor...")
     
-    # Grid hücrelerini ekle
-    for idx, row in grid.iterrows():
-        feature = {
-            "type": "Feature",
-            "geometry": row.geometry.__geo_interface__,
-            "properties": {
-                "id": int(row['id']),
-                "building_count": int(row.get('building_count', 0)),
-                "poi_count": int(row.get('poi_count', 0)),
-                "walkability": float(row.get('walkability_score', 0))
-            }
-        }
-        cityscope_data["geogrid"]["features"].append(feature)
-    
-    # Göstergeleri ekle
-    cityscope_data["indicators"] = [
-        {"name": "Bina Yoğunluğu", "value": float(grid['building_density'].mean())},
-        {"name": "POI Çeşitliliği", "value": float(grid['poi_diversity'].mean())},
-        {"name": "Yürünebilirlik", "value": float(grid['walkability_score'].mean())},
-        {"name": "Yol Yoğunluğu", "value": float(grid['road_density'].mean())}
-    ]
-    
+    cityscope_data = cityscope_document(grid)
+    cityscope_data["geogrid"]["features"] = list(iter_grid_features(grid))
     return cityscope_data
 
-def main():
+def write_cityscope_json(grid, filename):
+    """
+    CityIO belgesini dosyaya akışla yaz
+
+    Geogrid özellikleri bellekte tek bir liste olarak toplanmadan satır
+    satır yazılır; büyük gridlerde bellek kullanımı sabit kalır.
+    """
+    print("🔄 CityScope formatına dönüştürülüyor...")
+    
+    document = cityscope_document(grid)
+    head, tail = json.dumps(document, ensure_ascii=False).split('"features": []', 1)
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(head + '"features": [\n')
+        for i, feature in enumerate(iter_grid_features(grid)):
+            f.write((',\n' if i else '') + json.dumps(feature, ensure_ascii=False))
+        f.write('\n]' + tail)
+
+def main(cache_dir=CACHE_DIR, offline=False, workers=FETCH_WORKERS, tile_size=TILE_SIZE):
     print("=" * 60)
     print("🏙️  CityScope Konya - Veri Toplama")
     print("=" * 60)
@@ -271,11 +623,12 @@ def main():
     print("\n📍 Pilot Bölge: Konya Merkez (Mevlana Çevresi)")
     print(f"   Koordinatlar: {pilot_bbox}\n")
     
-    # Verileri çek
-    buildings = fetch_buildings(bbox=pilot_bbox)
-    roads = fetch_roads(bbox=pilot_bbox)
-    pois = fetch_pois(bbox=pilot_bbox)
-    landuse = fetch_landuse(bbox=pilot_bbox)
+    # Verileri çek (karolar önbellekten veya paralel olarak ağdan)
+    fetcher = TileFetcher(OSMCache(cache_dir, offline=offline), workers=workers, tile_size=tile_size)
+    buildings = fetch_buildings(bbox=pilot_bbox, fetcher=fetcher)
+    roads = fetch_roads(bbox=pilot_bbox, fetcher=fetcher)
+    pois = fetch_pois(bbox=pilot_bbox, fetcher=fetcher)
+    landuse = fetch_landuse(bbox=pilot_bbox, fetcher=fetcher)
     
     # Grid oluştur
     bbox_dict = {
@@ -292,15 +645,13 @@ def main():
     
     # Dosyaları kaydet
     print("\n💾 Veriler kaydediliyor...")
-    export_to_geojson(buildings, '/home/claude/cityscope-konya/data/konya_buildings.geojson')
-    export_to_geojson(roads, '/home/claude/cityscope-konya/data/konya_roads.geojson')
-    export_to_geojson(pois, '/home/claude/cityscope-konya/data/konya_pois.geojson')
-    export_to_geojson(grid, '/home/claude/cityscope-konya/data/konya_grid.geojson')
+    export_to_geojson(buildings, os.path.join(DATA_DIR, 'konya_buildings.geojson'))
+    export_to_geojson(roads, os.path.join(DATA_DIR, 'konya_roads.geojson'))
+    export_to_geojson(pois, os.path.join(DATA_DIR, 'konya_pois.geojson'))
+    export_to_geojson(grid, os.path.join(DATA_DIR, 'konya_grid.geojson'))
     
     # CityScope formatı
-    cityscope_data = export_to_cityscope_format(grid, buildings, pois)
-    with open('/home/claude/cityscope-konya/data/konya_cityscope.json', 'w', encoding='utf-8') as f:
-        json.dump(cityscope_data, f, ensure_ascii=False, indent=2)
+    write_cityscope_json(grid, os.path.join(DATA_DIR, 'konya_cityscope.json'))
     print("   💾 konya_cityscope.json kaydedildi")
     
     print("\n" + "=" * 60)
@@ -317,4 +668,10 @@ def main():
     return buildings, roads, pois, grid
 
 if __name__ == "__main__":
-    buildings, roads, pois, grid = main()
+    parser = argparse.ArgumentParser(description="Konya OSM verilerini çek ve CityScope formatına dönüştür")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Karo önbelleği klasörü")
+    parser.add_argument("--offline", action="store_true", help="Sadece önbellekten oku, ağa çıkma")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help="Paralel karo isteği sayısı")
+    parser.add_argument("--tile-size", type=float, default=TILE_SIZE, help="Karo boyutu (derece)")
+    args = parser.parse_args()
+    buildings, roads, pois, grid = main(args.cache_dir, args.offline, args.workers, args.tile_size)
@@ -5,11 +5,15 @@ Gerçekçi örnek veriler oluşturur.
 Gerçek veriler Konya Büyükşehir Belediyesi Kent Bilgi Sistemi'nden alınacaktır.
 """
 
+import argparse
 import json
 import random
 import math
+import os
 from datetime import datetime
 
+import numpy as np
+
 # Konya merkez koordinatları
 KONYA_CENTER = {"lat": 37.8746, "lon": 32.4932}
 
@@ -328,16 +332,522 @@ def generate_cityscope_config():
             "historic": {"color": [200, 150, 100], "height": 12, "description": "Tarihi Alan"}
         },
         "indicators": [
-            {"name": "Nüfus Yoğunluğu", "viz_type": "heatmap", "unit": "kişi/km²"},
-            {"name": "Yürünebilirlik", "viz_type": "bar", "unit": "puan"},
-            {"name": "Yeşil Alan Oranı", "viz_type": "pie", "unit": "%"},
-            {"name": "Erişilebilirlik", "viz_type": "radar", "unit": "puan"},
-            {"name": "Bina Yoğunluğu", "viz_type": "heatmap", "unit": "m²/m²"}
-        ]
+            {"name": "Nüfus Yoğunluğu", "viz_type": "heatmap", "unit": "kişi/km²",
+             "property": "population_density", "colormap": "YlOrRd",
+             "aggregate": "mean", "description": "Ortalama nüfus yoğunluğu"},
+            {"name": "Yürünebilirlik", "viz_type": "bar", "unit": "puan",
+             "property": "walkability", "colormap": "RdYlGn", "domain": [0, 100],
+             "aggregate": "mean", "description": "Ortalama yürünebilirlik skoru"},
+            {"name": "Yeşil Alan Oranı", "viz_type": "pie", "unit": "%",
+             "property": "green_ratio", "colormap": "Greens",
+             "aggregate": "mean", "scale": 100, "description": "Ortalama yeşil alan oranı"},
+            {"name": "Erişilebilirlik", "viz_type": "radar", "unit": "puan",
+             "property": "accessibility", "colormap": "RdYlGn", "domain": [0, 100],
+             "aggregate": "mean", "description": "Ortalama erişilebilirlik skoru"},
+            {"name": "Bina Yoğunluğu", "viz_type": "heatmap", "unit": "m²/m²",
+             "property": "building_density", "colormap": "YlOrRd",
+             "aggregate": "mean", "precision": 2, "description": "Ortalama bina yoğunluğu"}
+        ],
+        # Isı haritası renk skalaları (eşit aralıklı RGB durakları)
+        "colormaps": {
+            "YlOrRd": [[255, 255, 178], [254, 204, 92], [253, 141, 60], [240, 59, 32], [189, 0, 38]],
+            "RdYlGn": [[215, 48, 39], [252, 141, 89], [254, 224, 139], [145, 207, 96], [26, 152, 80]],
+            "Greens": [[237, 248, 233], [186, 228, 179], [116, 196, 118], [49, 163, 84], [0, 109, 44]]
+        }
     }
     return config
 
-def main():
+# ============================================
+# Ölçek testi modu (vektörel, akışlı üretim)
+# ============================================
+
+BUILDING_TYPES = ["residential", "commercial", "industrial", "public", "mixed"]
+FLOOR_CHOICES = np.array([1, 2, 3, 4, 5, 6, 8, 10, 15])
+FLOOR_WEIGHTS = np.array([10, 15, 20, 20, 15, 10, 5, 3, 2]) / 100
+POI_CATEGORIES = ["education", "health", "commerce", "religion", "transport", "recreation", "government"]
+ROAD_TYPES = ["residential", "tertiary", "secondary"]
+LAND_USES = ["residential", "commercial", "mixed", "industrial", "green"]
+MAHALLE_WEIGHTS = np.array([{"high": 150, "medium": 80, "low": 40}[m["density"]] for m in MAHALLELER], dtype=float)
+MAHALLE_WEIGHTS /= MAHALLE_WEIGHTS.sum()
+MAHALLE_CENTERS = np.array([m["center"] for m in MAHALLELER])  # (lat, lon)
+MAHALLE_NAMES = np.array([m["name"] for m in MAHALLELER])
+
+# Ölçek modu çıktı biçimleri: dosya uzantısı
+SCALE_FORMATS = {"geojson": "geojson", "geojsonseq": "geojsonseq", "columnar": "columns", "geoparquet": "parquet"}
+# Sunucunun katman olarak okuyabildiği biçimler; yalnızca bunlar için tablo konfigürasyonu yazılır
+SERVER_FORMATS = ("geojson", "geojsonseq", "geoparquet")
+
+BUILDING_FEATURE = (
+    '{"type":"Feature","properties":{"id":"bld_%d","mahalle":"%s","type":"%s","floors":%d,'
+    '"height":%d,"year_built":%d,"area":%d,"population_estimate":%d},'
+    '"geometry":{"type":"Polygon","coordinates":[[[%.6f,%.6f],[%.6f,%.6f],[%.6f,%.6f],[%.6f,%.6f],[%.6f,%.6f]]]}}'
+)
+POI_FEATURE = (
+    '{"type":"Feature","properties":{"id":"poi_%d","name":"%s - %d","category":"%s","mahalle":"%s",'
+    '"is_landmark":false,"importance":"%s"},"geometry":{"type":"Point","coordinates":[%.6f,%.6f]}}'
+)
+ROAD_FEATURE = (
+    '{"type":"Feature","properties":{"id":"road_%d","name":"Sokak %d","type":"%s","lanes":%d,"speed_limit":30},'
+    '"geometry":{"type":"LineString","coordinates":[[%.6f,%.6f],[%.6f,%.6f]]}}'
+)
+GRID_FEATURE = (
+    '{"type":"Feature","properties":{"id":%d,"row":%d,"col":%d,"building_density":%.4f,'
+    '"population_density":%.2f,"poi_count":%d,"green_ratio":%.4f,"walkability":%.2f,'
+    '"accessibility":%.2f,"land_use":"%s"},'
+    '"geometry":{"type":"Polygon","coordinates":[[[%.6f,%.6f],[%.6f,%.6f],[%.6f,%.6f],[%.6f,%.6f],[%.6f,%.6f]]]}}'
+)
+
+
+def sample_locations(rng, n, spread, background=0.3):
+    """
+    Mahalle merkezleri etrafında kümelenmiş konumlar (vektörel)
+
+    Noktaların ``background`` oranı şehir kutusuna düzgün dağılır; her nokta
+    en yakın mahalleye atanır.
+
+    Returns:
+        (lat, lon, mahalle indeksi) dizileri
+    """
+    mahalle = rng.choice(len(MAHALLELER), size=n, p=MAHALLE_WEIGHTS)
+    lat = MAHALLE_CENTERS[mahalle, 0] + rng.normal(0, spread, n)
+    lon = MAHALLE_CENTERS[mahalle, 1] + rng.normal(0, spread, n)
+
+    uniform = rng.random(n) < background
+    half = spread * 4
+    lat[uniform] = rng.uniform(KONYA_CENTER["lat"] - half, KONYA_CENTER["lat"] + half, uniform.sum())
+    lon[uniform] = rng.uniform(KONYA_CENTER["lon"] - half, KONYA_CENTER["lon"] + half, uniform.sum())
+    nearest = ((lat[uniform, None] - MAHALLE_CENTERS[:, 0]) ** 2 + (lon[uniform, None] - MAHALLE_CENTERS[:, 1]) ** 2).argmin(axis=1)
+    mahalle[uniform] = nearest
+    return lat, lon, mahalle
+
+
+def city_spread(n, base_n, base_spread):
+    """Nesne sayısı arttıkça kümeleri genişlet (yoğunluk makul kalsın)"""
+    return min(base_spread * math.sqrt(max(n, base_n) / base_n), 0.08)
+
+
+def building_chunks(rng, total, chunk_size):
+    """Bina sütunlarını parça parça üret"""
+    spread = city_spread(total, 900, 0.008)
+    for start in range(0, total, chunk_size):
+        n = min(chunk_size, total - start)
+        lat, lon, mahalle = sample_locations(rng, n, spread)
+        width = rng.integers(10, 41, n)
+        depth = rng.integers(10, 41, n)
+        floors = rng.choice(FLOOR_CHOICES, size=n, p=FLOOR_WEIGHTS)
+        types = np.array(BUILDING_TYPES)[rng.integers(0, len(BUILDING_TYPES), n)]
+        historic = np.isin(mahalle, [i for i, m in enumerate(MAHALLELER) if m["type"] == "historic"])
+        types[historic] = "historic"
+        population = np.where(types == "residential", floors * rng.integers(2, 9, n), 0)
+        yield {
+            "id": np.arange(start, start + n),
+            "lon": lon,
+            "lat": lat,
+            "width_m": width,
+            "depth_m": depth,
+            "mahalle": MAHALLE_NAMES[mahalle],
+            "type": types,
+            "floors": floors,
+            "height": floors * 3,
+            "year_built": rng.integers(1960, 2024, n),
+            "area": width * depth,
+            "population_estimate": population,
+        }
+
+
+def poi_chunks(rng, total, chunk_size):
+    """POI sütunlarını parça parça üret"""
+    spread = city_spread(total, 250, 0.006)
+    for start in range(0, total, chunk_size):
+        n = min(chunk_size, total - start)
+        lat, lon, mahalle = sample_locations(rng, n, spread)
+        category = np.array(POI_CATEGORIES)[rng.integers(0, len(POI_CATEGORIES), n)]
+        yield {
+            "id": np.arange(start, start + n),
+            "lon": lon,
+            "lat": lat,
+            "category": category,
+            "mahalle": MAHALLE_NAMES[mahalle],
+            "importance": np.array(["low", "medium", "high"])[rng.integers(0, 3, n)],
+        }
+
+
+def road_chunks(rng, total, chunk_size):
+    """Sokak segmenti sütunlarını parça parça üret"""
+    spread = city_spread(total, 80, 0.006)
+    for start in range(0, total, chunk_size):
+        n = min(chunk_size, total - start)
+        lat, lon, _ = sample_locations(rng, n, spread)
+        angle = rng.uniform(0, 2 * math.pi, n)
+        length = rng.uniform(0.002, 0.008, n)
+        yield {
+            "id": np.arange(start, start + n),
+            "lon": lon,
+            "lat": lat,
+            "end_lon": lon + length * np.cos(angle),
+            "end_lat": lat + length * np.sin(angle),
+            "type": np.array(ROAD_TYPES)[rng.integers(0, len(ROAD_TYPES), n)],
+            "lanes": rng.integers(1, 3, n),
+        }
+
+
+def grid_shape(cells):
+    """Yaklaşık ``cells`` hücreli kare grid boyutu (satır, sütun)"""
+    side = int(math.ceil(math.sqrt(cells)))
+    return side, side
+
+
+def grid_chunks(rng, cells, cell_size, chunk_size):
+    """Konya merkezli grid hücrelerini satır blokları halinde üret"""
+    nrows, ncols = grid_shape(cells)
+    cell_deg = cell_size / 111000
+    min_lat = KONYA_CENTER["lat"] - nrows * cell_deg / 2
+    min_lon = KONYA_CENTER["lon"] - ncols * cell_deg / 2
+    rows_per_chunk = max(1, chunk_size // ncols)
+    for row_start in range(0, nrows, rows_per_chunk):
+        rows = np.arange(row_start, min(nrows, row_start + rows_per_chunk))
+        row, col = np.repeat(rows, ncols), np.tile(np.arange(ncols), len(rows))
+        n = len(row)
+        lat = min_lat + row * cell_deg
+        lon = min_lon + col * cell_deg
+        dist_to_center = np.hypot(lat - KONYA_CENTER["lat"], lon - KONYA_CENTER["lon"])
+        centrality = np.clip(1 - dist_to_center * 20, 0, None)
+        yield {
+            "id": row * ncols + col,
+            "row": row,
+            "col": col,
+            "lon": lon,
+            "lat": lat,
+            "building_density": rng.uniform(0.1, 0.9, n) * (0.5 + centrality * 0.5),
+            "population_density": rng.uniform(50, 500, n) * (0.3 + centrality * 0.7),
+            "poi_count": (rng.uniform(0, 20, n) * (0.4 + centrality * 0.6)).astype(int),
+            "green_ratio": rng.uniform(0.05, 0.4, n) * (1.2 - centrality * 0.5),
+            "walkability": rng.uniform(40, 95, n) * (0.6 + centrality * 0.4),
+            "accessibility": rng.uniform(30, 100, n) * (0.5 + centrality * 0.5),
+            "land_use": np.array(LAND_USES)[rng.integers(0, len(LAND_USES), n)],
+            "cell_deg": np.full(n, cell_deg),
+        }
+
+
+def encode_buildings(c):
+    half_w = c["width_m"] / 111000 / 2
+    half_h = c["depth_m"] / 111000 / 2
+    w, e = c["lon"] - half_w, c["lon"] + half_w
+    s, n = c["lat"] - half_h, c["lat"] + half_h
+    return [BUILDING_FEATURE % row for row in zip(
+        c["id"].tolist(), c["mahalle"].tolist(), c["type"].tolist(), c["floors"].tolist(),
+        c["height"].tolist(), c["year_built"].tolist(), c["area"].tolist(), c["population_estimate"].tolist(),
+        w.tolist(), s.tolist(), e.tolist(), s.tolist(), e.tolist(), n.tolist(), w.tolist(), n.tolist(),
+        w.tolist(), s.tolist()
+    )]
+
+
+def encode_pois(c):
+    return [POI_FEATURE % row for row in zip(
+        c["id"].tolist(), c["category"].tolist(), c["id"].tolist(), c["category"].tolist(),
+        c["mahalle"].tolist(), c["importance"].tolist(), c["lon"].tolist(), c["lat"].tolist()
+    )]
+
+
+def encode_roads(c):
+    return [ROAD_FEATURE % row for row in zip(
+        c["id"].tolist(), c["id"].tolist(), c["type"].tolist(), c["lanes"].tolist(),
+        c["lon"].tolist(), c["lat"].tolist(), c["end_lon"].tolist(), c["end_lat"].tolist()
+    )]
+
+
+def encode_grid(c):
+    w, s = c["lon"], c["lat"]
+    e, n = w + c["cell_deg"], s + c["cell_deg"]
+    return [GRID_FEATURE % row for row in zip(
+        c["id"].tolist(), c["row"].tolist(), c["col"].tolist(), c["building_density"].tolist(),
+        c["population_density"].tolist(), c["poi_count"].tolist(), c["green_ratio"].tolist(),
+        c["walkability"].tolist(), c["accessibility"].tolist(), c["land_use"].tolist(),
+        w.tolist(), s.tolist(), e.tolist(), s.tolist(), e.tolist(), n.tolist(), w.tolist(), n.tolist(),
+        w.tolist(), s.tolist()
+    )]
+
+
+class GeoJSONWriter:
+    """Kompakt FeatureCollection; özellikler geldikçe dosyaya yazılır"""
+
+    def __init__(self, path, name, encode):
+        self.f = open(path, "w", encoding="utf-8")
+        self.f.write('{"type":"FeatureCollection","name":%s,"features":[\n' % json.dumps(name))
+        self.encode = encode
+        self.first = True
+
+    def write(self, columns):
+        lines = self.encode(columns)
+        if lines:
+            self.f.write(("" if self.first else ",\n") + ",\n".join(lines))
+            self.first = False
+
+    def close(self):
+        self.f.write("\n]}\n")
+        self.f.close()
+
+
+class GeoJSONSeqWriter(GeoJSONWriter):
+    """Satır sonuyla ayrılmış GeoJSON (newline-delimited GeoJSON): satır başına bir Feature"""
+
+    def __init__(self, path, name, encode):
+        self.f = open(path, "w", encoding="utf-8")
+        self.encode = encode
+
+    def write(self, columns):
+        lines = self.encode(columns)
+        if lines:
+            self.f.write("\n".join(lines) + "\n")
+
+    def close(self):
+        self.f.close()
+
+
+class ColumnarWriter:
+    """
+    Sütun başına bir .npy dosyası (np.load(..., mmap_mode='r') ile okunabilir)
+
+    Toplam satır sayısı baştan bilindiği için dosyalar bellek eşlemeli olarak
+    açılır ve her parça doğrudan yerine yazılır.
+    """
+
+    def __init__(self, path, name, total):
+        self.path = path
+        self.name = name
+        self.total = total
+        self.offset = 0
+        self.columns = {}
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, columns):
+        n = len(next(iter(columns.values())))
+        for key, values in columns.items():
+            if key not in self.columns:
+                dtype = values.dtype if values.dtype.kind != "U" else np.dtype(f"U{max(32, values.dtype.itemsize // 4)}")
+                self.columns[key] = np.lib.format.open_memmap(
+                    os.path.join(self.path, f"{key}.npy"), mode="w+", dtype=dtype, shape=(self.total,)
+                )
+            self.columns[key][self.offset:self.offset + n] = values
+        self.offset += n
+
+    def close(self):
+        schema = {
+            "name": self.name,
+            "rows": self.offset,
+            "columns": {key: str(array.dtype) for key, array in self.columns.items()},
+        }
+        for array in self.columns.values():
+            array.flush()
+        self.columns.clear()
+        with open(os.path.join(self.path, "schema.json"), "w", encoding="utf-8") as f:
+            json.dump(schema, f, ensure_ascii=False, indent=2)
+
+
+def prefixed(prefix, ids):
+    return np.char.add(prefix, ids.astype(str))
+
+
+def geo_buildings(c):
+    """Bina parçası: (özellik sütunları, geometriler)"""
+    import shapely
+    half_w = c["width_m"] / 111000 / 2
+    half_h = c["depth_m"] / 111000 / 2
+    properties = {
+        "id": prefixed("bld_", c["id"]),
+        **{key: c[key] for key in ("mahalle", "type", "floors", "height", "year_built", "area", "population_estimate")},
+    }
+    return properties, shapely.box(c["lon"] - half_w, c["lat"] - half_h, c["lon"] + half_w, c["lat"] + half_h)
+
+
+def geo_pois(c):
+    import shapely
+    properties = {
+        "id": prefixed("poi_", c["id"]),
+        "name": np.char.add(np.char.add(c["category"], " - "), c["id"].astype(str)),
+        "category": c["category"],
+        "mahalle": c["mahalle"],
+        "is_landmark": np.zeros(len(c["id"]), dtype=bool),
+        "importance": c["importance"],
+    }
+    return properties, shapely.points(c["lon"], c["lat"])
+
+
+def geo_roads(c):
+    import shapely
+    properties = {
+        "id": prefixed("road_", c["id"]),
+        "name": prefixed("Sokak ", c["id"]),
+        "type": c["type"],
+        "lanes": c["lanes"],
+        "speed_limit": np.full(len(c["id"]), 30),
+    }
+    coords = np.stack([np.column_stack([c["lon"], c["lat"]]), np.column_stack([c["end_lon"], c["end_lat"]])], axis=1)
+    return properties, shapely.linestrings(coords)
+
+
+def geo_grid(c):
+    import shapely
+    properties = {
+        key: c[key] for key in (
+            "id", "row", "col", "building_density", "population_density", "poi_count",
+            "green_ratio", "walkability", "accessibility", "land_use"
+        )
+    }
+    return properties, shapely.box(c["lon"], c["lat"], c["lon"] + c["cell_deg"], c["lat"] + c["cell_deg"])
+
+
+GEO_LAYERS = {
+    "buildings": (geo_buildings, "Polygon"),
+    "pois": (geo_pois, "Point"),
+    "roads": (geo_roads, "LineString"),
+    "grid": (geo_grid, "Polygon"),
+}
+
+
+class GeoParquetWriter:
+    """
+    GeoParquet 1.1 (WKB geometri + bbox kapsama sütunu), parça başına bir satır grubu
+
+    Okuyucular (ör. geopandas.read_parquet(bbox=...)) satır gruplarının
+    bbox istatistiklerine bakarak alan dışındaki grupları atlayabilir.
+    """
+
+    def __init__(self, path, name, build, geometry_type):
+        import pyarrow
+        import pyarrow.parquet
+        import shapely
+        self.pa, self.pq, self.shapely = pyarrow, pyarrow.parquet, shapely
+        self.path = path
+        self.build = build
+        self.metadata = {
+            "version": "1.1.0",
+            "primary_column": "geometry",
+            "columns": {
+                "geometry": {
+                    "encoding": "WKB",
+                    "geometry_types": [geometry_type],
+                    "covering": {"bbox": {axis: ["bbox", axis] for axis in ("xmin", "ymin", "xmax", "ymax")}},
+                }
+            },
+        }
+        self.writer = None
+
+    def write(self, columns):
+        pa = self.pa
+        properties, geometries = self.build(columns)
+        bounds = self.shapely.bounds(geometries)
+        bbox = pa.StructArray.from_arrays(
+            [pa.array(bounds[:, i]) for i in range(4)], names=["xmin", "ymin", "xmax", "ymax"]
+        )
+        table = pa.table({
+            **{key: pa.array(values) for key, values in properties.items()},
+            "geometry": pa.array(self.shapely.to_wkb(geometries), type=pa.binary()),
+            "bbox": bbox,
+        })
+        if self.writer is None:
+            schema = table.schema.with_metadata({"geo": json.dumps(self.metadata)})
+            self.writer = self.pq.ParquetWriter(self.path, schema, compression="zstd")
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def write_geoparquet(collection, path):
+    """Küçük bir FeatureCollection'ı GeoParquet olarak yaz (özellik sözlüklerinden)"""
+    import pyarrow
+    import pyarrow.parquet
+    import shapely
+    from shapely.geometry import shape
+
+    features = collection["features"]
+    geometries = [shape(feature["geometry"]) for feature in features]
+    table = pyarrow.Table.from_pylist([feature["properties"] for feature in features])
+    table = table.append_column("geometry", pyarrow.array(shapely.to_wkb(geometries), type=pyarrow.binary()))
+    metadata = {
+        "version": "1.0.0",
+        "primary_column": "geometry",
+        "columns": {"geometry": {"encoding": "WKB", "geometry_types": sorted({g.geom_type for g in geometries})}},
+    }
+    pyarrow.parquet.write_table(table.replace_schema_metadata({"geo": json.dumps(metadata)}), path)
+
+
+def generate_scale(name="konya_scale", buildings=1_000_000, pois=200_000, roads=500_000, cells=1_000_000,
+                   cell_size=100, output_format="geojson", seed=42, chunk_size=100_000, output_dir=None):
+    """
+    Ölçek testi için büyük sentetik şehir üret
+
+    Her katman ``chunk_size`` nesnelik parçalar halinde NumPy ile üretilir ve
+    hemen diske yazılır; bellek kullanımı toplam boyuttan bağımsızdır. Aynı
+    seed ve chunk_size ile çıktı birebir aynıdır.
+
+    Args:
+        name: Tablo adı (dosyalar <name>_<katman>.<uzantı>)
+        buildings, pois, roads: Nesne sayıları
+        cells: Yaklaşık grid hücre sayısı (kare grid)
+        cell_size: Grid hücre boyutu (metre)
+        output_format: 'geojson', 'geojsonseq', 'columnar' veya 'geoparquet'
+        seed: Rastgele sayı üreteci tohumu
+        chunk_size: Parça başına nesne sayısı
+        output_dir: Çıktı klasörü (varsayılan: bu dosyanın klasörü)
+
+    Tablo konfigürasyonu (<name>_config.json) yalnızca sunucunun okuyabildiği
+    biçimler için yazılır; 'columnar' çıktı yalnızca analiz içindir.
+
+    Returns:
+        Katman -> yazılan dosya yolu
+    """
+    if output_format not in SCALE_FORMATS:
+        raise ValueError(f"Bilinmeyen biçim: {output_format}")
+    output_dir = output_dir or os.path.dirname(os.path.abspath(__file__))
+    extension = SCALE_FORMATS[output_format]
+
+    # Katman başına bağımsız üreteç: bir katmanın boyutu diğerlerini etkilemez
+    layer_rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(4)]
+    layers = [
+        ("buildings", buildings, building_chunks(layer_rngs[0], buildings, chunk_size), encode_buildings),
+        ("pois", pois, poi_chunks(layer_rngs[1], pois, chunk_size), encode_pois),
+        ("roads", roads, road_chunks(layer_rngs[2], roads, chunk_size), encode_roads),
+        ("grid", int(np.prod(grid_shape(cells))), grid_chunks(layer_rngs[3], cells, cell_size, chunk_size), encode_grid),
+    ]
+
+    paths = {}
+    for layer, total, chunks, encode in layers:
+        path = os.path.join(output_dir, f"{name}_{layer}.{extension}")
+        if output_format == "columnar":
+            writer = ColumnarWriter(path, f"{name}_{layer}", total)
+        elif output_format == "geoparquet":
+            writer = GeoParquetWriter(path, f"{name}_{layer}", *GEO_LAYERS[layer])
+        elif output_format == "geojsonseq":
+            writer = GeoJSONSeqWriter(path, f"{name}_{layer}", encode)
+        else:
+            writer = GeoJSONWriter(path, f"{name}_{layer}", encode)
+        for columns in chunks:
+            writer.write(columns)
+        writer.close()
+        paths[layer] = path
+        print(f"   ✓ {os.path.basename(path)} ({total:,} nesne)")
+
+    if output_format not in SERVER_FORMATS:
+        # .npy sütunları sunucuda okunamaz; konfigürasyon boş katmanlı bir tablo tanımlardı
+        print(f"   ! {output_format} biçimi sunucuda yüklenemez, {name}_config.json yazılmadı")
+        return paths
+
+    nrows, ncols = grid_shape(cells)
+    config = generate_cityscope_config()
+    config["header"]["name"] = name
+    config["header"]["spatial"].update({"cellSize": cell_size, "nrows": nrows, "ncols": ncols})
+    config_path = os.path.join(output_dir, f"{name}_config.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    paths["config"] = config_path
+    print(f"   ✓ {os.path.basename(config_path)}")
+    return paths
+
+
+def main(geoparquet=False):
     print("=" * 60)
     print("🏙️  CityScope Konya - Örnek Veri Üreteci")
     print("=" * 60)
@@ -388,11 +898,54 @@ def main():
         json.dump(config, f, ensure_ascii=False, indent=2)
     print("   ✓ konya_config.json")
     
+    # Sunucu .parquet dosyalarını GeoJSON'a tercih eder
+    if geoparquet:
+        for layer, collection in (("buildings", buildings), ("pois", pois), ("roads", roads), ("grid", grid)):
+            write_geoparquet(collection, f"{data_dir}/konya_{layer}.parquet")
+            print(f"   ✓ konya_{layer}.parquet")
+    
     print("\n" + "=" * 60)
     print("✅ Veri üretimi tamamlandı!")
     print("=" * 60)
     
     return buildings, pois, roads, grid, config
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="CityScope Konya örnek veri üreteci")
+    parser.add_argument("--seed", type=int, default=None, help="Tekrarlanabilir çıktı için tohum")
+    parser.add_argument("--scale", action="store_true",
+                        help="Ölçek testi modu: milyonlarca nesneyi vektörel üret ve akışla yaz")
+    parser.add_argument("--name", default="konya_scale", help="Ölçek modu tablo adı")
+    parser.add_argument("--buildings", type=int, default=1_000_000)
+    parser.add_argument("--pois", type=int, default=200_000)
+    parser.add_argument("--roads", type=int, default=500_000)
+    parser.add_argument("--cells", type=int, default=1_000_000, help="Yaklaşık grid hücre sayısı")
+    parser.add_argument("--cell-size", type=int, default=100, help="Grid hücre boyutu (metre)")
+    parser.add_argument("--format", choices=sorted(SCALE_FORMATS), default="geojson",
+                        help="Ölçek modu çıktı biçimi; normal modda 'geoparquet' GeoJSON'a ek .parquet yazar")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--output", default=None, help="Çıktı klasörü")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.scale:
+        print("=" * 60)
+        print("🏙️  CityScope Konya - Ölçek Testi Veri Üreteci")
+        print("=" * 60)
+        generate_scale(
+            name=args.name,
+            buildings=args.buildings,
+            pois=args.pois,
+            roads=args.roads,
+            cells=args.cells,
+            cell_size=args.cell_size,
+            output_format=args.format,
+            seed=42 if args.seed is None else args.seed,
+            chunk_size=args.chunk_size,
+            output_dir=args.output
+        )
+    else:
+        if args.seed is not None:
+            random.seed(args.seed)
+        main(geoparquet=args.format == "geoparquet")
@@ -10,6 +10,11 @@ export const Inventory = () => {
 
     useEffect(() => {
         fetchInventory();
+        // Refresh when an item crosses its critical level instead of polling
+        const alerts = new EventSource(`${api.defaults.baseURL}/inventory/low-stock/stream`);
+        alerts.addEventListener('low_stock', fetchInventory);
+        alerts.addEventListener('restocked', fetchInventory);
+        return () => alerts.close();
     }, []);
 
     const fetchInventory = async () => {
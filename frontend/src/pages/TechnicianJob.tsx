@@ -32,11 +32,9 @@ export const TechnicianJob = () => {
 
     const fetchJob = async () => {
         try {
-            const res = await api.get('/work-orders/');
-            // In a real app we'd fetch specific ID, but our API list is small
-            const found = res.data.find((w: any) => w.id === parseInt(id || '0'));
-            setJob(found);
-            if (found) setElapsed(found.total_labor_seconds);
+            const res = await api.get(`/work-orders/${id}`);
+            setJob(res.data);
+            setElapsed(res.data.total_labor_seconds);
         } catch (err) {
             console.error(err);
         } finally {
@@ -16,7 +16,7 @@ export const WorkOrderList = () => {
 
     const fetchOrders = async () => {
         try {
-            const res = await api.get('/work-orders/');
+            const res = await api.get('/work-orders/', { params: { expand: 'vehicle' } });
             setOrders(res.data);
         } catch (err) { console.error(err); }
         finally { setLoading(false); }
@@ -57,7 +57,7 @@ export const WorkOrderList = () => {
                                 {wo.vehicle_id}
                             </div>
                             <div>
-                                <h3 className="font-bold text-gray-900">Araç ID: {wo.vehicle_id}</h3>
+                                <h3 className="font-bold text-gray-900">{wo.vehicle ? `Plaka: ${wo.vehicle.plate}` : `Araç ID: ${wo.vehicle_id}`}</h3>
                                 <p className="text-gray-500">{wo.description}</p>
                             </div>
                         </div>